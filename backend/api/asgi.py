@@ -0,0 +1,116 @@
+"""
+Async read path, served under ASGI.
+
+Under ASGI, ``ASGIURLConfMiddleware`` resolves requests against
+``ASGI_URLCONF`` (backend/asgi_urls.py), which routes the busiest reads to
+async views ahead of the regular URLconf: the post list, post detail and
+trending posts (posts/async_views.py) and the subreddit detail
+(subreddits/async_views.py). These await the ORM and the cache instead of
+running the whole request in a thread of the sync pool, so a worker keeps
+taking requests while others wait on slow I/O.
+
+Their output, validators included, is the one of the sync viewsets. Any
+request they do not handle themselves (writes, ``?search=``, the
+browsable API, archived posts) goes to the sync view routed for the same
+URL in ``ROOT_URLCONF``, so both paths run side by side. Under WSGI the
+middleware does nothing and every request takes the sync path.
+
+These endpoints are public reads whose output does not depend on the user;
+the request is only authenticated for the rate limits of the sync views.
+"""
+
+from functools import wraps
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import resolve
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import APIView, exception_handler
+
+
+class ASGIURLConfMiddleware:
+    """Resolve requests handled under ASGI against ``ASGI_URLCONF``."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if not self.is_async:
+            return self.get_response(request)
+        return self.__acall__(request)
+
+    async def __acall__(self, request):
+        request.urlconf = settings.ASGI_URLCONF
+        return await self.get_response(request)
+
+
+def async_reads(view):
+    """
+    Serve GET and HEAD requests for JSON with the async ``view``; pass
+    anything else to the sync view of the same URL.
+    """
+
+    @wraps(view)
+    async def dispatch(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD") or not wants_json(request):
+            return await sync_view(request)
+        try:
+            await sync_to_async(check_throttles)(request)
+            return await view(request, *args, **kwargs)
+        except APIException as exc:
+            response = exception_handler(exc, {})
+            # Such as Retry-After.
+            headers = {
+                name: value
+                for name, value in response.headers.items()
+                if name != "Content-Type"
+            }
+            return json_response(
+                response.data, status=response.status_code, headers=headers
+            )
+
+    return dispatch
+
+
+def check_throttles(request):
+    view = APIView()
+    view.check_throttles(Request(request, authenticators=view.get_authenticators()))
+    # A request that falls back to the sync view is not counted again there
+    # (see api/throttling.py).
+    request.throttled = True
+
+
+def wants_json(request):
+    # The browsable API is rendered by the sync views.
+    return request.GET.get("format", "json") == "json" and (
+        "text/html" not in request.headers.get("Accept", "")
+    )
+
+
+async def sync_view(request):
+    """The response of the sync view routed for ``request`` in ``ROOT_URLCONF``."""
+    match = resolve(request.path_info, urlconf=settings.ROOT_URLCONF)
+    return await sync_to_async(match.func)(request, *match.args, **match.kwargs)
+
+
+def json_response(data, status=200, headers=None):
+    """Render ``data`` like the sync views do for ``application/json``."""
+    response = HttpResponse(
+        JSONRenderer().render(data),
+        status=status,
+        content_type="application/json",
+        headers=headers,
+    )
+    patch_vary_headers(response, ["Accept"])
+    return response
@@ -0,0 +1,73 @@
+"""
+Query budgets: the most SQL queries one request to each API action may
+issue, with every cache cold.
+
+``api/tests.py`` requests every action of the URLconf against a seeded
+dataset and fails when an action has no budget here, or goes over it,
+listing the code that issued each query. Lower a budget when an action
+gets cheaper; raising one should be a reviewed decision.
+"""
+
+QUERY_BUDGETS = {
+    # Posts
+    "PostViewSet.list": 1,
+    "PostViewSet.retrieve": 2,
+    "PostViewSet.hot": 1,
+    "PostViewSet.trending": 1,
+    "PostViewSet.feed": 3,
+    "PostViewSet.create": 6,
+    "PostViewSet.update": 6,
+    "PostViewSet.partial_update": 4,
+    "PostViewSet.destroy": 3,
+    "PostViewSet.vote": 5,
+    # Per batch, whatever its size.
+    "PostViewSet.ingest": 8,
+    # Comments
+    "CommentViewSet.list": 1,
+    "CommentViewSet.retrieve": 1,
+    "CommentViewSet.create": 8,
+    "CommentViewSet.update": 2,
+    "CommentViewSet.partial_update": 2,
+    "CommentViewSet.destroy": 8,
+    # Subreddits
+    "SubredditViewSet.list": 2,
+    "SubredditViewSet.retrieve": 3,
+    "SubredditViewSet.create": 4,
+    "SubredditViewSet.update": 8,
+    "SubredditViewSet.partial_update": 4,
+    "SubredditViewSet.destroy": 18,
+    # One query each for the live and archived posts, read through cursors.
+    "SubredditViewSet.export": 4,
+    "SubredditViewSet.join": 9,
+    "SubredditViewSet.leave": 7,
+    "MemberViewSet.list": 1,
+    "ModeratorViewSet.list": 3,
+    "ModeratorViewSet.create": 6,
+    "ModeratorViewSet.destroy": 4,
+    "RuleViewSet.list": 2,
+    "RuleViewSet.retrieve": 1,
+    "RuleViewSet.create": 2,
+    "RuleViewSet.update": 3,
+    "RuleViewSet.partial_update": 3,
+    "RuleViewSet.destroy": 3,
+    # Accounts
+    "RegisterView.post": 4,
+    "LoginView.post": 3,
+    # Rotation blacklists the old refresh token and records the new one,
+    # each through simplejwt's get_or_create.
+    "LoginRefreshView.post": 13,
+    "LogoutView.post": 7,
+    "MeView.get": 0,
+    "MeView.put": 3,
+    "MeView.patch": 1,
+    # Uploads
+    "UploadViewSet.create": 1,
+    "UploadViewSet.retrieve": 1,
+    # The session is locked while the chunk is written, or the blob stored.
+    "UploadViewSet.partial_update": 4,
+    "UploadViewSet.complete": 6,
+    "UploadViewSet.destroy": 2,
+    # Misc
+    "APIRootView.get": 0,
+    "metrics.get": 0,
+}
@@ -0,0 +1,178 @@
+"""
+Caching helpers shared by the API apps.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+
+# Backends whose entries every worker process sees.
+SHARED_BACKENDS = (RedisCache, BaseMemcachedCache, DatabaseCache)
+
+
+class ProcessLocalCache(LocMemCache):
+    """
+    A local memory cache that never evicts entries before they expire.
+    Like any ``LocMemCache`` it is private to its process, so it is only
+    correct with ``SINGLE_PROCESS``.
+    """
+
+    def _cull(self):
+        pass
+
+
+def is_shared(alias="default"):
+    """Whether every process serving requests sees the same cache entries."""
+    return settings.SINGLE_PROCESS or isinstance(caches[alias], SHARED_BACKENDS)
+
+
+def evicts(alias="default"):
+    """
+    Whether the cache may drop entries before they expire. Redis is
+    trusted to run with ``maxmemory-policy noeviction``.
+    """
+    backend = caches[alias]
+    return not isinstance(backend, (RedisCache, ProcessLocalCache))
+
+
+def get_or_rebuild(key, rebuild, soft_ttl, hard_ttl, lock_timeout=30, wait=2.0):
+    """
+    Return the cached value for ``key``, calling ``rebuild()`` when it is
+    missing or older than ``soft_ttl`` seconds.
+
+    Entries outlive their soft TTL (up to ``hard_ttl``) so that, once one
+    expires, a single worker takes a short lock and rebuilds it while every
+    other worker keeps serving the stale copy. When there is nothing cached
+    at all, the other workers wait up to ``wait`` seconds for the rebuild
+    before falling back to computing the value themselves.
+    """
+    entry = cache.get(key)
+    if entry is not None and entry[0] > time.time():
+        return entry[1]
+
+    lock_key = f"{key}:rebuild"
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        try:
+            value = rebuild()
+            cache.set(key, (time.time() + soft_ttl, value), timeout=hard_ttl)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    if entry is not None:
+        return entry[1]
+
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[1]
+    return rebuild()
+
+
+async def aget_or_rebuild(key, rebuild, soft_ttl, hard_ttl, lock_timeout=30, wait=2.0):
+    """
+    ``get_or_rebuild`` for async views, where ``rebuild`` is a coroutine
+    function. Shares its entries with ``get_or_rebuild``.
+    """
+    entry = await cache.aget(key)
+    if entry is not None and entry[0] > time.time():
+        return entry[1]
+
+    lock_key = f"{key}:rebuild"
+    if await cache.aadd(lock_key, 1, timeout=lock_timeout):
+        try:
+            value = await rebuild()
+            await cache.aset(key, (time.time() + soft_ttl, value), timeout=hard_ttl)
+            return value
+        finally:
+            await cache.adelete(lock_key)
+
+    if entry is not None:
+        return entry[1]
+
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        await asyncio.sleep(0.05)
+        entry = await cache.aget(key)
+        if entry is not None:
+            return entry[1]
+    return await rebuild()
+
+
+async def aget_many(keys):
+    """
+    ``cache.get_many`` for async views. The backends' own ``aget_many``
+    awaits one ``aget`` per key, a round-trip each.
+    """
+    return await sync_to_async(cache.get_many)(keys)
+
+
+class TwoTierCache:
+    """
+    A bounded in-process LRU in front of the Django cache.
+
+    Meant for versioned keys: an entry is never updated in place, a change
+    produces a new key, so the local copies never need invalidating and
+    old versions simply fall out of the LRU. That only holds while the
+    versions come from the shared default cache: with a per-process cache,
+    a change in one worker never moves the keys the other workers read.
+    """
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        value = self._recall(key)
+        if value is None:
+            value = cache.get(key)
+            if value is not None:
+                self._remember(key, value)
+        return value
+
+    def set(self, key, value):
+        cache.set(key, value, timeout=self.timeout)
+        self._remember(key, value)
+
+    async def aget(self, key):
+        value = self._recall(key)
+        if value is None:
+            value = await cache.aget(key)
+            if value is not None:
+                self._remember(key, value)
+        return value
+
+    async def aset(self, key, value):
+        await cache.aset(key, value, timeout=self.timeout)
+        self._remember(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def _recall(self, key):
+        with self._lock:
+            if key in self._local:
+                self._local.move_to_end(key)
+                return self._local[key]
+        return None
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
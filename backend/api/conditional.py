@@ -0,0 +1,154 @@
+"""
+Conditional GET from version stamps.
+
+A stamp is a per-scope number in the cache, bumped whenever something
+rendered under that scope changes (see the signal handlers of each app).
+Bumping moves it to the current time in nanoseconds, or by one when the
+clock is behind, so it is both a version and a modification time.
+
+``conditional(get_scopes)`` decorates a viewset action. The ETag is a hash
+of the URL, the renderer and the stamps of the scopes the action depends
+on; ``Last-Modified`` is the newest of those stamps. Both are checked by
+Django's ``condition`` before the action runs, so a ``304 Not Modified``
+costs a single cache round-trip and never reaches the serializer.
+
+``aconditional_response`` does the same for the async views of api/asgi.py,
+with the same validators.
+
+Stamps live in the default cache, which must be shared by every worker
+(see ``CACHES`` in settings). In a per-process cache a bump only moves the
+stamp of the process that made the write; the others keep answering
+``304`` to their old ETags.
+"""
+
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from api.cache import aget_many
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+STAMP_TIMEOUT = 60 * 60 * 24
+
+
+def _key(scope):
+    return f"stamp:{scope}"
+
+
+def get_stamps(scopes):
+    """Return ``{scope: stamp}``, starting missing stamps at the current time."""
+    keys = {_key(scope): scope for scope in scopes}
+    found = cache.get_many(list(keys))
+    for key in keys.keys() - found.keys():
+        # A stamp lost from the cache restarts at "now", which never
+        # matches a validator issued before.
+        cache.add(key, time.time_ns(), timeout=STAMP_TIMEOUT)
+        found[key] = cache.get(key)
+    return {keys[key]: stamp for key, stamp in found.items()}
+
+
+async def aget_stamps(scopes):
+    """``get_stamps`` for async views."""
+    keys = {_key(scope): scope for scope in scopes}
+    found = await aget_many(list(keys))
+    for key in keys.keys() - found.keys():
+        await cache.aadd(key, time.time_ns(), timeout=STAMP_TIMEOUT)
+        found[key] = await cache.aget(key)
+    return {keys[key]: stamp for key, stamp in found.items()}
+
+
+def bump(*scopes):
+    """Mark everything rendered under ``scopes`` as changed."""
+    now = time.time_ns()
+    for key in map(_key, scopes):
+        stamp = cache.get(key)
+        try:
+            cache.incr(key, max(1, now - stamp) if stamp is not None else 1)
+        except ValueError:
+            cache.set(key, now, timeout=STAMP_TIMEOUT)
+
+
+def bump_on_commit(*scopes):
+    """
+    ``bump`` once the current transaction commits, so that no request can
+    read the old rows after the stamp moved.
+    """
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def request_stamps(request, scopes):
+    """``get_stamps`` for ``scopes``, read at most once per request."""
+    if not hasattr(request, "_stamps"):
+        request._stamps = {}
+    scopes = tuple(scopes)
+    if scopes not in request._stamps:
+        request._stamps[scopes] = get_stamps(scopes)
+    return request._stamps[scopes]
+
+
+def conditional(get_scopes):
+    """
+    Method decorator answering conditional GETs for a viewset action.
+
+    ``get_scopes(request, *args, **kwargs)`` returns the scopes the response
+    depends on, or ``None`` to skip the validators.
+    """
+
+    def load(request, *args, **kwargs):
+        if not hasattr(request, "_scopes"):
+            request._scopes = get_scopes(request, *args, **kwargs)
+        if not request._scopes:
+            return None
+        return request_stamps(request, request._scopes)
+
+    def etag(request, *args, **kwargs):
+        stamps = load(request, *args, **kwargs)
+        if stamps is None:
+            return None
+        return stamps_etag(
+            request.accepted_renderer.format, request.get_full_path(), stamps
+        )
+
+    def last_modified(request, *args, **kwargs):
+        stamps = load(request, *args, **kwargs)
+        if stamps is None:
+            return None
+        return stamps_last_modified(stamps)
+
+    return method_decorator(condition(etag_func=etag, last_modified_func=last_modified))
+
+
+def stamps_etag(renderer_format, full_path, stamps):
+    parts = [renderer_format, full_path]
+    parts.extend(f"{scope}={stamps[scope]}" for scope in sorted(stamps))
+    digest = hashlib.md5("\n".join(parts).encode(), usedforsecurity=False)
+    return digest.hexdigest()
+
+
+def stamps_last_modified(stamps):
+    return datetime.fromtimestamp(max(stamps.values()) / 1e9, tz=timezone.utc)
+
+
+async def aconditional_response(request, scopes, get_response):
+    """
+    Answer a conditional GET in an async view from the stamps of ``scopes``,
+    or return ``await get_response()`` with the validators set. Matches
+    what ``conditional`` does for the JSON renderer.
+    """
+    stamps = await aget_stamps(scopes)
+    # For request_stamps in get_response.
+    request._stamps = {tuple(scopes): stamps}
+    etag = quote_etag(stamps_etag("json", request.get_full_path(), stamps))
+    last_modified = int(stamps_last_modified(stamps).timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = await get_response()
+    response.headers.setdefault("Last-Modified", http_date(last_modified))
+    response.headers.setdefault("ETag", etag)
+    return response
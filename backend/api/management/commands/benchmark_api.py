@@ -0,0 +1,217 @@
+import json
+import random
+import statistics
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from rest_framework.views import APIView
+from subreddits.models import Subreddit
+
+SCENARIOS = [
+    "posts_list",
+    "posts_hot",
+    "posts_trending",
+    "posts_search",
+    "subreddit_detail",
+    "auth_login",
+    "auth_me",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the real URLconf with concurrent requests and report "
+        "throughput, latency percentiles and queries per request. Meant "
+        "for a database filled by seed_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios",
+            nargs="*",
+            help=f"Any of {', '.join(SCENARIOS)} (default: all).",
+        )
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--warmup", type=int, default=20)
+        parser.add_argument("--prefix", default="seed")
+        parser.add_argument("--password", default="password")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--throttle",
+            action="store_true",
+            help="Keep the API throttles on (they are disabled by default).",
+        )
+        parser.add_argument("--output", help="Write the results as JSON here.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        scenarios = options["scenarios"] or SCENARIOS
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        self.username = f"{options['prefix']}_user_0"
+        self.host = self.get_host()
+
+        subreddit_ids = list(
+            Subreddit.objects.filter(name__startswith=f"{options['prefix']}_")
+            .order_by("pk")
+            .values_list("pk", flat=True)[:100]
+        )
+        if not subreddit_ids:
+            raise CommandError("No seeded subreddits found; run seed_data first.")
+        self.subreddit_ids = subreddit_ids
+
+        throttle_classes = APIView.throttle_classes
+        if not options["throttle"]:
+            APIView.throttle_classes = []
+        try:
+            results = {name: self.run(name) for name in dict.fromkeys(scenarios)}
+        finally:
+            APIView.throttle_classes = throttle_classes
+
+        report = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "commit": self.get_commit(),
+            "database": connection.vendor,
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "scenarios": results,
+        }
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<18} {result['throughput']:>8.1f} req/s  "
+                f"p50 {result['p50_ms']:>7.1f} ms  "
+                f"p95 {result['p95_ms']:>7.1f} ms  "
+                f"p99 {result['p99_ms']:>7.1f} ms  "
+                f"{result['queries_per_request']:>5.1f} queries  "
+                f"{result['errors']} errors"
+            )
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def run(self, name):
+        concurrency = self.options["concurrency"]
+        total = self.options["requests"]
+        latencies, queries, errors = [], [], []
+        lock = threading.Lock()
+
+        def worker(index):
+            rng = random.Random(self.options["seed"] * 1000 + index)
+            client = Client(HTTP_HOST=self.host)
+            counter = QueryCounter()
+            try:
+                token = self.login(client) if name == "auth_me" else None
+                share = total // concurrency + (index < total % concurrency)
+                for i in range(self.options["warmup"] // concurrency + share):
+                    counter.count = 0
+                    start = time.perf_counter()
+                    with connection.execute_wrapper(counter):
+                        response = self.request(name, client, rng, token)
+                    elapsed = time.perf_counter() - start
+                    if i < self.options["warmup"] // concurrency:
+                        continue
+                    with lock:
+                        latencies.append(elapsed)
+                        queries.append(counter.count)
+                        if response.status_code >= 400:
+                            errors.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(index,))
+            for index in range(concurrency)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+        if len(latencies) < 2:
+            raise CommandError(f"{name}: not enough requests to report on.")
+        percentiles = statistics.quantiles(latencies, n=100)
+        return {
+            "requests": len(latencies),
+            "errors": len(errors),
+            "throughput": len(latencies) / wall,
+            "mean_ms": statistics.fmean(latencies) * 1000,
+            "p50_ms": percentiles[49] * 1000,
+            "p95_ms": percentiles[94] * 1000,
+            "p99_ms": percentiles[98] * 1000,
+            "queries_per_request": statistics.fmean(queries),
+        }
+
+    def request(self, name, client, rng, token):
+        if name == "posts_list":
+            return client.get(reverse("post-list"))
+        if name == "posts_hot":
+            return client.get(reverse("post-hot"))
+        if name == "posts_trending":
+            return client.get(reverse("post-trending"))
+        if name == "posts_search":
+            return client.get(
+                reverse("post-list"), {"search": rng.choice(SEARCH_TERMS)}
+            )
+        if name == "subreddit_detail":
+            # Popular subreddits (lowest ids) are requested the most.
+            pk = self.subreddit_ids[
+                min(int(rng.paretovariate(1.2)) - 1, len(self.subreddit_ids) - 1)
+            ]
+            return client.get(reverse("subreddit-detail", kwargs={"pk": pk}))
+        if name == "auth_login":
+            return self.post_login(client)
+        if name == "auth_me":
+            return client.get(reverse("auth_me"), HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def post_login(self, client):
+        return client.post(
+            reverse("auth_login"),
+            {"username": self.username, "password": self.options["password"]},
+            content_type="application/json",
+        )
+
+    def login(self, client):
+        response = self.post_login(client)
+        if response.status_code != 200:
+            raise CommandError(f"Could not log in as {self.username}.")
+        return response.json()["access"]
+
+    def get_host(self):
+        hosts = [host.lstrip(".") for host in settings.ALLOWED_HOSTS if host != "*"]
+        return hosts[0] if hosts else "localhost"
+
+    def get_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+
+SEARCH_TERMS = ["python", "django cache", "feed", "query index", "release"]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
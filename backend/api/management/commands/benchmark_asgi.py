@@ -0,0 +1,258 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from api.cache import ProcessLocalCache
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from django.urls import reverse
+from posts.models import Post
+from rest_framework.views import APIView
+from subreddits.models import Subreddit
+
+SCENARIOS = ["posts_list", "post_detail", "posts_trending", "subreddit_detail"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the WSGI handler, on a pool of --threads threads, with the "
+        "ASGI handler and its async read path (api/asgi.py) under "
+        "--concurrency clients, with --latency-ms added to every SQL query "
+        "and cache call. Meant for a database filled by seed_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios",
+            nargs="*",
+            help=f"Any of {', '.join(SCENARIOS)} (default: all).",
+        )
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=64)
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=8,
+            help="Threads of the simulated WSGI server.",
+        )
+        parser.add_argument("--latency-ms", type=float, default=5.0)
+        parser.add_argument("--prefix", default="seed")
+
+    def handle(self, *args, **options):
+        self.options = options
+        scenarios = options["scenarios"] or SCENARIOS
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        self.subreddit_ids = list(
+            Subreddit.objects.filter(name__startswith=f"{options['prefix']}_")
+            .order_by("pk")
+            .values_list("pk", flat=True)[:100]
+        )
+        self.post_ids = list(
+            Post.objects.filter(subreddit__in=self.subreddit_ids)
+            .order_by("-pk")
+            .values_list("pk", flat=True)[:100]
+        )
+        if not self.subreddit_ids or not self.post_ids:
+            raise CommandError("No seeded posts found; run seed_data first.")
+
+        latency = options["latency_ms"] / 1000
+        slow_cache = {
+            alias: {**config, "BACKEND": f"{__name__}.SlowLocMemCache"}
+            for alias, config in settings.CACHES.items()
+        }
+        throttle_classes = APIView.throttle_classes
+        APIView.throttle_classes = []
+        SlowLocMemCache.latency = latency
+        connection_created.connect(self.add_latency)
+        try:
+            # The host the requests are sent to, as under the test runner.
+            with override_settings(
+                CACHES=slow_cache,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            ):
+                for name in dict.fromkeys(scenarios):
+                    for mode in ("wsgi", "asgi"):
+                        result = asyncio.run(self.run(name, mode))
+                        self.report(name, mode, result)
+        finally:
+            connection_created.disconnect(self.add_latency)
+            APIView.throttle_classes = throttle_classes
+
+    def report(self, name, mode, result):
+        self.stdout.write(
+            f"{name:<18} {mode} {result['throughput']:>8.1f} req/s  "
+            f"p50 {result['p50_ms']:>7.1f} ms  "
+            f"p95 {result['p95_ms']:>7.1f} ms  "
+            f"{result['errors']} errors"
+        )
+
+    async def run(self, name, mode):
+        total = self.options["requests"]
+        concurrency = self.options["concurrency"]
+        latencies, errors = [], []
+        urls = self.urls(name)
+
+        # The handlers themselves rather than the test clients, which run
+        # every ASGI request's sync code in one shared thread.
+        if mode == "wsgi":
+            pool = ThreadPoolExecutor(self.options["threads"])
+            loop = asyncio.get_running_loop()
+            application = get_wsgi_application()
+
+            async def get(url):
+                return await loop.run_in_executor(pool, wsgi_get, application, url)
+
+        else:
+            pool = None
+            application = get_asgi_application()
+
+            async def get(url):
+                return await asgi_get(application, url)
+
+        async def worker(index):
+            for i in range(index, total, concurrency):
+                start = time.perf_counter()
+                status_code = await get(urls[i % len(urls)])
+                latencies.append(time.perf_counter() - start)
+                if status_code >= 400:
+                    errors.append(status_code)
+
+        # Fills the caches, so both handlers are measured warm.
+        for url in urls:
+            await get(url)
+
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(worker(index) for index in range(concurrency)))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        wall = time.perf_counter() - start
+
+        if len(latencies) < 2:
+            raise CommandError(f"{name}: not enough requests to report on.")
+        percentiles = statistics.quantiles(latencies, n=100)
+        return {
+            "requests": len(latencies),
+            "errors": len(errors),
+            "throughput": len(latencies) / wall,
+            "p50_ms": percentiles[49] * 1000,
+            "p95_ms": percentiles[94] * 1000,
+        }
+
+    def urls(self, name):
+        if name == "posts_list":
+            return [reverse("post-list")]
+        if name == "post_detail":
+            return [reverse("post-detail", kwargs={"pk": pk}) for pk in self.post_ids]
+        if name == "posts_trending":
+            return [reverse("post-trending")]
+        if name == "subreddit_detail":
+            return [
+                reverse("subreddit-detail", kwargs={"pk": pk})
+                for pk in self.subreddit_ids
+            ]
+
+    def add_latency(self, sender, connection, **kwargs):
+        latency = self.options["latency_ms"] / 1000
+
+        def slow_execute(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        connection.execute_wrappers.append(slow_execute)
+
+
+def wsgi_get(application, url):
+    path, _, query = url.partition("?")
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "SERVER_NAME": "testserver",
+        "SERVER_PORT": "80",
+        "HTTP_HOST": "testserver",
+        "wsgi.input": BytesIO(),
+        "wsgi.url_scheme": "http",
+    }
+    status = []
+    body = application(environ, lambda code, headers: status.append(code))
+    try:
+        b"".join(body)
+    finally:
+        body.close()
+    return int(status[0].split()[0])
+
+
+async def asgi_get(application, url):
+    path, _, query = url.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "query_string": query.encode(),
+        "headers": [(b"host", b"testserver")],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+    status = []
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            # No disconnect; the handler cancels this once it has answered.
+            await asyncio.Future()
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+class SlowLocMemCache(ProcessLocalCache):
+    """A local memory cache that answers like a cache across the network."""
+
+    latency = 0
+
+    def add(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super().add(*args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super().get(*args, **kwargs)
+
+    def get_many(self, keys, version=None):
+        # One round-trip, rather than one per key through get().
+        time.sleep(self.latency)
+        found = {}
+        for key in keys:
+            value = super().get(key, version=version)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super().set(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super().delete(*args, **kwargs)
@@ -0,0 +1,214 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from api.conditional import bump
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from posts.feed import LARGE_SUBREDDITS_CACHE_KEY
+from posts.models import Post
+from posts.ranking import hot_score
+from posts.search import get_search_engine
+from subreddits.models import Membership, Rule, Subreddit
+from users import karma
+
+User = get_user_model()
+
+WORDS = (
+    "python django api database index query cache latency throughput "
+    "serializer cursor feed vote karma thread comment search rank hot new "
+    "moderator rule subreddit post link media upload release bug fix"
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generate a synthetic dataset for benchmarks: users, subreddits "
+        "whose membership follows a Zipf-like skew, and posts spread the "
+        "same way. The same --seed always generates the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument("--subreddits", type=int, default=500)
+        parser.add_argument("--posts", type=int, default=1_000_000)
+        parser.add_argument(
+            "--joins-per-user",
+            type=int,
+            default=10,
+            help="Average number of subreddits each user joins.",
+        )
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.1,
+            help="Zipf exponent of subreddit popularity.",
+        )
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument("--prefix", default="seed")
+        parser.add_argument("--password", default="password")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5_000)
+        parser.add_argument("--skip-search-index", action="store_true")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.prefix = options["prefix"]
+        self.batch_size = options["batch_size"]
+        self.now = timezone.now()
+
+        user_ids = self.create_users(options["users"], options["password"])
+        subreddit_ids = self.create_subreddits(options["subreddits"], user_ids)
+
+        # Subreddit i is picked with weight 1 / (i + 1) ** skew.
+        weights = [1 / (i + 1) ** options["skew"] for i in range(len(subreddit_ids))]
+        cum_weights = list(accumulate(weights))
+        members = self.create_memberships(
+            user_ids, subreddit_ids, cum_weights, options["joins_per_user"]
+        )
+        self.create_posts(
+            options["posts"], subreddit_ids, cum_weights, members, options["days"]
+        )
+
+        if not options["skip_search_index"]:
+            self.stdout.write("Rebuilding the search index...")
+            get_search_engine().rebuild(batch_size=self.batch_size)
+
+        self.stdout.write("Computing karma...")
+        for bounds in karma.user_id_ranges(self.batch_size):
+            karma.recompute(*bounds)
+
+        # Rows were bulk-inserted, so no signal handler saw them.
+        cache.delete(LARGE_SUBREDDITS_CACHE_KEY)
+        bump("posts", "subreddits", "users")
+        self.stdout.write(self.style.SUCCESS("Done."))
+
+    def create_users(self, count, password):
+        self.stdout.write(f"Creating {count} users...")
+        # Hashing is deliberately slow; every seeded user shares one hash.
+        password = make_password(password)
+        user_ids = []
+        for start in range(0, count, self.batch_size):
+            users = User.objects.bulk_create(
+                User(
+                    username=f"{self.prefix}_user_{i}",
+                    email=f"{self.prefix}_user_{i}@example.com",
+                    password=password,
+                )
+                for i in range(start, min(start + self.batch_size, count))
+            )
+            user_ids.extend(user.pk for user in users)
+        return user_ids
+
+    def create_subreddits(self, count, user_ids):
+        self.stdout.write(f"Creating {count} subreddits...")
+        subreddits = Subreddit.objects.bulk_create(
+            Subreddit(
+                name=f"{self.prefix}_{i}",
+                description=self.sentence(12),
+                owner_id=self.rng.choice(user_ids),
+            )
+            for i in range(count)
+        )
+
+        Subreddit.moderators.through.objects.bulk_create(
+            Subreddit.moderators.through(
+                subreddit_id=subreddit.pk, customuser_id=subreddit.owner_id
+            )
+            for subreddit in subreddits
+        )
+        Rule.objects.bulk_create(
+            Rule(
+                subreddit=subreddit,
+                title=self.sentence(4),
+                description=self.sentence(15),
+            )
+            for subreddit in subreddits
+            for _ in range(3)
+        )
+        return [subreddit.pk for subreddit in subreddits]
+
+    def create_memberships(self, user_ids, subreddit_ids, cum_weights, joins):
+        self.stdout.write("Creating memberships...")
+        members = {pk: [] for pk in subreddit_ids}
+        batch = []
+        for user_id in user_ids:
+            count = min(
+                len(subreddit_ids), max(1, int(self.rng.expovariate(1 / joins)))
+            )
+            joined = set(
+                self.rng.choices(subreddit_ids, cum_weights=cum_weights, k=count)
+            )
+            for subreddit_id in joined:
+                members[subreddit_id].append(user_id)
+                batch.append(Membership(subreddit_id=subreddit_id, user_id=user_id))
+            if len(batch) >= self.batch_size:
+                Membership.objects.bulk_create(batch)
+                batch = []
+        Membership.objects.bulk_create(batch)
+        Subreddit.objects.bulk_update(
+            [Subreddit(pk=pk, member_count=len(ids)) for pk, ids in members.items()],
+            ["member_count"],
+            batch_size=self.batch_size,
+        )
+        return members
+
+    def create_posts(self, count, subreddit_ids, cum_weights, members, days):
+        self.stdout.write(f"Creating {count} posts...")
+        all_members = [user_id for ids in members.values() for user_id in ids]
+        span = days * 24 * 60 * 60
+
+        with explicit_timestamps(Post, "created_at", "updated_at"):
+            for start in range(0, count, self.batch_size):
+                size = min(self.batch_size, count - start)
+                posts = []
+                for subreddit_id in self.rng.choices(
+                    subreddit_ids, cum_weights=cum_weights, k=size
+                ):
+                    created_at = self.now - timedelta(seconds=self.rng.uniform(0, span))
+                    vote_count = self.vote_count()
+                    posts.append(
+                        Post(
+                            subreddit_id=subreddit_id,
+                            owner_id=self.rng.choice(
+                                members[subreddit_id] or all_members
+                            ),
+                            title=self.sentence(8),
+                            body=self.sentence(60),
+                            created_at=created_at,
+                            updated_at=created_at,
+                            vote_count=vote_count,
+                            hot_score=hot_score(vote_count, created_at),
+                        )
+                    )
+                with transaction.atomic():
+                    Post.objects.bulk_create(posts)
+                self.stdout.write(f"  {start + size}/{count}")
+
+    def vote_count(self):
+        # Heavy-tailed: most posts get a handful of votes, a few go viral.
+        if self.rng.random() < 0.1:
+            return -int(self.rng.paretovariate(2))
+        return int(self.rng.paretovariate(1.2)) - 1
+
+    def sentence(self, words):
+        return " ".join(self.rng.choices(WORDS, k=words)).capitalize() + "."
+
+
+@contextmanager
+def explicit_timestamps(model, *names):
+    """Let bulk_create keep the given auto_now / auto_now_add values."""
+    fields = [model._meta.get_field(name) for name in names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
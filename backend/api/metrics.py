@@ -0,0 +1,241 @@
+"""
+Per-endpoint request metrics.
+
+``MetricsMiddleware`` samples ``METRICS_SAMPLE_RATE`` of the requests and
+records, for the view and action that handled each of them, the total
+latency, the number of SQL queries, the time spent in SQL and the time
+spent serializing. Each goes into a fixed-bucket histogram kept in
+process memory; ``/api/_metrics`` exposes them to staff users in the
+Prometheus text format.
+
+Histograms are per process: scrape every worker, or aggregate with the
+Prometheus ``sum()`` over instances.
+"""
+
+import contextvars
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.db import connections
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+METRICS = {
+    "request_duration_seconds": ("Total request latency.", LATENCY_BUCKETS),
+    "sql_queries": ("SQL queries per request.", QUERY_BUCKETS),
+    "sql_duration_seconds": ("Time spent in SQL per request.", LATENCY_BUCKETS),
+    "serializer_duration_seconds": (
+        "Time spent serializing per request.",
+        LATENCY_BUCKETS,
+    ),
+}
+
+_recorder = contextvars.ContextVar("metrics_recorder", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, values):
+        with self.lock:
+            for name, value in values.items():
+                key = (name, labels)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(METRICS[name][1])
+                self.histograms[key].observe(value)
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def export(self):
+        """Render every histogram in the Prometheus text format."""
+        with self.lock:
+            snapshot = {
+                key: (histogram.buckets, list(histogram.counts), histogram.sum)
+                for key, histogram in self.histograms.items()
+            }
+
+        lines = [
+            "# HELP api_metrics_sample_rate Fraction of the requests recorded.",
+            "# TYPE api_metrics_sample_rate gauge",
+            f"api_metrics_sample_rate {settings.METRICS_SAMPLE_RATE}",
+        ]
+        for name, (help_text, _) in METRICS.items():
+            lines.append(f"# HELP api_{name} {help_text}")
+            lines.append(f"# TYPE api_{name} histogram")
+            for (metric, labels), (buckets, counts, total) in sorted(snapshot.items()):
+                if metric != name:
+                    continue
+                labels = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+                cumulative = 0
+                for bound, count in zip((*buckets, "+Inf"), counts):
+                    cumulative += count
+                    lines.append(
+                        f'api_{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f"api_{name}_sum{{{labels}}} {total}")
+                lines.append(f"api_{name}_count{{{labels}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class Recorder:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+
+
+@contextmanager
+def serializer_timer():
+    """Count the enclosed block as serializer time of the current request."""
+    recorder = _recorder.get()
+    # Nested serializers are already inside the outermost timer.
+    if recorder is None or recorder.serializing:
+        yield
+        return
+
+    recorder.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.serializer_time += time.perf_counter() - start
+        recorder.serializing = False
+
+
+class TimedSerializerMixin:
+    """
+    Count ``to_representation`` as serializer time of the current request.
+    A ``many=True`` list is timed through its children, or as a whole if
+    its own class mixes this in too.
+    """
+
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        recorder = Recorder()
+        token = _recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                watch_queries(stack, recorder)
+                response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+
+        self.observe(request, recorder, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        recorder = Recorder()
+        token = _recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            stack = ExitStack()
+            # Connections are per thread: wrap those of the thread the
+            # request's ORM calls run in.
+            await sync_to_async(watch_queries)(stack, recorder)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _recorder.reset(token)
+
+        self.observe(request, recorder, time.perf_counter() - start)
+        return response
+
+    def observe(self, request, recorder, duration):
+        registry.observe(
+            _labels(request),
+            {
+                "request_duration_seconds": duration,
+                "sql_queries": recorder.queries,
+                "sql_duration_seconds": recorder.sql_time,
+                "serializer_duration_seconds": recorder.serializer_time,
+            },
+        )
+
+
+def watch_queries(stack, recorder):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+
+
+def _labels(request):
+    match = request.resolver_match
+    if match is None:
+        return (
+            ("route", "unmatched"),
+            ("view", ""),
+            ("action", ""),
+            ("method", request.method),
+        )
+
+    # ViewSet.as_view() records which action each method maps to.
+    view = getattr(match.func, "cls", None)
+    actions = getattr(match.func, "actions", None) or {}
+    return (
+        ("route", match.view_name or match.route),
+        ("view", view.__name__ if view else match._func_path),
+        ("action", actions.get(request.method.lower(), "")),
+        ("method", request.method),
+    )
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
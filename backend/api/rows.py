@@ -0,0 +1,211 @@
+"""
+Read-only list rendering straight from ``.values()`` rows.
+
+``ModelSerializer(many=True)`` instantiates a model per row, walks the
+field declarations of every nested serializer for every row and loads
+related objects attribute by attribute. For large read-only listings
+``ValuesSerializer`` compiles a serializer class once into a flat plan of
+``(output key, values() column, converter)`` entries and renders plain
+dict rows with it. The output is identical to the serializer's own
+``to_representation``, down to fields whose dotted source crosses a null
+relation: they are left out, defaulted or null, as ``Field.get_attribute``
+decides. Serializers using fields the plan cannot reproduce are rejected
+when the plan is compiled. A custom field can take part by defining
+``values_converter(request)``, returning a function of the column value.
+"""
+
+import datetime
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework import fields, relations, serializers
+from rest_framework.fields import SkipField, empty
+from rest_framework.settings import api_settings
+
+from .metrics import serializer_timer
+
+# Fields whose representation of a database value is the value itself.
+PLAIN_FIELDS = (
+    fields.BooleanField,
+    fields.CharField,
+    fields.ChoiceField,
+    fields.FloatField,
+    fields.IntegerField,
+    fields.ReadOnlyField,
+    relations.PrimaryKeyRelatedField,
+)
+
+
+class ValuesSerializer:
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def plan(self):
+        # Compiled on first use, once the app registry is ready.
+        return self.compile(self.serializer_class(), prefix="")
+
+    @cached_property
+    def columns(self):
+        """The ``values()`` columns ``render`` reads from every row."""
+        return list(dict.fromkeys(_columns(self.plan)))
+
+    def values(self, queryset, *extra):
+        """``queryset`` as rows with every column needed, plus ``extra``."""
+        return queryset.values(
+            *dict.fromkeys([*self.columns, *extra, *queryset.query.annotations])
+        )
+
+    def compile(self, serializer, prefix):
+        plan = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == "*":
+                raise ImproperlyConfigured(
+                    f"{self.serializer_class.__name__}.{name}: source='*' "
+                    "cannot be read from a values() row."
+                )
+            column = prefix + "__".join(field.source_attrs)
+            # For "owner.username", the "owner" foreign key, to tell a null
+            # relation apart from a null value.
+            path = [
+                prefix + "__".join(field.source_attrs[: i + 1])
+                for i in range(len(field.source_attrs) - 1)
+            ]
+            guard = (path, _missing(field)) if path else None
+
+            if isinstance(field, serializers.BaseSerializer):
+                if getattr(field, "many", False):
+                    raise ImproperlyConfigured(
+                        f"{self.serializer_class.__name__}.{name}: many=True "
+                        "cannot be read from a values() row."
+                    )
+                nested = self.compile(field, prefix=f"{column}__")
+                plan.append((name, column, None, nested, guard))
+            elif hasattr(field, "values_converter"):
+                # Fields that know how to render a raw column value.
+                plan.append((name, column, field.values_converter, None, guard))
+            elif isinstance(field, fields.DateTimeField):
+                plan.append((name, column, _datetime_converter(field), None, guard))
+            elif isinstance(field, fields.FileField):
+                plan.append((name, column, _file_converter(field), None, guard))
+            elif isinstance(field, PLAIN_FIELDS):
+                plan.append((name, column, None, None, guard))
+            else:
+                raise ImproperlyConfigured(
+                    f"{self.serializer_class.__name__}.{name}: "
+                    f"{type(field).__name__} is not supported."
+                )
+        return plan
+
+    def render(self, rows, request=None):
+        """Return the representation of every row, like ``serializer.data``."""
+        with serializer_timer():
+            plan = self.bind(self.plan, request)
+            return [_render(plan, row) for row in rows]
+
+    def bind(self, plan, request):
+        # Converters depend on the request and the active timezone, so they
+        # are resolved once per call rather than once per value.
+        return [
+            (
+                name,
+                column,
+                converter(request) if converter else None,
+                self.bind(nested, request) if nested else None,
+                guard,
+            )
+            for name, column, converter, nested, guard in plan
+        ]
+
+
+def _columns(plan):
+    for _, column, _, nested, guard in plan:
+        if guard is not None:
+            yield from guard[0]
+        # For a nested serializer the column is the foreign key, needed to
+        # tell a null relation apart.
+        yield column
+        if nested is not None:
+            yield from _columns(nested)
+
+
+def _missing(field):
+    # What Field.get_attribute gives when the source path hits a None.
+    def missing():
+        if field.default is not empty:
+            return field.get_default()
+        if field.allow_null:
+            return None
+        if not field.required:
+            raise SkipField()
+        raise AttributeError(
+            f"{field.field_name}: source {field.source!r} crosses a null relation."
+        )
+
+    return missing
+
+
+def _render(plan, row):
+    data = {}
+    for name, column, convert, nested, guard in plan:
+        if guard is not None and any(row[relation] is None for relation in guard[0]):
+            try:
+                data[name] = guard[1]()
+            except SkipField:
+                pass
+            continue
+        if nested is not None:
+            data[name] = None if row[column] is None else _render(nested, row)
+            continue
+        value = row[column]
+        data[name] = value if convert is None or value is None else convert(value)
+    return data
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != fields.ISO_8601:
+        raise ImproperlyConfigured(
+            f"{field.field_name}: only ISO 8601 datetimes are supported."
+        )
+
+    def bind(request):
+        field_timezone = (
+            field.timezone if hasattr(field, "timezone") else field.default_timezone()
+        )
+
+        def convert(value):
+            # Same conversion as DateTimeField.to_representation.
+            if field_timezone is not None:
+                value = value.astimezone(field_timezone)
+            elif timezone.is_aware(value):
+                value = timezone.make_naive(value, datetime.timezone.utc)
+            value = value.isoformat()
+            if value.endswith("+00:00"):
+                value = value[:-6] + "Z"
+            return value
+
+        return convert
+
+    return bind
+
+
+def _file_converter(field):
+    use_url = getattr(field, "use_url", api_settings.UPLOADED_FILES_USE_URL)
+    storage = field.parent.Meta.model._meta.get_field(field.source).storage
+
+    def bind(request):
+        def convert(name):
+            if not name:
+                return None
+            if not use_url:
+                return name
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        return convert
+
+    return bind
@@ -0,0 +1,669 @@
+import json
+import os
+import tempfile
+import traceback
+from io import StringIO
+from pathlib import Path
+
+from comments.models import Comment
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from posts.feed import fan_out
+from posts.models import Post
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import RefreshToken
+from subreddits.models import Rule, Subreddit
+from uploads import storage
+from uploads.models import UploadSession
+from uploads.views import CHUNK_CONTENT_TYPE
+
+from .budgets import QUERY_BUDGETS
+from .metrics import registry
+from .throttling import STORES
+
+User = get_user_model()
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.staff = User.objects.create_user(
+            username="staff",
+            password="password123",
+            email="staff@example.com",
+            is_staff=True,
+        )
+        self.url = reverse("metrics")
+
+    def test_only_staff_can_read_metrics(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        user = User.objects.create_user(
+            username="user", password="password123", email="user@example.com"
+        )
+        self.client.force_authenticate(user=user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_actions_are_recorded(self):
+        self.client.get(reverse("post-list"))
+        self.client.get(reverse("post-list"))
+        self.client.get(reverse("post-trending"))
+
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+
+        text = response.content.decode()
+        labels = 'route="post-list",view="PostViewSet",action="list",method="GET"'
+        self.assertIn(f"api_request_duration_seconds_count{{{labels}}} 2", text)
+        self.assertIn(f'api_sql_queries_bucket{{{labels},le="1"}} 2', text)
+        self.assertIn(f"api_serializer_duration_seconds_count{{{labels}}} 2", text)
+        self.assertIn('view="PostViewSet",action="trending"', text)
+
+    def test_model_serializers_are_timed(self):
+        subreddit = Subreddit.objects.create(name="timed", owner=self.staff)
+        Rule.objects.create(subreddit=subreddit, title="Be nice", description="...")
+        self.client.force_authenticate(user=self.staff)
+        self.client.get(reverse("subreddit-detail", kwargs={"pk": subreddit.pk}))
+
+        labels = (
+            ("route", "subreddit-detail"),
+            ("view", "SubredditViewSet"),
+            ("action", "retrieve"),
+            ("method", "GET"),
+        )
+        histogram = registry.histograms[("serializer_duration_seconds", labels)]
+        self.assertGreater(histogram.sum, 0)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_recorded(self):
+        self.client.get(reverse("post-list"))
+        self.assertEqual(registry.histograms, {})
+
+
+class ThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        STORES["memory"].clear()
+        self.user = User.objects.create_user(
+            username="throttled", password="password123", email="t@example.com"
+        )
+
+    def test_stores_allow_a_burst_then_one_request_per_interval(self):
+        for name, store in STORES.items():
+            with self.subTest(store=name):
+                key = f"throttle:test:{name}"
+                for _ in range(3):
+                    self.assertIsNone(store.update(key, 1, 3, 1000))
+                self.assertAlmostEqual(store.update(key, 1, 3, 1000), 1)
+                # Rejected requests are not counted.
+                self.assertIsNone(store.update(key, 1, 3, 1001))
+                self.assertIsNotNone(store.update(key, 1, 3, 1001))
+                # Idle clients get their burst back.
+                for _ in range(3):
+                    self.assertIsNone(store.update(key, 1, 3, 1100))
+
+    def test_reads_writes_and_logins_are_limited_apart(self):
+        rates = {
+            "anon": "1/minute",
+            "user": "2/minute",
+            "write": "1/minute",
+            "auth": "1/minute",
+        }
+        with override_settings(
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}
+        ):
+            url = reverse("post-list")
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertIn("Retry-After", response)
+
+            login = {"username": "throttled", "password": "password123"}
+            response = self.client.post(reverse("auth_login"), login)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = self.client.post(reverse("auth_login"), login)
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+            self.client.force_authenticate(user=self.user)
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+            response = self.client.post(url, {})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            response = self.client.post(url, {})
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class SeedDataTests(TestCase):
+    def test_generates_skewed_dataset(self):
+        call_command(
+            "seed_data",
+            users=50,
+            subreddits=5,
+            posts=200,
+            batch_size=40,
+            skip_search_index=True,
+            stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Post.objects.count(), 200)
+
+        subreddits = list(
+            Subreddit.objects.order_by("pk").annotate(
+                members_counted=Count("members", distinct=True),
+                post_count=Count("posts", distinct=True),
+            )
+        )
+        for subreddit in subreddits:
+            self.assertEqual(subreddit.member_count, subreddit.members_counted)
+        # The first subreddits are the popular ones.
+        self.assertGreater(subreddits[0].member_count, subreddits[-1].member_count)
+        self.assertGreater(subreddits[0].post_count, subreddits[-1].post_count)
+        self.assertEqual(Post.objects.filter(created_at__gt=timezone.now()).count(), 0)
+
+
+class QueryRecorder:
+    """Execute wrapper keeping every query with the code that issued it."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, call_sites(traceback.extract_stack()[:-1])))
+        return execute(sql, params, many, context)
+
+    def report(self):
+        lines = []
+        for index, (sql, sites) in enumerate(self.queries, 1):
+            lines.append(f"{index}. {sql[:200]}")
+            lines.extend(f"     {site}" for site in sites)
+        return "\n".join(lines)
+
+
+def call_sites(stack, limit=3):
+    """
+    The innermost project frames of ``stack``, or of the installed packages
+    other than Django for queries the project code did not issue itself.
+    """
+    base = str(settings.BASE_DIR)
+    project = [
+        frame
+        for frame in stack
+        if frame.filename.startswith(base)
+        and "site-packages" not in frame.filename
+        and not frame.filename.endswith(("manage.py", "tests.py", "metrics.py"))
+    ]
+    if not project:
+        project = [
+            frame
+            for frame in stack
+            if "site-packages" in frame.filename
+            and f"site-packages{os.sep}django{os.sep}" not in frame.filename
+        ]
+    return [
+        f"{frame.filename.removeprefix(base + os.sep).split('site-packages' + os.sep)[-1]}"
+        f":{frame.lineno} in {frame.name}"
+        for frame in reversed(project[-limit:])
+    ]
+
+
+def api_actions():
+    """Every ``View.action`` key the URLconf routes to a DRF view."""
+    keys = set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+                continue
+            view = getattr(pattern.callback, "cls", None)
+            if view is None or not issubclass(view, APIView):
+                continue
+            actions = getattr(pattern.callback, "actions", None)
+            if actions:
+                keys.update(f"{view.__name__}.{action}" for action in actions.values())
+            else:
+                keys.update(
+                    f"{view.__name__}.{method}"
+                    for method in view.http_method_names
+                    if method != "options" and hasattr(view, method)
+                )
+
+    walk(get_resolver().url_patterns)
+    return keys
+
+
+class QueryBudgetTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        root = Path(cls.enterClassContext(tempfile.TemporaryDirectory()))
+        cls.enterClassContext(
+            override_settings(
+                MEDIA_ROOT=root / "media", UPLOAD_STAGING_ROOT=root / "staging"
+            )
+        )
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            "seed_data",
+            users=40,
+            subreddits=4,
+            posts=80,
+            prefix="budget",
+            stdout=StringIO(),
+        )
+        cls.owner = User.objects.create_user(
+            username="owner", password="password123", email="owner@example.com"
+        )
+        cls.member = User.objects.create_user(
+            username="member", password="password123", email="member@example.com"
+        )
+        cls.staff = User.objects.create_user(
+            username="budgetstaff",
+            password="password123",
+            email="budgetstaff@example.com",
+            is_staff=True,
+        )
+        cls.subreddit = Subreddit.objects.create(name="budgets", owner=cls.owner)
+        cls.subreddit.moderators.add(cls.owner, cls.member)
+        cls.subreddit.members.add(cls.owner, cls.member)
+        cls.rule = Rule.objects.create(subreddit=cls.subreddit, title="Rule")
+        cls.posts = [
+            Post.objects.create(
+                subreddit=cls.subreddit, owner=cls.member, title=f"Post {i}", body="."
+            )
+            for i in range(12)
+        ]
+        cls.post = cls.posts[0]
+        comment = None
+        for i in range(10):
+            comment = Comment.objects.create(
+                post=cls.post, owner=cls.member, body=f"Comment {i}", parent=comment
+            )
+        cls.comment = comment
+        fan_out(cls.posts)
+        # One upload half way through, one with every byte in.
+        cls.uploads = []
+        for offset in [4, 8]:
+            upload = UploadSession.objects.create(
+                owner=cls.member,
+                filename="budget.gif",
+                content_type="image/gif",
+                size=8,
+                offset=offset,
+            )
+            path = storage.staging_path(upload)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"x" * offset)
+            cls.uploads.append(upload)
+
+    def scenarios(self):
+        post = {"pk": self.post.pk}
+        comment = {"post_pk": self.post.pk, "pk": self.comment.pk}
+        subreddit = {"pk": self.subreddit.pk}
+        nested = {"subreddit_pk": self.subreddit.pk}
+        rule = {"subreddit_pk": self.subreddit.pk, "pk": self.rule.pk}
+        new_post = {"subreddit_id": self.subreddit.pk, "title": "New", "body": "."}
+        refresh = str(RefreshToken.for_user(self.member))
+        upload = {"pk": self.uploads[0].pk}
+        # (action, method, url name or path, url kwargs, user, data)
+        return [
+            ("PostViewSet.list", "get", "post-list", {}, None, None),
+            ("PostViewSet.retrieve", "get", "post-detail", post, None, None),
+            ("PostViewSet.hot", "get", "post-hot", {}, None, None),
+            ("PostViewSet.trending", "get", "post-trending", {}, None, None),
+            ("PostViewSet.feed", "get", "post-feed", {}, self.member, None),
+            ("PostViewSet.create", "post", "post-list", {}, self.member, new_post),
+            ("PostViewSet.update", "put", "post-detail", post, self.member, new_post),
+            (
+                "PostViewSet.partial_update",
+                "patch",
+                "post-detail",
+                post,
+                self.member,
+                {"title": "Edited", "body": "."},
+            ),
+            ("PostViewSet.destroy", "delete", "post-detail", post, self.member, None),
+            ("PostViewSet.vote", "post", "post-vote", post, self.owner, {"value": 1}),
+            (
+                "PostViewSet.ingest",
+                "post",
+                "post-ingest",
+                {},
+                self.owner,
+                b"\n".join(json.dumps(new_post).encode() for _ in range(20)),
+            ),
+            (
+                "CommentViewSet.list",
+                "get",
+                "post-comments-list",
+                {"post_pk": self.post.pk},
+                None,
+                None,
+            ),
+            (
+                "CommentViewSet.retrieve",
+                "get",
+                "post-comments-detail",
+                comment,
+                None,
+                None,
+            ),
+            (
+                "CommentViewSet.create",
+                "post",
+                "post-comments-list",
+                {"post_pk": self.post.pk},
+                self.owner,
+                {"body": "Reply", "parent": self.comment.pk},
+            ),
+            (
+                "CommentViewSet.update",
+                "put",
+                "post-comments-detail",
+                comment,
+                self.member,
+                {"body": "Edited"},
+            ),
+            (
+                "CommentViewSet.partial_update",
+                "patch",
+                "post-comments-detail",
+                comment,
+                self.member,
+                {"body": "Edited"},
+            ),
+            (
+                "CommentViewSet.destroy",
+                "delete",
+                "post-comments-detail",
+                comment,
+                self.owner,
+                None,
+            ),
+            ("SubredditViewSet.list", "get", "subreddit-list", {}, None, None),
+            (
+                "SubredditViewSet.export",
+                "get",
+                "subreddit-export",
+                subreddit,
+                self.owner,
+                {"output": "csv"},
+            ),
+            (
+                "SubredditViewSet.retrieve",
+                "get",
+                "subreddit-detail",
+                subreddit,
+                None,
+                None,
+            ),
+            (
+                "SubredditViewSet.create",
+                "post",
+                "subreddit-list",
+                {},
+                self.member,
+                {"name": "fresh", "description": "."},
+            ),
+            (
+                "SubredditViewSet.update",
+                "put",
+                "subreddit-detail",
+                subreddit,
+                self.owner,
+                {"name": "budgets", "description": "Changed", "moderators": ["owner"]},
+            ),
+            (
+                "SubredditViewSet.partial_update",
+                "patch",
+                "subreddit-detail",
+                subreddit,
+                self.owner,
+                {"description": "Changed"},
+            ),
+            (
+                "SubredditViewSet.destroy",
+                "delete",
+                "subreddit-detail",
+                subreddit,
+                self.owner,
+                None,
+            ),
+            (
+                "SubredditViewSet.join",
+                "post",
+                "subreddit-join",
+                subreddit,
+                self.staff,
+                None,
+            ),
+            (
+                "SubredditViewSet.leave",
+                "post",
+                "subreddit-leave",
+                subreddit,
+                self.member,
+                None,
+            ),
+            (
+                "MemberViewSet.list",
+                "get",
+                "subreddit-members-list",
+                nested,
+                self.member,
+                None,
+            ),
+            (
+                "ModeratorViewSet.list",
+                "get",
+                "subreddit-moderators-list",
+                nested,
+                self.owner,
+                None,
+            ),
+            (
+                "ModeratorViewSet.create",
+                "post",
+                "subreddit-moderators-list",
+                nested,
+                self.owner,
+                {"id": self.staff.pk},
+            ),
+            (
+                "ModeratorViewSet.destroy",
+                "delete",
+                "subreddit-moderators-detail",
+                {**nested, "pk": self.member.pk},
+                self.owner,
+                None,
+            ),
+            ("RuleViewSet.list", "get", "subreddit-rules-list", nested, None, None),
+            ("RuleViewSet.retrieve", "get", "subreddit-rules-detail", rule, None, None),
+            (
+                "RuleViewSet.create",
+                "post",
+                "subreddit-rules-list",
+                nested,
+                self.member,
+                {"title": "New rule", "description": "."},
+            ),
+            (
+                "RuleViewSet.update",
+                "put",
+                "subreddit-rules-detail",
+                rule,
+                self.member,
+                {"title": "Changed", "description": "."},
+            ),
+            (
+                "RuleViewSet.partial_update",
+                "patch",
+                "subreddit-rules-detail",
+                rule,
+                self.member,
+                {"title": "Changed"},
+            ),
+            (
+                "RuleViewSet.destroy",
+                "delete",
+                "subreddit-rules-detail",
+                rule,
+                self.member,
+                None,
+            ),
+            (
+                "RegisterView.post",
+                "post",
+                "auth_register",
+                {},
+                None,
+                {
+                    "username": "newcomer",
+                    "email": "newcomer@example.com",
+                    "password": "a-Strong-pass-123",
+                    "password2": "a-Strong-pass-123",
+                },
+            ),
+            (
+                "LoginView.post",
+                "post",
+                "auth_login",
+                {},
+                None,
+                {"username": "member", "password": "password123"},
+            ),
+            (
+                "LoginRefreshView.post",
+                "post",
+                "token_refresh",
+                {},
+                None,
+                {"refresh": refresh},
+            ),
+            (
+                "LogoutView.post",
+                "post",
+                "auth_logout",
+                {},
+                self.member,
+                {"refresh": refresh},
+            ),
+            ("MeView.get", "get", "auth_me", {}, self.member, None),
+            (
+                "MeView.put",
+                "put",
+                "auth_me",
+                {},
+                self.member,
+                {"username": "member", "email": "member@example.com", "bio": "Hi"},
+            ),
+            ("MeView.patch", "patch", "auth_me", {}, self.member, {"bio": "Hi"}),
+            # The posts router's root is shadowed by post-list.
+            ("APIRootView.get", "get", "/api/subreddits/", {}, self.member, None),
+            ("metrics.get", "get", "metrics", {}, self.staff, None),
+            (
+                "UploadViewSet.create",
+                "post",
+                "upload-list",
+                {},
+                self.member,
+                {"filename": "new.gif", "content_type": "image/gif", "size": 8},
+            ),
+            (
+                "UploadViewSet.retrieve",
+                "get",
+                "upload-detail",
+                upload,
+                self.member,
+                None,
+            ),
+            (
+                "UploadViewSet.partial_update",
+                "patch",
+                "upload-detail",
+                upload,
+                self.member,
+                (CHUNK_CONTENT_TYPE, b"1234", {"HTTP_UPLOAD_OFFSET": "4"}),
+            ),
+            (
+                "UploadViewSet.complete",
+                "post",
+                "upload-complete",
+                {"pk": self.uploads[1].pk},
+                self.member,
+                None,
+            ),
+            (
+                "UploadViewSet.destroy",
+                "delete",
+                "upload-detail",
+                upload,
+                self.member,
+                None,
+            ),
+        ]
+
+    def test_every_action_has_a_budget(self):
+        self.assertEqual(api_actions() - QUERY_BUDGETS.keys(), set())
+
+    def test_actions_stay_within_their_budgets(self):
+        scenarios = self.scenarios()
+        self.assertEqual({scenario[0] for scenario in scenarios}, set(QUERY_BUDGETS))
+
+        for action, method, name, kwargs, user, data in scenarios:
+            with self.subTest(action=action), transaction.atomic():
+                cache.clear()
+                self.client.force_authenticate(user=user)
+                if isinstance(data, tuple):
+                    # Raw bodies, such as upload chunks, with their headers.
+                    content_type, data, extra = data
+                    extra = {"content_type": content_type, **extra}
+                elif isinstance(data, bytes):
+                    # Bulk uploads are sent as NDJSON.
+                    extra = {"content_type": "application/x-ndjson"}
+                else:
+                    extra = {"format": "json"}
+                recorder = QueryRecorder()
+                with connection.execute_wrapper(recorder):
+                    response = getattr(self.client, method)(
+                        name if name.startswith("/") else reverse(name, kwargs=kwargs),
+                        data,
+                        **extra,
+                    )
+                    if response.streaming:
+                        content = b"".join(response.streaming_content)
+                    else:
+                        content = response.content
+                self.assertLess(response.status_code, 400, content[:300])
+                # Make sure the request reached the action it is budgeted for.
+                view = getattr(response, "renderer_context", {}).get("view")
+                if view is not None:
+                    self.assertEqual(
+                        f"{type(view).__name__}.{getattr(view, 'action', None) or method}",
+                        action,
+                    )
+
+                budget = QUERY_BUDGETS[action]
+                self.assertLessEqual(
+                    len(recorder.queries),
+                    budget,
+                    f"{action} issued {len(recorder.queries)} queries, "
+                    f"budget is {budget}:\n{recorder.report()}",
+                )
+                transaction.set_rollback(True)
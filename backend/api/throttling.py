@@ -0,0 +1,149 @@
+"""
+Request rate limits.
+
+``RequestRateThrottle`` replaces DRF's ``AnonRateThrottle`` and
+``UserRateThrottle``, which keep the timestamp of every recent request of a
+client in the cache and read, prune and write that list back on each
+request: the work grows with the rate, and concurrent requests overwrite
+each other's updates.
+
+It uses the generic cell rate algorithm (GCRA). With a rate of ``n``
+requests per ``period``, each request advances the client's theoretical
+arrival time (TAT) by ``period / n``; a request is rejected when that
+would put the TAT more than ``period`` ahead of now, which allows bursts
+of ``n`` and then one request per ``period / n``. A client's state is that
+single timestamp.
+
+Each request falls in one scope of ``DEFAULT_THROTTLE_RATES``:
+
+* ``auth`` for views with ``throttle_scope = "auth"`` (login, token
+  refresh, registration), per client address,
+* ``write`` for other unsafe methods, per user or client address,
+* ``user`` and ``anon`` for reads, per user and per client address.
+
+A read the async path (api/asgi.py) already counted and then handed to the
+sync view is not counted a second time.
+
+``THROTTLE_STORE`` picks where the TATs are kept:
+
+* ``"cache"`` (the default): the default Django cache, updated with
+  atomic ``incr`` calls. With a shared backend such as Redis, the limits
+  hold across every worker.
+* ``"memory"``: a dict in each process, updated under a lock. It skips
+  the cache altogether, but each worker process enforces the limits on its
+  own.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+MICROSECONDS = 1_000_000
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 60 * 60 * 24}
+
+# Seconds between two sweeps of expired entries from MemoryStore.
+SWEEP_INTERVAL = 60
+
+
+def parse_rate(rate):
+    """``(requests, period in seconds)`` for a rate such as ``"20/minute"``."""
+    count, _, period = rate.partition("/")
+    return int(count), PERIODS[period[0]]
+
+
+class MemoryStore:
+    def __init__(self):
+        self.tats = {}
+        self.lock = threading.Lock()
+        self.next_sweep = 0
+
+    def update(self, key, interval, period, now):
+        with self.lock:
+            if now >= self.next_sweep:
+                self.sweep(now)
+            tat = max(self.tats.get(key, 0), now) + interval
+            if tat - now > period:
+                return tat - now - period
+            self.tats[key] = tat
+            return None
+
+    def sweep(self, now):
+        # A TAT in the past is the same as no entry.
+        self.tats = {key: tat for key, tat in self.tats.items() if tat > now}
+        self.next_sweep = now + SWEEP_INTERVAL
+
+    def clear(self):
+        with self.lock:
+            self.tats.clear()
+
+
+class CacheStore:
+    # TATs are stored in integer microseconds, for incr().
+
+    def update(self, key, interval, period, now):
+        interval = round(interval * MICROSECONDS)
+        limit = period * MICROSECONDS
+        now = round(now * MICROSECONDS)
+
+        try:
+            tat = cache.incr(key, interval)
+        except ValueError:
+            # A new client, or one idle for a whole period.
+            if cache.add(key, now + interval, timeout=period):
+                return None
+            tat = cache.incr(key, interval)
+
+        if tat - interval < now:
+            # The client was idle: restart from now. Concurrent requests
+            # may overwrite each other here, but the bucket was full.
+            cache.set(key, now + interval, timeout=period)
+            return None
+        if tat - now > limit:
+            cache.decr(key, interval)
+            return (tat - now - limit) / MICROSECONDS
+        # The key must outlive the TAT, which is at most a period ahead.
+        cache.touch(key, period)
+        return None
+
+
+STORES = {"memory": MemoryStore(), "cache": CacheStore()}
+
+
+def get_store():
+    return STORES[settings.THROTTLE_STORE]
+
+
+class RequestRateThrottle(BaseThrottle):
+    def allow_request(self, request, view):
+        if getattr(request, "throttled", False):
+            return True
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+
+        count, period = parse_rate(rate)
+        key = f"throttle:{scope}:{self.get_ident_for(request, scope)}"
+        self.delay = get_store().update(key, period / count, period, time.time())
+        return self.delay is None
+
+    def wait(self):
+        return self.delay
+
+    def get_scope(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        if scope:
+            return scope
+        if request.method not in SAFE_METHODS:
+            return "write"
+        return "user" if request.user.is_authenticated else "anon"
+
+    def get_ident_for(self, request, scope):
+        if scope != "auth" and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
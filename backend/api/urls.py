@@ -1,6 +1,11 @@
 from django.urls import include, path
 
+from . import views
+
 urlpatterns = [
+    path("_metrics", views.metrics, name="metrics"),
     path("subreddits/", include("subreddits.urls")),
     path("posts/", include("posts.urls")),
+    path("posts/<int:post_pk>/comments/", include("comments.urls")),
+    path("uploads/", include("uploads.urls")),
 ]
@@ -0,0 +1,16 @@
+"""
+URLconf for requests served under ASGI (see api/asgi.py): async views for
+the busiest reads, then everything in ``backend.urls``.
+"""
+
+from django.urls import include, path
+from posts.async_views import post_detail, post_list, trending
+from subreddits.async_views import subreddit_detail
+
+urlpatterns = [
+    path("api/posts/", post_list),
+    path("api/posts/trending/", trending),
+    path("api/posts/<int:pk>/", post_detail),
+    path("api/subreddits/subreddits/<int:pk>/", subreddit_detail),
+    path("", include("backend.urls")),
+]
@@ -1,3 +1,4 @@
+import sys
 from datetime import timedelta
 from pathlib import Path
 
@@ -38,9 +39,13 @@ INSTALLED_APPS = [
     "api",
     "subreddits",
     "posts",
+    "comments",
+    "uploads",
 ]
 
 MIDDLEWARE = [
+    "api.metrics.MetricsMiddleware",
+    "api.asgi.ASGIURLConfMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -51,19 +56,19 @@ MIDDLEWARE = [
 ]
 
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    ),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("users.authentication.CachedJWTAuthentication",),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "api.throttling.RequestRateThrottle",
     ],
+    # Scopes of api.throttling.RequestRateThrottle
     "DEFAULT_THROTTLE_RATES": {
-        "anon": "20/minute",  # Rate limit for anonymous users
-        "user": "60/minute",  # Rate limit for authenticated users
+        "anon": "20/minute",  # Reads by anonymous users
+        "user": "60/minute",  # Reads by authenticated users
+        "write": "60/minute",  # Writes
+        "auth": "20/minute",  # Login, token refresh and registration
     },
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
@@ -83,6 +88,104 @@ SIMPLE_JWT = {
     "UPDATE_LAST_LOGIN": True,
 }
 
+# Bloom filter of blacklisted refresh tokens (see users/blacklist.py):
+# tokens it holds before it is rebuilt larger, and false positive rate.
+TOKEN_BLACKLIST_FILTER_CAPACITY = 1_000_000
+TOKEN_BLACKLIST_FILTER_ERROR_RATE = 0.001
+
+# Seconds a user's row stays cached for authentication (see
+# users/authentication.py). 0 reads it from the database on every request.
+USER_CACHE_TTL = 60
+
+# Seconds a user's memberships and roles stay cached across requests
+# (see subreddits/authz.py). 0 loads them once per request only.
+AUTHZ_CACHE_TTL = 60
+
+# Workers coordinate through the default cache: buffered votes
+# (posts/votes.py), version stamps (api/conditional.py), cached users and
+# roles, the token blacklist filter and the throttles all live in it. It
+# must be shared between processes and, for the vote buffer, must never
+# evict entries: set REDIS_URL to a Redis run with maxmemory-policy
+# noeviction (this needs the "redis" package). Without REDIS_URL, and under
+# "manage.py test", SINGLE_PROCESS keeps the cache in process memory
+# instead, which is only correct when a single process serves every
+# request, as with runserver.
+REDIS_URL = config("REDIS_URL", default="")
+SINGLE_PROCESS = config(
+    "SINGLE_PROCESS", default=not REDIS_URL or sys.argv[1:2] == ["test"], cast=bool
+)
+if REDIS_URL and not SINGLE_PROCESS:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    # With SINGLE_PROCESS=false the vote buffer refuses to start on it.
+    CACHES = {"default": {"BACKEND": "api.cache.ProcessLocalCache"}}
+
+# Write-behind vote buffer (see posts/votes.py)
+VOTE_BUFFER_SHARDS = 16
+VOTE_FLUSH_INTERVAL = 10  # Seconds covered by one buffer epoch
+VOTE_BUFFER_READ_WINDOW = 60  # Epochs of buffered votes added to reads
+
+# Seconds between two runs of manage.py apply_karma --loop (see users/karma.py)
+KARMA_APPLY_INTERVAL = 10
+
+# Trending posts are rebuilt by one worker once the soft TTL passes; the
+# others keep serving the stale copy until the hard TTL.
+TRENDING_SOFT_TTL = 60 * 5
+TRENDING_HARD_TTL = 60 * 60 * 24
+
+# Full-text search backend for posts (see posts/search.py)
+POST_SEARCH_ENGINE = "posts.search.SQLiteSearchEngine"
+POST_SEARCH_LIMIT = 500  # Most relevant matches considered per query
+
+# Home feed (see posts/feed.py)
+FEED_FANOUT_THRESHOLD = 1000  # Larger subreddits are merged in at read time
+FEED_MAX_LENGTH = 500  # Pushed entries kept per user
+
+# Posts older than this are moved to the archive table by
+# manage.py archive_posts, along with removed posts (see posts/archive.py)
+POST_ARCHIVE_AFTER_DAYS = 365
+
+# Bulk post ingestion (see posts/ingest.py)
+INGEST_BATCH_SIZE = 500  # Rows validated and inserted together
+INGEST_MAX_LINE_LENGTH = 64 * 1024  # Bytes; longer lines are rejected
+INGEST_MAX_ERRORS = 100  # Failed rows reported in the response
+
+# Rows read from the database at a time by subreddit exports
+# (see posts/export.py)
+EXPORT_CHUNK_SIZE = 2000
+
+# Chunked uploads (see uploads/storage.py)
+UPLOAD_STAGING_ROOT = BASE_DIR / "upload_staging"  # Not served; chunks only
+UPLOAD_MAX_SIZE = 100 * 1024 * 1024  # Bytes per file
+UPLOAD_MAX_CHUNK_SIZE = 8 * 1024 * 1024  # Bytes per request
+UPLOAD_SESSION_TTL = 60 * 60 * 24  # Seconds before manage.py purge_uploads
+
+# Image renditions (see uploads/renditions.py): the longest side in pixels
+# of each size, rendered by a pool of RENDITION_WORKERS processes, or in the
+# request when RENDITIONS_INLINE is set.
+IMAGE_RENDITIONS = {"thumbnail": 64, "small": 256, "large": 1024}
+RENDITION_WORKERS = 2
+RENDITIONS_INLINE = False
+
+# Rendered subreddit detail pages: entries kept in each process's LRU, and
+# seconds kept in the shared cache.
+SUBREDDIT_CACHE_SIZE = 1024
+SUBREDDIT_CACHE_TIMEOUT = 60 * 5
+
+# Where api.throttling.RequestRateThrottle keeps its state: "cache" in the
+# default cache, shared between workers when it is, or "memory" in each
+# process.
+THROTTLE_STORE = "cache"
+
+# Fraction of requests recorded by api.metrics.MetricsMiddleware; lower it
+# to keep the overhead down under load, 0 turns recording off.
+METRICS_SAMPLE_RATE = 1.0
+
 # Strong Password Policies
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -98,6 +201,8 @@ AUTH_PASSWORD_VALIDATORS = [
 
 
 ROOT_URLCONF = "backend.urls"
+# Requests served under ASGI resolve here first (see api/asgi.py).
+ASGI_URLCONF = "backend.asgi_urls"
 
 TEMPLATES = [
     {
@@ -162,6 +267,10 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# User uploaded files, including the content-addressed blobs.
+MEDIA_URL = "media/"
+MEDIA_ROOT = BASE_DIR / "media"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
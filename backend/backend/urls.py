@@ -1,8 +1,17 @@
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
+from uploads.views import rendition
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/auth/", include("users.urls")),
     path("api/", include("api.urls")),
-]
+    # Renditions not rendered yet (see uploads/renditions.py).
+    path(
+        f"{settings.MEDIA_URL.lstrip('/')}renditions/<path:name>",
+        rendition,
+        name="rendition",
+    ),
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
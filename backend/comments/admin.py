@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import Comment
+
+
+@admin.register(Comment)
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ("owner", "post", "depth", "created_at", "is_removed")
+    list_filter = ("is_removed",)
+    search_fields = ("body", "owner__username")
+    readonly_fields = ("post", "parent", "path", "depth", "created_at")
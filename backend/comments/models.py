@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.db import models
+
+# Every comment stores the ids of its ancestors and itself as fixed-width
+# base36 segments ("materialized path"). Ordering a post's comments by path
+# yields the thread depth-first, and a subtree is the contiguous path range
+# [path, path + PATH_END), so both are single index range scans.
+PATH_SEGMENT_WIDTH = 8
+PATH_END = "~"  # Sorts after every base36 digit
+MAX_DEPTH = 30
+
+
+def encode_path_segment(pk):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    segment = ""
+    while pk:
+        pk, remainder = divmod(pk, 36)
+        segment = digits[remainder] + segment
+    return segment.rjust(PATH_SEGMENT_WIDTH, "0")
+
+
+class Comment(models.Model):
+    # No database constraint: the post may have moved to posts_archivedpost
+    # (see posts/archive.py), and its comments stay here.
+    post = models.ForeignKey(
+        "posts.Post",
+        related_name="comments",
+        on_delete=models.CASCADE,
+        db_constraint=False,
+    )
+    parent = models.ForeignKey(
+        "self",
+        related_name="replies",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name="comments", on_delete=models.CASCADE
+    )
+    body = models.TextField()
+
+    path = models.CharField(
+        max_length=PATH_SEGMENT_WIDTH * (MAX_DEPTH + 1), editable=False
+    )
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    is_removed = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ["path"]
+        indexes = [
+            models.Index(fields=["post", "path"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+        # The path ends with the comment's own id, known only once inserted.
+        if not self.path:
+            prefix = self.parent.path if self.parent else ""
+            self.path = prefix + encode_path_segment(self.pk)
+            self.depth = self.parent.depth + 1 if self.parent else 0
+            super().save(update_fields=["path", "depth"])
+
+    def __str__(self):
+        return f"{self.owner} on {self.post}: {self.body[:50]}"
@@ -0,0 +1,16 @@
+from rest_framework import permissions
+from subreddits.authz import get_authz
+
+
+class IsOwnerOrReadOnly(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
+        if request.method in permissions.SAFE_METHODS:
+            return True
+
+        # Moderators may remove comments, but only the author may edit them.
+        if request.method == "DELETE" and get_authz(request).is_moderator(
+            obj.post.subreddit_id
+        ):
+            return True
+
+        return obj.owner_id == request.user.pk
@@ -0,0 +1,47 @@
+from api.metrics import TimedSerializerMixin
+from rest_framework import serializers
+
+from .models import MAX_DEPTH, Comment
+
+
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Flat representation of a comment. Threads are returned as a depth-first
+    list of these (each with its ``parent`` and ``depth``), which clients
+    fold into a tree; nothing here recurses into replies.
+    """
+
+    owner = serializers.ReadOnlyField(source="owner.username")
+
+    class Meta:
+        model = Comment
+        fields = [
+            "id",
+            "post",
+            "parent",
+            "owner",
+            "body",
+            "depth",
+            "created_at",
+            "updated_at",
+            "is_removed",
+        ]
+        read_only_fields = ["post", "depth", "is_removed"]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Replies can only be attached to comments of the same post.
+        if "post" in self.context:
+            fields["parent"].queryset = Comment.objects.filter(
+                post=self.context["post"]
+            )
+        return fields
+
+    def validate_parent(self, parent):
+        if self.instance is not None and parent != self.instance.parent:
+            raise serializers.ValidationError("A comment cannot be moved.")
+        if parent is not None and parent.depth >= MAX_DEPTH:
+            raise serializers.ValidationError(
+                f"Threads cannot be nested deeper than {MAX_DEPTH} replies."
+            )
+        return parent
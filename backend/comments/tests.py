@@ -0,0 +1,156 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from posts.models import Post
+from rest_framework import status
+from rest_framework.test import APITestCase
+from subreddits.models import Subreddit
+
+from .models import Comment
+
+User = get_user_model()
+
+
+class CommentViewSetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username="commenter", password="password123", email="commenter@example.com"
+        )
+        self.moderator = User.objects.create_user(
+            username="mod", password="password123", email="mod@example.com"
+        )
+        self.other = User.objects.create_user(
+            username="other", password="password123", email="other@example.com"
+        )
+        self.subreddit = Subreddit.objects.create(name="threads", owner=self.moderator)
+        self.subreddit.moderators.add(self.moderator)
+        self.post = Post.objects.create(
+            subreddit=self.subreddit, owner=self.author, title="Thread", body="..."
+        )
+        self.url = reverse("post-comments-list", kwargs={"post_pk": self.post.pk})
+
+    def comment(self, body, parent=None, user=None):
+        self.client.force_authenticate(user=user or self.author)
+        data = {"body": body}
+        if parent:
+            data["parent"] = parent["id"]
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+
+    def build_thread(self):
+        # a
+        # +- a1
+        # |  +- a1x
+        # +- a2
+        # b
+        a = self.comment("a")
+        b = self.comment("b")
+        a1 = self.comment("a1", parent=a)
+        a2 = self.comment("a2", parent=a)
+        a1x = self.comment("a1x", parent=a1)
+        return a, b, a1, a2, a1x
+
+    def bodies(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [comment["body"] for comment in response.data["results"]]
+
+    def test_create_comment_requires_authentication(self):
+        response = self.client.post(self.url, {"body": "hi"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_thread_is_listed_depth_first(self):
+        self.build_thread()
+        self.assertEqual(self.bodies(), ["a", "a1", "a1x", "a2", "b"])
+
+    def test_whole_thread_is_one_query(self):
+        self.build_thread()
+        self.client.force_authenticate(user=None)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_depth_limit(self):
+        self.build_thread()
+        self.assertEqual(self.bodies(depth=0), ["a", "b"])
+        self.assertEqual(self.bodies(depth=1), ["a", "a1", "a2", "b"])
+
+    def test_subtree(self):
+        a, _, a1, _, _ = self.build_thread()
+        self.assertEqual(self.bodies(parent=a["id"]), ["a", "a1", "a1x", "a2"])
+        self.assertEqual(self.bodies(parent=a["id"], depth=1), ["a", "a1", "a2"])
+        self.assertEqual(self.bodies(parent=a1["id"]), ["a1", "a1x"])
+
+    def test_parent_and_depth_must_be_integers(self):
+        for params in ({"parent": "abc"}, {"depth": "abc"}):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_depth_and_parent_are_reported(self):
+        a, _, a1, _, a1x = self.build_thread()
+        self.assertEqual((a["depth"], a["parent"]), (0, None))
+        self.assertEqual((a1x["depth"], a1x["parent"]), (2, a1["id"]))
+
+    def test_load_more_continues_after_last_comment(self):
+        self.build_thread()
+        first = self.client.get(self.url, {"page_size": 3})
+        more = self.client.get(first.data["next"])
+        self.assertEqual(
+            [comment["body"] for comment in more.data["results"]], ["a2", "b"]
+        )
+        self.assertIsNone(more.data["next"])
+
+    def test_parent_must_belong_to_the_same_post(self):
+        other_post = Post.objects.create(
+            subreddit=self.subreddit, owner=self.author, title="Other", body="..."
+        )
+        foreign = Comment.objects.create(post=other_post, owner=self.author, body="x")
+        self.client.force_authenticate(user=self.author)
+        response = self.client.post(self.url, {"body": "reply", "parent": foreign.pk})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_comment_count_is_maintained(self):
+        a, *_ = self.build_thread()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 5)
+
+        self.client.force_authenticate(user=self.moderator)
+        detail = reverse(
+            "post-comments-detail", kwargs={"post_pk": self.post.pk, "pk": a["id"]}
+        )
+        response = self.client.delete(detail)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 4)
+        # The removed comment keeps its place so its replies stay attached.
+        self.assertEqual(self.bodies(), ["[deleted]", "a1", "a1x", "a2", "b"])
+
+    def test_only_author_can_edit(self):
+        a = self.comment("a")
+        detail = reverse(
+            "post-comments-detail", kwargs={"post_pk": self.post.pk, "pk": a["id"]}
+        )
+        self.client.force_authenticate(user=self.other)
+        response = self.client.patch(detail, {"body": "hijacked"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.author)
+        response = self.client.patch(detail, {"body": "edited"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["body"], "edited")
+
+    def test_removed_comments_cannot_be_edited(self):
+        a = self.comment("a")
+        detail = reverse(
+            "post-comments-detail", kwargs={"post_pk": self.post.pk, "pk": a["id"]}
+        )
+        self.client.force_authenticate(user=self.moderator)
+        self.client.delete(detail)
+
+        self.client.force_authenticate(user=self.author)
+        response = self.client.patch(detail, {"body": "restored"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Comment.objects.get(pk=a["id"]).body, "[deleted]")
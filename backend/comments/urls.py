@@ -0,0 +1,12 @@
+from django.urls import include, path
+from rest_framework.routers import SimpleRouter
+
+from .views import CommentViewSet
+
+# Mounted under /api/posts/<post_pk>/comments/
+router = SimpleRouter()
+router.register(r"", CommentViewSet, basename="post-comments")
+
+urlpatterns = [
+    path("", include(router.urls)),
+]
@@ -0,0 +1,111 @@
+from api.conditional import bump_on_commit
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.shortcuts import get_object_or_404
+from posts.models import Post
+from posts.pagination import KeysetPagination
+from rest_framework import permissions, viewsets
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from users import karma
+
+from .models import PATH_END, Comment
+from .permissions import IsOwnerOrReadOnly
+from .serializers import CommentSerializer
+
+
+class CommentPagination(KeysetPagination):
+    # Threads are read in large slices; the "next" link is the token for
+    # loading more of the thread (or subtree) after the last comment shown.
+    page_size = 200
+    max_page_size = 1000
+
+
+class CommentViewSet(viewsets.ModelViewSet):
+    """
+    Comments of one post, as a flat depth-first list.
+
+    ``?parent=<id>`` restricts the list to that comment's subtree and
+    ``?depth=<n>`` to ``n`` levels below the top (or below ``parent``).
+    """
+
+    serializer_class = CommentSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    pagination_class = CommentPagination
+    filter_backends = []
+
+    def get_queryset(self):
+        queryset = Comment.objects.filter(post_id=self.kwargs["post_pk"])
+        if self.action == "list":
+            queryset = self.filter_thread(queryset)
+        elif self.request.method not in permissions.SAFE_METHODS:
+            # Comments of archived posts are read-only (see posts/archive.py).
+            queryset = queryset.filter(
+                Exists(Post.objects.filter(pk=OuterRef("post_id")))
+            )
+        return queryset.select_related("owner").order_by("path")
+
+    def filter_thread(self, queryset):
+        params = self.request.query_params
+        top_depth = 0
+
+        if params.get("parent"):
+            try:
+                parent = int(params["parent"])
+            except ValueError:
+                raise ValidationError({"parent": "Must be an integer."})
+            root = get_object_or_404(
+                Comment.objects.only("path", "depth"),
+                pk=parent,
+                post_id=self.kwargs["post_pk"],
+            )
+            queryset = queryset.filter(
+                path__gte=root.path, path__lt=root.path + PATH_END
+            )
+            top_depth = root.depth
+
+        if params.get("depth"):
+            try:
+                depth = int(params["depth"])
+            except ValueError:
+                raise ValidationError({"depth": "Must be an integer."})
+            queryset = queryset.filter(depth__lte=top_depth + depth)
+
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["post"] = self.kwargs["post_pk"]
+        return context
+
+    def perform_create(self, serializer):
+        post = get_object_or_404(
+            Post.objects.only("pk", "subreddit_id"),
+            pk=self.kwargs["post_pk"],
+            is_removed=False,
+        )
+        with transaction.atomic():
+            serializer.save(post=post, owner=self.request.user)
+            Post.objects.filter(pk=post.pk).update(comment_count=F("comment_count") + 1)
+            karma.record({self.request.user.pk: 1})
+            bump_on_commit("posts", f"posts:{post.subreddit_id}")
+
+    def perform_update(self, serializer):
+        # The "[deleted]" body must stay, or a removal could be undone.
+        if serializer.instance.is_removed:
+            raise PermissionDenied("Removed comments cannot be edited.")
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        if instance.is_removed:
+            return
+
+        # Keep the node so its replies stay attached to the thread.
+        with transaction.atomic():
+            instance.is_removed = True
+            instance.body = "[deleted]"
+            instance.save()
+            Post.objects.filter(pk=instance.post_id).update(
+                comment_count=F("comment_count") - 1
+            )
+            karma.record({instance.owner_id: -1})
+            bump_on_commit("posts", f"posts:{instance.post.subreddit_id}")
@@ -0,0 +1,109 @@
+"""
+Archive tier for posts.
+
+Removed posts, and posts older than ``POST_ARCHIVE_AFTER_DAYS``, are moved
+from ``posts_post`` into ``posts_archivedpost`` by ``manage.py
+archive_posts``, a batch per transaction, so the hot table and its
+indexes only hold what the listings can show. Per batch:
+
+* the rows are copied with their ids, their buffered votes folded into
+  ``vote_count`` (and the owners' karma),
+* their feed entries, votes and search index rows are deleted,
+* the posts are deleted with plain SQL: comments keep pointing at the same
+  post ids (``Comment.post`` has no database constraint), where an ORM
+  delete would cascade to them.
+
+``PostViewSet.retrieve`` falls back to the archive for posts that are not
+in ``posts_post``, so links to old posts keep working. Archived posts and
+their comments are read-only; removed posts stay hidden.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from api.conditional import bump_on_commit
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from users import karma
+
+from . import votes
+from .models import ArchivedPost, FeedEntry, Post, Vote
+from .search import get_search_engine
+
+FIELDS = [
+    "id",
+    "subreddit_id",
+    "owner_id",
+    "title",
+    "body",
+    "url",
+    "media",
+    "blob_id",
+    "created_at",
+    "updated_at",
+    "vote_count",
+    "comment_count",
+    "hot_score",
+    "is_spoiler",
+    "is_nsfw",
+    "is_removed",
+    "removal_reason",
+    "moderator_notes",
+]
+
+
+def archive_posts(after_days=None, batch_size=500):
+    """
+    Archive every removed post and every post older than ``after_days``
+    (``POST_ARCHIVE_AFTER_DAYS`` by default). Returns how many were moved.
+    """
+    if after_days is None:
+        after_days = settings.POST_ARCHIVE_AFTER_DAYS
+    cutoff = timezone.now() - timedelta(days=after_days)
+
+    archived = 0
+    # Each filter matches one of the partial indexes of Post.
+    for queryset in [
+        Post.objects.filter(is_removed=True).order_by("pk"),
+        Post.objects.filter(is_removed=False, created_at__lt=cutoff).order_by(
+            "created_at", "id"
+        ),
+    ]:
+        while moved := archive_batch(queryset, batch_size):
+            archived += moved
+    return archived
+
+
+def archive_batch(queryset, batch_size):
+    """Move the first ``batch_size`` posts of ``queryset`` to the archive."""
+    with transaction.atomic():
+        rows = list(
+            queryset.select_for_update().values(*FIELDS, "vote_epoch")[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        post_ids = [row["id"] for row in rows]
+        pending = votes.pending_deltas_by_id(
+            {row["id"]: row.pop("vote_epoch") for row in rows}
+        )
+        karma_deltas = defaultdict(int)
+        for row in rows:
+            row["vote_count"] += pending[row["id"]]
+            karma_deltas[row["owner_id"]] += pending[row["id"]]
+
+        ArchivedPost.objects.bulk_create(ArchivedPost(**row) for row in rows)
+        FeedEntry.objects.filter(post_id__in=post_ids).delete()
+        Vote.objects.filter(post_id__in=post_ids).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {Post._meta.db_table} WHERE id IN "
+                f"({', '.join(['%s'] * len(post_ids))})",
+                post_ids,
+            )
+        get_search_engine().remove(post_ids)
+        # The flusher will find no post to add these buffered votes to.
+        karma.record(karma_deltas)
+        bump_on_commit("posts", *{f"posts:{row['subreddit_id']}" for row in rows})
+    return len(rows)
@@ -0,0 +1,98 @@
+"""
+Async versions of the post reads, mounted under ASGI (see api/asgi.py).
+Each one answers like the ``PostViewSet`` action of the same URL.
+"""
+
+from datetime import timedelta
+
+from api.asgi import async_reads, json_response, sync_view
+from api.cache import aget_or_rebuild
+from api.conditional import aconditional_response
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from rest_framework.request import Request
+from subreddits.models import validate_subreddit_name
+
+from .models import Post
+from .pagination import KeysetPagination
+from .serializers import post_values
+from .views import PostViewSet, post_list_scopes, trending_cache_key
+
+
+def viewset(request, action):
+    # For the filter backends and get_queryset; nothing is dispatched.
+    return PostViewSet(
+        request=Request(request), action=action, format_kwarg=None, args=(), kwargs={}
+    )
+
+
+@async_reads
+async def post_list(request):
+    if request.GET.get("search", "").strip():
+        # The search engines are synchronous.
+        return await sync_view(request)
+
+    async def get_response():
+        view = viewset(request, "list")
+        queryset = view.filter_queryset(view.get_queryset())
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(
+            post_values.values(queryset), view.request
+        )
+        data = await post_values.arender(page, request)
+        return json_response(paginator.get_paginated_response(data).data)
+
+    return await aconditional_response(request, post_list_scopes(request), get_response)
+
+
+@async_reads
+async def post_detail(request, pk):
+    subreddit_id = (
+        await Post.objects.filter(pk=pk, is_removed=False)
+        .values_list("subreddit_id", flat=True)
+        .afirst()
+    )
+    if subreddit_id is None:
+        # Not found, or in the archive.
+        return await sync_view(request)
+
+    async def get_response():
+        queryset = viewset(request, "retrieve").get_queryset().filter(pk=pk)
+        row = await post_values.values(queryset).afirst()
+        if row is None:
+            return await sync_view(request)
+        return json_response((await post_values.arender([row], request))[0])
+
+    return await aconditional_response(
+        request, [f"posts:{subreddit_id}", "users"], get_response
+    )
+
+
+@async_reads
+async def trending(request):
+    subreddit_name = request.GET.get("subreddit__name")
+    if subreddit_name:
+        try:
+            validate_subreddit_name(subreddit_name)
+        except ValidationError:
+            return json_response([])
+
+    async def rebuild():
+        # Same query and cache entry as PostViewSet.build_trending.
+        since = timezone.now() - timedelta(days=3)
+        queryset = (
+            viewset(request, "trending").get_queryset().filter(created_at__gte=since)
+        )
+        if subreddit_name:
+            queryset = queryset.filter(subreddit__name=subreddit_name)
+        rows = post_values.values(queryset.order_by("-vote_count", "-id"))[:20]
+        return await post_values.arender([row async for row in rows], request)
+
+    data = await aget_or_rebuild(
+        trending_cache_key(subreddit_name),
+        rebuild,
+        soft_ttl=settings.TRENDING_SOFT_TTL,
+        hard_ttl=settings.TRENDING_HARD_TTL,
+    )
+    return json_response(data)
@@ -0,0 +1,173 @@
+"""
+Personalized home feed: the newest posts of the subreddits a user joined.
+
+Most subreddits are small, so a new post is pushed ("fan-out on write")
+into a ``FeedEntry`` row for every member, and a feed page is a single
+index range scan over ``(user, -created_at, -post)``.
+
+Pushing a post to millions of members is not affordable, so subreddits with
+more than ``FEED_FANOUT_THRESHOLD`` members are skipped at write time.
+Their posts are pulled at read time ("fan-out on read"): one index range
+scan per large subreddit the user joined, each limited to the page size,
+merged with the pushed entries.
+
+Joining a small subreddit pushes its newest posts into the member's feed,
+and leaving it deletes them (see subreddits/membership.py). Feeds keep at
+most ``FEED_MAX_LENGTH`` pushed entries per user; older ones are deleted by
+``manage.py trim_feeds``.
+"""
+
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from subreddits.models import Membership, Subreddit
+
+from .models import FeedEntry, Post
+
+LARGE_SUBREDDITS_CACHE_KEY = "feed:large_subreddits"
+LARGE_SUBREDDITS_CACHE_TIMEOUT = 60 * 5
+
+
+def large_subreddit_ids():
+    """Ids of the subreddits whose posts are merged in at read time."""
+    large = cache.get(LARGE_SUBREDDITS_CACHE_KEY)
+    if large is None:
+        large = set(
+            Subreddit.objects.filter(
+                member_count__gt=settings.FEED_FANOUT_THRESHOLD
+            ).values_list("pk", flat=True)
+        )
+        cache.set(LARGE_SUBREDDITS_CACHE_KEY, large, LARGE_SUBREDDITS_CACHE_TIMEOUT)
+    return large
+
+
+def fan_out(posts, batch_size=1000):
+    """Push freshly created ``posts`` into their subreddit members' feeds."""
+    large = large_subreddit_ids()
+    by_subreddit = defaultdict(list)
+    for post in posts:
+        if post.subreddit_id not in large and not post.is_removed:
+            by_subreddit[post.subreddit_id].append(post)
+
+    # Members are read once per subreddit, however many posts it got.
+    for subreddit_id, subreddit_posts in by_subreddit.items():
+        member_ids = list(
+            Membership.objects.filter(subreddit_id=subreddit_id).values_list(
+                "user_id", flat=True
+            )
+        )
+        for post in subreddit_posts:
+            entries = [
+                FeedEntry(
+                    user_id=user_id,
+                    post_id=post.pk,
+                    subreddit_id=subreddit_id,
+                    created_at=post.created_at,
+                )
+                for user_id in member_ids
+            ]
+            FeedEntry.objects.bulk_create(
+                entries, batch_size=batch_size, ignore_conflicts=True
+            )
+
+
+def backfill(user_id, subreddit_id):
+    """Push the newest posts of a subreddit ``user_id`` just joined."""
+    if subreddit_id in large_subreddit_ids():
+        return
+    posts = (
+        Post.objects.filter(subreddit_id=subreddit_id, is_removed=False)
+        .order_by("-created_at", "-id")
+        .values_list("pk", "created_at")[: settings.FEED_MAX_LENGTH]
+    )
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                subreddit_id=subreddit_id,
+                created_at=created_at,
+            )
+            for post_id, created_at in posts
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def unsubscribe(user_id, subreddit_id):
+    """Delete the pushed entries of a subreddit ``user_id`` left."""
+    FeedEntry.objects.filter(user_id=user_id, subreddit_id=subreddit_id).delete()
+
+
+def read_feed(user, limit, before=None):
+    """
+    Return up to ``limit`` ``(created_at, post_id)`` pairs of ``user``'s
+    feed, newest first, starting after the ``before`` position if given.
+    """
+    pushed = FeedEntry.objects.filter(user=user, post__is_removed=False)
+    if before:
+        created_at, post_id = before
+        pushed = pushed.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, post_id__lt=post_id)
+        )
+    sources = [
+        pushed.order_by("-created_at", "-post_id").values_list("created_at", "post_id")[
+            :limit
+        ]
+    ]
+
+    large = large_subreddit_ids()
+    if large:
+        joined = user.joined_subreddits.filter(pk__in=large).values_list(
+            "pk", flat=True
+        )
+        for subreddit_id in joined:
+            pulled = Post.objects.filter(subreddit_id=subreddit_id, is_removed=False)
+            if before:
+                pulled = pulled.filter(
+                    Q(created_at__lt=created_at)
+                    | Q(created_at=created_at, id__lt=post_id)
+                )
+            sources.append(
+                pulled.order_by("-created_at", "-id").values_list("created_at", "id")[
+                    :limit
+                ]
+            )
+
+    page, seen = [], set()
+    for position in heapq.merge(*sources, reverse=True):
+        # A subreddit that grew past the threshold may be both pushed and
+        # pulled for a while.
+        if position[1] in seen:
+            continue
+        seen.add(position[1])
+        page.append(position)
+        if len(page) == limit:
+            break
+    return page
+
+
+def trim_feeds(max_length=None):
+    """Delete the pushed entries beyond ``max_length`` in every feed."""
+    max_length = max_length or settings.FEED_MAX_LENGTH
+    overflowing = list(
+        FeedEntry.objects.values("user_id")
+        .annotate(entries=Count("id"))
+        .filter(entries__gt=max_length)
+        .values_list("user_id", flat=True)
+    )
+
+    deleted = 0
+    for user_id in overflowing:
+        entries = FeedEntry.objects.filter(user_id=user_id)
+        created_at, post_id = entries.order_by("-created_at", "-post_id").values_list(
+            "created_at", "post_id"
+        )[max_length]
+        deleted += entries.filter(
+            Q(created_at__lt=created_at)
+            | Q(created_at=created_at, post_id__lte=post_id)
+        ).delete()[0]
+    return deleted
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db.models import Case, IntegerField, Value, When
+from rest_framework import filters
+
+from .search import get_search_engine
+
+
+class PostSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` backed by the full-text engine instead of ``LIKE '%term%'``
+    scans. Matches are annotated with ``search_rank`` (0 is the best match)
+    and ordered by it unless ``?ordering=`` asks for something else.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "").strip()
+        if not query:
+            return queryset
+
+        post_ids = get_search_engine().search(query, limit=settings.POST_SEARCH_LIMIT)
+        if not post_ids:
+            return queryset.none()
+
+        ranks = [When(pk=pk, then=Value(rank)) for rank, pk in enumerate(post_ids)]
+        return (
+            queryset.filter(pk__in=post_ids)
+            .annotate(search_rank=Case(*ranks, output_field=IntegerField()))
+            .order_by("search_rank", "id")
+        )
+
+
+class PostOrderingFilter(filters.OrderingFilter):
+    """
+    ``OrderingFilter`` that understands ``?ordering=hot`` as a shorthand for
+    the materialized hot ranking, and breaks ties on ``id`` so every ordering
+    is stable.
+    """
+
+    aliases = {"hot": "-hot_score", "-hot": "hot_score"}
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params.get(self.ordering_param)
+        if params:
+            fields = [
+                self.aliases.get(param.strip(), param.strip())
+                for param in params.split(",")
+            ]
+            ordering = self.remove_invalid_fields(queryset, fields, view, request)
+            if ordering:
+                return self.add_tiebreaker(ordering)
+        return self.get_default_ordering(view)
+
+    def add_tiebreaker(self, ordering):
+        if not any(field.lstrip("-") in ("id", "pk") for field in ordering):
+            direction = "-" if ordering[-1].startswith("-") else ""
+            ordering = [*ordering, f"{direction}id"]
+        return ordering
@@ -0,0 +1,168 @@
+"""
+Bulk post ingestion from newline-delimited JSON.
+
+``POST /api/posts/ingest/`` takes one JSON object per line, shaped like the
+body of ``POST /api/posts/`` plus an optional ``owner`` username (the
+uploader by default). The body is read line by line and handled in batches
+of ``INGEST_BATCH_SIZE`` rows, so memory stays flat however large the upload
+is. For every batch:
+
+* each row is validated by ``IngestPostSerializer`` without touching the
+  database,
+* subreddits, owners and memberships are checked with one query each,
+* the valid rows are written with a single ``bulk_create`` and indexed for
+  search in the batch's own transaction,
+* the new posts are pushed to feeds and the listing stamps bumped once the
+  batch commits.
+
+``bulk_create`` skips ``Post.save`` and the signal handlers, which is why
+the last two steps are done here. Staff may ingest into any subreddit,
+moderators into the subreddits they moderate. Rows that fail are reported
+with their line number, up to ``INGEST_MAX_ERRORS`` of them.
+"""
+
+import json
+
+from api.conditional import bump_on_commit
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from subreddits.authz import get_authz
+from subreddits.models import Membership, Subreddit
+
+from .feed import fan_out
+from .models import Post
+from .ranking import hot_score
+from .search import get_search_engine
+from .serializers import IngestPostSerializer
+
+User = get_user_model()
+
+
+class IngestResult:
+    def __init__(self, max_errors):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def error(self, line, detail):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "errors": detail})
+
+    def as_dict(self):
+        return {
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def ingest_posts(request, stream):
+    """Create posts from the NDJSON ``stream``; return an ``IngestResult``."""
+    result = IngestResult(settings.INGEST_MAX_ERRORS)
+    serializer = IngestPostSerializer()
+    batch = []
+
+    for number, line in enumerate(read_lines(stream), 1):
+        if line is None:
+            result.error(number, ["Line is too long."])
+            continue
+        if not line.strip():
+            continue
+        try:
+            row = serializer.run_validation(json.loads(line))
+        except (ValueError, UnicodeDecodeError):
+            result.error(number, ["Invalid JSON."])
+            continue
+        except ValidationError as exc:
+            result.error(number, exc.detail)
+            continue
+
+        batch.append((number, row))
+        if len(batch) >= settings.INGEST_BATCH_SIZE:
+            ingest_batch(request, batch, result)
+            batch = []
+
+    if batch:
+        ingest_batch(request, batch, result)
+    return result
+
+
+def read_lines(stream):
+    """
+    Yield the lines of ``stream``; ``None`` stands for a line longer than
+    ``INGEST_MAX_LINE_LENGTH`` bytes, which is skipped without being held
+    in memory.
+    """
+    limit = settings.INGEST_MAX_LINE_LENGTH
+    while True:
+        line = stream.readline(limit + 1)
+        if not line:
+            return
+        if len(line) <= limit:
+            yield line
+            continue
+        while line and not line.endswith(b"\n"):
+            line = stream.readline(limit)
+        yield None
+
+
+def ingest_batch(request, batch, result):
+    authz = get_authz(request)
+    user = request.user
+    subreddit_ids = {row["subreddit_id"] for _, row in batch}
+    usernames = {row["owner"] for _, row in batch if row.get("owner")}
+
+    existing = set(
+        Subreddit.objects.filter(pk__in=subreddit_ids).values_list("pk", flat=True)
+    )
+    owners = dict(
+        User.objects.filter(username__in=usernames).values_list("username", "pk")
+    )
+    owners[None] = user.pk
+    memberships = set(
+        Membership.objects.filter(
+            subreddit_id__in=subreddit_ids, user_id__in=set(owners.values())
+        ).values_list("subreddit_id", "user_id")
+    )
+
+    now = timezone.now()
+    posts = []
+    for number, row in batch:
+        subreddit_id = row.pop("subreddit_id")
+        owner_id = owners.get(row.pop("owner", None))
+        if subreddit_id not in existing:
+            result.error(number, {"subreddit_id": ["Subreddit does not exist."]})
+        elif not (user.is_staff or authz.is_moderator(subreddit_id)):
+            result.error(
+                number, {"subreddit_id": ["You do not moderate this subreddit."]}
+            )
+        elif owner_id is None:
+            result.error(number, {"owner": ["User does not exist."]})
+        elif (subreddit_id, owner_id) not in memberships:
+            result.error(
+                number, {"owner": ["The owner is not a member of this subreddit."]}
+            )
+        else:
+            posts.append(
+                Post(
+                    subreddit_id=subreddit_id,
+                    owner_id=owner_id,
+                    hot_score=hot_score(0, now),
+                    **row,
+                )
+            )
+
+    if not posts:
+        return
+    with transaction.atomic():
+        Post.objects.bulk_create(posts)
+        get_search_engine().index(posts)
+        transaction.on_commit(lambda: fan_out(posts))
+        bump_on_commit("posts", *{f"posts:{post.subreddit_id}" for post in posts})
+    result.created += len(posts)
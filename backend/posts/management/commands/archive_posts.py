@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.archive import archive_posts
+
+
+class Command(BaseCommand):
+    help = (
+        "Move removed posts, and posts older than POST_ARCHIVE_AFTER_DAYS, "
+        "into the archive table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--after-days", type=int)
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        archived = archive_posts(
+            after_days=options["after_days"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} posts."))
@@ -0,0 +1,89 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.request import Request
+from subreddits.models import Subreddit
+
+from posts.models import Post
+from posts.serializers import PostSerializer, post_values
+from posts.views import PostViewSet
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rendering a page of posts with PostSerializer and with the "
+        "values() fast path. Runs on throwaway posts that are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[25, 100])
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        sizes = options["sizes"]
+        request = Request(RequestFactory().get("/api/posts/"))
+
+        with transaction.atomic():
+            self.create_posts(max(sizes))
+            # Both paths read the list endpoint's queryset, joins included, so
+            # they issue the same queries and only the rendering differs.
+            view = PostViewSet(
+                request=request, action="list", format_kwarg=None, args=(), kwargs={}
+            )
+            queryset = view.get_queryset().order_by("-created_at")
+
+            for size in sizes:
+                slow = self.measure(
+                    lambda: PostSerializer(
+                        queryset[:size],
+                        many=True,
+                        context={"request": request},
+                    ).data,
+                    options["repeat"],
+                )
+                fast = self.measure(
+                    lambda: post_values.render(
+                        post_values.values(queryset)[:size], request
+                    ),
+                    options["repeat"],
+                )
+                self.stdout.write(
+                    f"{size:>4} posts/page: "
+                    f"serializer {size / slow:>9.0f} rows/s, "
+                    f"values {size / fast:>9.0f} rows/s "
+                    f"({slow / fast:.1f}x)"
+                )
+
+            transaction.set_rollback(True)
+
+    def create_posts(self, count):
+        owner = User.objects.create_user(
+            username="benchmark_owner", email="benchmark@example.com"
+        )
+        subreddits = [
+            Subreddit.objects.create(name=f"benchmark_{i}", owner=owner)
+            for i in range(5)
+        ]
+        Post.objects.bulk_create(
+            Post(
+                subreddit=subreddits[i % len(subreddits)],
+                owner=owner,
+                title=f"Benchmark post {i}",
+                body="Lorem ipsum dolor sit amet. " * 10,
+            )
+            for i in range(count)
+        )
+
+    def measure(self, render, repeat):
+        # Best of ``repeat`` runs, each including the page's queries.
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            render()
+            best = min(best, time.perf_counter() - start)
+        return best
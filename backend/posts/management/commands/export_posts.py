@@ -0,0 +1,54 @@
+import argparse
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from posts.export import FORMATS, export_lines
+from subreddits.models import Subreddit
+
+
+def iso_datetime(value):
+    # parse_datetime() returns None for input it does not recognize, which
+    # would silently drop the bound.
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise argparse.ArgumentTypeError(f"{value!r} is not an ISO 8601 datetime.")
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream every live post of a subreddit, oldest first, as NDJSON or "
+        "CSV. Bound it by --created-after/--created-before for incremental "
+        "exports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("subreddit", help="Name of the subreddit.")
+        parser.add_argument("--format", choices=list(FORMATS), default="ndjson")
+        parser.add_argument(
+            "--created-after", type=iso_datetime, help="Inclusive ISO 8601 bound."
+        )
+        parser.add_argument(
+            "--created-before", type=iso_datetime, help="Exclusive ISO 8601 bound."
+        )
+        parser.add_argument("--output", help="File to write (default: stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            subreddit = Subreddit.objects.get(name=options["subreddit"])
+        except Subreddit.DoesNotExist:
+            raise CommandError(f"Subreddit {options['subreddit']!r} does not exist.")
+
+        lines = export_lines(
+            subreddit.pk,
+            options["format"],
+            created_after=options["created_after"],
+            created_before=options["created_before"],
+        )
+        if options["output"]:
+            with open(options["output"], "w", newline="") as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import votes
+
+
+class Command(BaseCommand):
+    help = "Merge buffered votes into Post.vote_count."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--shard",
+            type=int,
+            help="Only flush this shard, so several flushers can run side by side.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep flushing once every VOTE_FLUSH_INTERVAL seconds.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Recompute every vote count from the Vote table instead.",
+        )
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            votes.rebuild_vote_counts()
+            self.stdout.write(self.style.SUCCESS("Rebuilt all vote counts."))
+            return
+
+        if options["shard"] is not None:
+            shards = [options["shard"]]
+        else:
+            shards = range(settings.VOTE_BUFFER_SHARDS)
+
+        while True:
+            for shard in shards:
+                votes.flush_shard(shard, batch_size=options["batch_size"])
+            if not options["loop"]:
+                break
+            time.sleep(settings.VOTE_FLUSH_INTERVAL)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from posts.search import get_search_engine
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index from every live post."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        get_search_engine().rebuild(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS("Rebuilt the post search index."))
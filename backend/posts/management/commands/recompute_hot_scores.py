@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.ranking import refresh_all_hot_scores
+
+
+class Command(BaseCommand):
+    help = "Recompute Post.hot_score for every post (e.g. after a formula change)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        refresh_all_hot_scores(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS("Recomputed all hot scores."))
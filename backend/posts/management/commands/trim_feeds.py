@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from posts.feed import trim_feeds
+
+
+class Command(BaseCommand):
+    help = "Delete home feed entries beyond FEED_MAX_LENGTH for every user."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-length", type=int)
+
+    def handle(self, *args, **options):
+        deleted = trim_feeds(max_length=options["max_length"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} feed entries."))
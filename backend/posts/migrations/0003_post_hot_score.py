@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+from posts.ranking import hot_score
+
+
+def backfill_hot_scores(apps, schema_editor):
+    Post = apps.get_model("posts", "Post")
+    last_pk = 0
+    while True:
+        posts = list(
+            Post.objects.filter(pk__gt=last_pk)
+            .only("pk", "vote_count", "created_at")
+            .order_by("pk")[:2000]
+        )
+        if not posts:
+            break
+        for post in posts:
+            post.hot_score = hot_score(post.vote_count, post.created_at)
+        Post.objects.bulk_update(posts, ["hot_score"])
+        last_pk = posts[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_vote'),
+        ('subreddits', '0003_subreddit_members'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='hot_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-hot_score', '-id'], name='posts_post_hot_sco_c26496_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['subreddit', '-hot_score', '-id'], name='posts_post_subredd_a9f41c_idx'),
+        ),
+        migrations.RunPython(backfill_hot_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0003_post_hot_score"),
+        ("subreddits", "0003_subreddit_members"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="post",
+            name="posts_post_vote_co_c5e6db_idx",
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="posts_post_created_a7e5d4_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["subreddit", "-created_at", "-id"],
+                name="posts_post_subredd_397cb7_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["-vote_count", "-id"], name="posts_post_vote_co_d8aaa8_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["subreddit", "-vote_count", "-id"],
+                name="posts_post_subredd_f4ebf6_idx",
+            ),
+        ),
+    ]
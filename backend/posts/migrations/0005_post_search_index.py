@@ -0,0 +1,38 @@
+from django.db import migrations
+
+CREATE_INDEX = """
+CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+    title, body, tokenize = 'porter unicode61'
+)
+"""
+
+POPULATE_INDEX = """
+INSERT INTO posts_post_fts (rowid, title, body)
+SELECT id, title, COALESCE(body, '') FROM posts_post WHERE NOT is_removed
+"""
+
+
+def create_search_index(apps, schema_editor):
+    # The FTS5 index only exists on SQLite; other databases either use the
+    # fallback engine or provide their own index.
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(CREATE_INDEX)
+    schema_editor.execute(POPULATE_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS posts_post_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0004_post_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
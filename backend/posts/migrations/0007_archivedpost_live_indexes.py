@@ -0,0 +1,142 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0006_feedentry"),
+        ("subreddits", "0003_subreddit_members"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedPost",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("title", models.CharField(max_length=255)),
+                ("body", models.TextField(blank=True, null=True)),
+                ("url", models.URLField(blank=True, null=True)),
+                (
+                    "media",
+                    models.FileField(blank=True, null=True, upload_to="post_media/"),
+                ),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                ("vote_count", models.IntegerField(default=0)),
+                ("comment_count", models.IntegerField(default=0)),
+                ("hot_score", models.FloatField(default=0)),
+                ("is_spoiler", models.BooleanField(default=False)),
+                ("is_nsfw", models.BooleanField(default=False)),
+                ("is_removed", models.BooleanField(default=False)),
+                (
+                    "removal_reason",
+                    models.CharField(blank=True, max_length=255, null=True),
+                ),
+                ("moderator_notes", models.TextField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name="post",
+            name="posts_post_hot_sco_c26496_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="post",
+            name="posts_post_subredd_a9f41c_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="post",
+            name="posts_post_created_a7e5d4_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="post",
+            name="posts_post_subredd_397cb7_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="post",
+            name="posts_post_vote_co_d8aaa8_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="post",
+            name="posts_post_subredd_f4ebf6_idx",
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("is_removed", False)),
+                fields=["-created_at", "-id"],
+                name="posts_live_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("is_removed", False)),
+                fields=["subreddit", "-created_at", "-id"],
+                name="posts_live_sub_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("is_removed", False)),
+                fields=["-vote_count", "-id"],
+                name="posts_live_votes_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("is_removed", False)),
+                fields=["subreddit", "-vote_count", "-id"],
+                name="posts_live_sub_votes_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("is_removed", False)),
+                fields=["-hot_score", "-id"],
+                name="posts_live_hot_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("is_removed", False)),
+                fields=["subreddit", "-hot_score", "-id"],
+                name="posts_live_sub_hot_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("is_removed", True)),
+                fields=["id"],
+                name="posts_removed_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedpost",
+            name="owner",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="archived_posts",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedpost",
+            name="subreddit",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="archived_posts",
+                to="subreddits.subreddit",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0008_post_blob"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="archivedpost",
+            index=models.Index(
+                condition=models.Q(("is_removed", False)),
+                fields=["subreddit", "created_at", "id"],
+                name="archived_sub_created_idx",
+            ),
+        ),
+    ]
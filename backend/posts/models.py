@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class Post(models.Model):
@@ -14,12 +15,24 @@ class Post(models.Model):
     body = models.TextField(blank=True, null=True)
     url = models.URLField(blank=True, null=True)
     media = models.FileField(upload_to="post_media/", blank=True, null=True)
+    # A finalized chunked upload (see uploads/storage.py).
+    blob = models.ForeignKey(
+        "uploads.Blob",
+        related_name="%(class)ss",
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     vote_count = models.IntegerField(default=0)
+    # Last vote buffer epoch merged into vote_count (see posts/votes.py).
+    vote_epoch = models.BigIntegerField(default=0)
     comment_count = models.IntegerField(default=0)
+    # Kept up to date from vote_count (see posts/ranking.py).
+    hot_score = models.FloatField(default=0)
 
     is_spoiler = models.BooleanField(default=False)
     is_nsfw = models.BooleanField(default=False)
@@ -33,8 +46,159 @@ class Post(models.Model):
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["subreddit", "owner"]),
-            models.Index(fields=["-vote_count"]),
+            # Keyset pagination seeks on (sort key, id); see posts/pagination.py.
+            # Every listing filters on is_removed=False, so removed rows are
+            # left out of these indexes.
+            *[
+                models.Index(
+                    fields=fields, name=name, condition=models.Q(is_removed=False)
+                )
+                for name, fields in [
+                    ("posts_live_created_idx", ["-created_at", "-id"]),
+                    ("posts_live_sub_created_idx", ["subreddit", "-created_at", "-id"]),
+                    ("posts_live_votes_idx", ["-vote_count", "-id"]),
+                    ("posts_live_sub_votes_idx", ["subreddit", "-vote_count", "-id"]),
+                    ("posts_live_hot_idx", ["-hot_score", "-id"]),
+                    ("posts_live_sub_hot_idx", ["subreddit", "-hot_score", "-id"]),
+                ]
+            ],
+            # Removed posts waiting for posts/archive.py.
+            models.Index(
+                fields=["id"],
+                name="posts_removed_idx",
+                condition=models.Q(is_removed=True),
+            ),
         ]
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            from .ranking import hot_score
+
+            self.hot_score = hot_score(
+                self.vote_count, self.created_at or timezone.now()
+            )
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.title
+
+
+class ArchivedPost(models.Model):
+    """
+    A removed or old post moved out of ``posts_post`` by posts/archive.py.
+    Keeps the post's id; its comments still refer to it.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    subreddit = models.ForeignKey(
+        "subreddits.Subreddit", related_name="archived_posts", on_delete=models.CASCADE
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="archived_posts",
+        on_delete=models.CASCADE,
+    )
+
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True, null=True)
+    url = models.URLField(blank=True, null=True)
+    media = models.FileField(upload_to="post_media/", blank=True, null=True)
+    # A finalized chunked upload (see uploads/storage.py).
+    blob = models.ForeignKey(
+        "uploads.Blob",
+        related_name="%(class)ss",
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+    )
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    # Including the buffered votes at the time of archiving.
+    vote_count = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+    hot_score = models.FloatField(default=0)
+
+    is_spoiler = models.BooleanField(default=False)
+    is_nsfw = models.BooleanField(default=False)
+
+    is_removed = models.BooleanField(default=False)
+    removal_reason = models.CharField(max_length=255, blank=True, null=True)
+    moderator_notes = models.TextField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Subreddit exports, oldest first; see posts/export.py.
+            models.Index(
+                fields=["subreddit", "created_at", "id"],
+                name="archived_sub_created_idx",
+                condition=models.Q(is_removed=False),
+            ),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class FeedEntry(models.Model):
+    """
+    A post pushed into a member's home feed when it was created (see
+    posts/feed.py). Posts of very large subreddits are not pushed; they are
+    merged in at read time instead.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name="feed_entries", on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post, related_name="feed_entries", on_delete=models.CASCADE
+    )
+    subreddit = models.ForeignKey(
+        "subreddits.Subreddit", related_name="+", on_delete=models.CASCADE
+    )
+    # Copy of post.created_at, so a feed page is one index range scan.
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_feed_entry_per_user_and_post"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-post"]),
+            models.Index(fields=["user", "subreddit"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user} <- {self.post}"
+
+
+class Vote(models.Model):
+    UPVOTE = 1
+    DOWNVOTE = -1
+    VALUE_CHOICES = (
+        (UPVOTE, "Upvote"),
+        (DOWNVOTE, "Downvote"),
+    )
+
+    post = models.ForeignKey(Post, related_name="votes", on_delete=models.CASCADE)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name="votes", on_delete=models.CASCADE
+    )
+    value = models.SmallIntegerField(choices=VALUE_CHOICES)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "user"], name="unique_vote_per_user_and_post"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} -> {self.post} ({self.value:+d})"
@@ -0,0 +1,222 @@
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .models import Post
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination over whatever ordering the filters applied.
+
+    The last ordering key is always the primary key, so a page boundary is a
+    unique position and the next page is fetched with
+    ``WHERE (sort_key, id) < (last_sort_key, last_id) LIMIT n``. With an index
+    on the ordering columns every page costs the same, no matter how deep,
+    and no ``COUNT(*)`` is ever issued.
+
+    Positions are handed to clients as opaque base64 cursor tokens that are
+    tied to the ordering they were issued for.
+    """
+
+    cursor_query_param = "cursor"
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views."""
+        return self.finish_page(
+            [item async for item in self.page_queryset(queryset, request)]
+        )
+
+    def page_queryset(self, queryset, request):
+        """The query for the requested page, plus one item to tell if it is the last."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        self.position, self.reverse = self.decode_cursor(request, queryset)
+        ordering = (
+            [_invert(field) for field in self.ordering]
+            if self.reverse
+            else self.ordering
+        )
+
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.seek(ordering, self.position))
+        return queryset[: self.page_size + 1]
+
+    def finish_page(self, results):
+        position, reverse = self.position, self.reverse
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        self.first_position = self.get_position(results[0]) if results else None
+        self.last_position = self.get_position(results[-1]) if results else None
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not any(field.lstrip("-") in ("id", "pk") for field in ordering):
+            direction = "-" if ordering and ordering[-1].startswith("-") else ""
+            ordering.append(f"{direction}id")
+        return ordering
+
+    def seek(self, ordering, position):
+        """Build the ``WHERE`` clause selecting rows after ``position``."""
+        clauses = []
+        for index, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            equal = {
+                previous.lstrip("-"): position[i]
+                for i, previous in enumerate(ordering[:index])
+            }
+            clauses.append(Q(**equal, **{f"{name}__{lookup}": position[index]}))
+        return reduce(or_, clauses)
+
+    def get_position(self, item):
+        return [_value(item, field.lstrip("-")) for field in self.ordering]
+
+    def encode_cursor(self, position, reverse):
+        payload = {
+            "o": self.ordering,
+            "p": [
+                value.isoformat() if hasattr(value, "isoformat") else value
+                for value in position
+            ],
+        }
+        if reverse:
+            payload["r"] = 1
+        token = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, queryset):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            if payload["o"] != self.ordering or len(payload["p"]) != len(self.ordering):
+                raise ValueError
+            # Tokens come back from clients: every value must be one the
+            # ordering field could hold before it reaches a filter.
+            position = [
+                _to_python(queryset, field.lstrip("-"), value)
+                for field, value in zip(self.ordering, payload["p"])
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, bool(payload.get("r"))
+
+    def get_next_link(self):
+        if not self.has_next or self.last_position is None:
+            return None
+        return self.encode_cursor(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first_position is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.first_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Forward-only keyset pagination for the home feed, which is merged from
+    several sources rather than read from one queryset.
+    """
+
+    ordering = ["-created_at", "-id"]
+
+    def paginate_feed(self, read_feed, request):
+        """
+        Call ``read_feed(limit, before)`` for one page of
+        ``(created_at, post_id)`` positions.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        # Positions are the created_at and id of posts.
+        position, reverse = self.decode_cursor(request, Post.objects.all())
+        if reverse:
+            raise NotFound(self.invalid_cursor_message)
+
+        positions = read_feed(self.page_size + 1, position)
+        self.has_next = len(positions) > self.page_size
+        self.has_previous = False
+        positions = positions[: self.page_size]
+        self.first_position = list(positions[0]) if positions else None
+        self.last_position = list(positions[-1]) if positions else None
+        return [post_id for _, post_id in positions]
+
+
+def _invert(field):
+    return field[1:] if field.startswith("-") else f"-{field}"
+
+
+def _to_python(queryset, name, value):
+    if value is None:
+        raise ValueError
+    if name in queryset.query.annotations:
+        field = queryset.query.annotations[name].output_field
+    elif name == "pk":
+        field = queryset.model._meta.pk
+    else:
+        field = queryset.model._meta.get_field(name)
+    return field.to_python(value)
+
+
+def _value(item, name):
+    return item[name] if isinstance(item, dict) else getattr(item, name)
@@ -0,0 +1,60 @@
+"""
+Materialized "hot" ranking for posts.
+
+``Post.hot_score`` uses Reddit's formula: the log of the net votes plus the
+post's age measured from a fixed epoch. Because the time term is absolute,
+a score never changes while a post merely gets older; newer posts simply
+start higher. Scores therefore only need refreshing when ``vote_count``
+changes, which the vote flusher does for exactly the posts it updated.
+"""
+
+from datetime import datetime, timezone
+from math import log10
+
+from api.conditional import bump
+
+from .models import Post
+
+# Reddit's reference epoch (2005-12-08) and the seconds worth one order of
+# magnitude of votes (12.5 hours).
+HOT_EPOCH = datetime(2005, 12, 8, 7, 46, 43, tzinfo=timezone.utc)
+HOT_DECAY_SECONDS = 45000
+
+
+def hot_score(vote_count, created_at):
+    order = log10(max(abs(vote_count), 1))
+    sign = (vote_count > 0) - (vote_count < 0)
+    seconds = (created_at - HOT_EPOCH).total_seconds()
+    return round(sign * order + seconds / HOT_DECAY_SECONDS, 7)
+
+
+def refresh_hot_scores(post_ids, batch_size=500):
+    """Recompute ``hot_score`` for the given posts."""
+    post_ids = list(post_ids)
+    for start in range(0, len(post_ids), batch_size):
+        posts = list(
+            Post.objects.filter(pk__in=post_ids[start : start + batch_size]).only(
+                "pk", "vote_count", "created_at", "hot_score"
+            )
+        )
+        for post in posts:
+            post.hot_score = hot_score(post.vote_count, post.created_at)
+        Post.objects.bulk_update(posts, ["hot_score"])
+
+
+def refresh_all_hot_scores(batch_size=500):
+    """Recompute every ``hot_score``, walking the table in primary key order."""
+    last_pk = 0
+    while True:
+        post_ids = list(
+            Post.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not post_ids:
+            break
+        refresh_hot_scores(post_ids, batch_size=batch_size)
+        last_pk = post_ids[-1]
+
+    # Orderings by hot_score may have changed.
+    bump("posts")
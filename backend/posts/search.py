@@ -0,0 +1,125 @@
+"""
+Full-text search for posts.
+
+``?search=`` on the post listings asks the configured engine
+(``settings.POST_SEARCH_ENGINE``) for the ids of the best matching posts,
+most relevant first. Engines keep their own index in sync through the
+signal handlers in ``posts/signals.py``.
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+
+class SearchEngine:
+    """Interface every search backend implements."""
+
+    def index(self, posts):
+        """Add or refresh ``posts`` in the index."""
+        raise NotImplementedError
+
+    def remove(self, post_ids):
+        """Drop the given post ids from the index."""
+        raise NotImplementedError
+
+    def search(self, query, limit):
+        """Return up to ``limit`` matching post ids, best match first."""
+        raise NotImplementedError
+
+    def rebuild(self, batch_size=1000):
+        """Re-index every live post."""
+        last_pk = 0
+        while True:
+            posts = list(
+                Post.objects.filter(pk__gt=last_pk, is_removed=False)
+                .only("pk", "title", "body")
+                .order_by("pk")[:batch_size]
+            )
+            if not posts:
+                break
+            self.index(posts)
+            last_pk = posts[-1].pk
+
+
+class DatabaseSearchEngine(SearchEngine):
+    """
+    Fallback without an index: ``icontains`` over title and body, newest
+    first. Works on any database but scans the whole table.
+    """
+
+    def index(self, posts):
+        pass
+
+    def remove(self, post_ids):
+        pass
+
+    def search(self, query, limit):
+        queryset = Post.objects.filter(is_removed=False)
+        for term in query.split():
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(body__icontains=term)
+            )
+        return list(
+            queryset.order_by("-created_at").values_list("pk", flat=True)[:limit]
+        )
+
+    def rebuild(self, batch_size=1000):
+        pass
+
+
+class SQLiteSearchEngine(SearchEngine):
+    """
+    SQLite FTS5 inverted index in the ``posts_post_fts`` virtual table
+    (created by migration 0005), keyed by the post id and ranked by BM25
+    with title matches weighted above body matches.
+    """
+
+    table = "posts_post_fts"
+    title_weight = 2.0
+    body_weight = 1.0
+
+    def index(self, posts):
+        posts = list(posts)
+        if not posts:
+            return
+        self.remove([post.pk for post in posts])
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, title, body) VALUES (%s, %s, %s)",
+                [(post.pk, post.title, post.body or "") for post in posts],
+            )
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.table} WHERE rowid = %s",
+                [(post_id,) for post_id in post_ids],
+            )
+
+    def search(self, query, limit):
+        # Quote every word so user input can never be parsed as FTS syntax.
+        terms = " ".join(f'"{term}"' for term in re.findall(r"\w+", query))
+        if not terms:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s "
+                f"ORDER BY bm25({self.table}, %s, %s) LIMIT %s",
+                [terms, self.title_weight, self.body_weight, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def rebuild(self, batch_size=1000):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+        super().rebuild(batch_size=batch_size)
+
+
+def get_search_engine():
+    return import_string(settings.POST_SEARCH_ENGINE)()
@@ -1,17 +1,40 @@
+from api.metrics import TimedSerializerMixin
+from api.rows import ValuesSerializer
+from django.db import models
 from rest_framework import serializers
 from subreddits.models import Subreddit
 from subreddits.serializers import SubredditSerializer
+from uploads.models import Blob, UploadSession
+from uploads.serializers import BlobSerializer
 from users.serializers import UserSerializer
 
+from . import votes
+from .export import FORMATS
 from .models import Post
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    def to_representation(self, data):
+        # Fetch the buffered votes of the whole page in one cache round-trip.
+        posts = list(data.all() if isinstance(data, models.Manager) else data)
+        votes.annotate_pending(posts)
+        return super().to_representation(posts)
+
+
+class PostSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
     subreddit = SubredditSerializer(read_only=True)
     subreddit_id = serializers.PrimaryKeyRelatedField(
         queryset=Subreddit.objects.all(), source="subreddit", write_only=True
     )
+    blob = BlobSerializer(read_only=True)
+    blob_id = serializers.PrimaryKeyRelatedField(
+        queryset=Blob.objects.all(),
+        source="blob",
+        write_only=True,
+        required=False,
+        allow_null=True,
+    )
 
     class Meta:
         model = Post
@@ -24,6 +47,8 @@ class PostSerializer(serializers.ModelSerializer):
             "body",
             "url",
             "media",
+            "blob",
+            "blob_id",
             "created_at",
             "updated_at",
             "vote_count",
@@ -32,9 +57,25 @@ class PostSerializer(serializers.ModelSerializer):
             "is_nsfw",
         ]
         read_only_fields = ["owner", "vote_count", "comment_count"]
+        list_serializer_class = PostListSerializer
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data["vote_count"] = votes.current_count(instance)
+        return data
+
+    def validate_blob_id(self, value):
+        # Blobs are shared by everyone who uploaded the same bytes; a post
+        # may use one its author uploaded, or the one it already has.
+        if value is None or (self.instance and self.instance.blob_id == value.pk):
+            return value
+        request = self.context["request"]
+        if not UploadSession.objects.filter(owner=request.user, blob=value).exists():
+            raise serializers.ValidationError("You have not uploaded this file.")
+        return value
 
     def validate(self, data):
-        if not data.get("body") and not data.get("url") and not data.get("media"):
+        if not any(data.get(name) for name in ["body", "url", "media", "blob"]):
             raise serializers.ValidationError(
                 "A post must have a body, a URL, or a media file."
             )
@@ -43,3 +84,77 @@ class PostSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data["owner"] = self.context["request"].user
         return super().create(validated_data)
+
+
+class IngestPostSerializer(serializers.ModelSerializer):
+    """
+    One row of a bulk upload (see posts/ingest.py). Checks the shape of the
+    row only; subreddits and owners are looked up per batch.
+    """
+
+    subreddit_id = serializers.IntegerField(min_value=1)
+    owner = serializers.CharField(required=False, max_length=150)
+
+    class Meta:
+        model = Post
+        fields = [
+            "subreddit_id",
+            "owner",
+            "title",
+            "body",
+            "url",
+            "is_spoiler",
+            "is_nsfw",
+        ]
+
+    def validate(self, data):
+        if not data.get("body") and not data.get("url"):
+            raise serializers.ValidationError("A post must have a body or a URL.")
+        return data
+
+
+class ExportParamsSerializer(serializers.Serializer):
+    """Query parameters of a subreddit export (see posts/export.py)."""
+
+    output = serializers.ChoiceField(choices=list(FORMATS), default="ndjson")
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+
+
+class PostValuesSerializer(ValuesSerializer):
+    """
+    ``PostSerializer`` for read-only listings, rendered from ``.values()``
+    rows (see api/rows.py). Produces the same output in one query per page.
+    """
+
+    def values(self, queryset, *extra):
+        # vote_epoch is needed for the vote overlay and hot_score for keyset
+        # pagination on ?ordering=hot.
+        return super().values(queryset, "vote_epoch", "hot_score", *extra)
+
+    def render(self, rows, request=None):
+        rows = list(rows)
+        pending = votes.pending_deltas_by_id(
+            {row["id"]: row["vote_epoch"] for row in rows}
+        )
+        return self.add_pending(super().render(rows, request), pending)
+
+    async def arender(self, rows, request=None):
+        """``render`` for async views."""
+        rows = list(rows)
+        pending = await votes.apending_deltas_by_id(
+            {row["id"]: row["vote_epoch"] for row in rows}
+        )
+        return self.add_pending(super().render(rows, request), pending)
+
+    def add_pending(self, data, pending):
+        for item in data:
+            item["vote_count"] += pending[item["id"]]
+        return data
+
+
+post_values = PostValuesSerializer(PostSerializer)
+
+
+class VoteSerializer(serializers.Serializer):
+    value = serializers.ChoiceField(choices=[1, 0, -1])
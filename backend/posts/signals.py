@@ -0,0 +1,59 @@
+from api.conditional import bump_on_commit
+from comments.models import Comment
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from subreddits.models import Subreddit
+
+from .feed import fan_out
+from .models import ArchivedPost, Post
+from .search import get_search_engine
+
+
+@receiver(post_save, sender=Post)
+def push_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: fan_out([instance]))
+
+
+@receiver(post_save, sender=Post)
+def sync_search_index(sender, instance, **kwargs):
+    engine = get_search_engine()
+    if instance.is_removed:
+        engine.remove([instance.pk])
+    else:
+        engine.index([instance])
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_search_index(sender, instance, origin=None, **kwargs):
+    # Deleting a subreddit drops all of its posts at once, below.
+    if not isinstance(origin, Subreddit):
+        get_search_engine().remove([instance.pk])
+
+
+@receiver(pre_delete, sender=Subreddit)
+def remove_subreddit_from_search_index(sender, instance, **kwargs):
+    get_search_engine().remove(
+        Post.objects.filter(subreddit_id=instance.pk).values_list("pk", flat=True)
+    )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_stamps(sender, instance, **kwargs):
+    bump_on_commit("posts", f"posts:{instance.subreddit_id}")
+
+
+@receiver(post_delete, sender=ArchivedPost)
+def delete_archived_comments(sender, instance, origin=None, **kwargs):
+    # Comment.post has no database constraint, so nothing else removes them.
+    if not isinstance(origin, Subreddit):
+        Comment.objects.filter(post_id=instance.pk).delete()
+
+
+@receiver(pre_delete, sender=Subreddit)
+def delete_subreddit_archived_comments(sender, instance, **kwargs):
+    Comment.objects.filter(
+        post_id__in=ArchivedPost.objects.filter(subreddit_id=instance.pk).values("pk")
+    ).delete()
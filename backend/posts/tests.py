@@ -1,3 +1,971 @@
-from django.test import TestCase
+import base64
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from api.cache import get_or_rebuild
+from api.rows import ValuesSerializer
+from asgiref.sync import sync_to_async
+from comments.models import Comment
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from subreddits.models import Subreddit
+from uploads.models import Blob
+from users.models import KarmaEvent
+
+from . import async_views, votes
+from .archive import archive_posts
+from .feed import trim_feeds
+from .models import ArchivedPost, FeedEntry, Post, Vote
+from .ranking import hot_score, refresh_hot_scores
+from .serializers import PostSerializer, post_values
+
+User = get_user_model()
+
+
+class VoteTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        # The buffer's clock only moves when a test flushes.
+        self.clock = self.enterContext(
+            mock.patch.object(votes, "current_epoch", return_value=100)
+        )
+        self.author = User.objects.create_user(
+            username="author", password="password123", email="author@example.com"
+        )
+        self.voter = User.objects.create_user(
+            username="voter", password="password123", email="voter@example.com"
+        )
+        self.subreddit = Subreddit.objects.create(name="votes", owner=self.author)
+        self.post = Post.objects.create(
+            subreddit=self.subreddit, owner=self.author, title="Vote", body="me"
+        )
+        self.url = reverse("post-vote", kwargs={"pk": self.post.pk})
+
+    def vote(self, value):
+        # Votes reach the buffer once their transaction commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, {"value": value})
+
+    def flush(self):
+        # Close the current epoch and wait out the flusher's grace period.
+        self.clock.return_value += votes.GRACE_EPOCHS
+        votes.flush()
+        self.post.refresh_from_db()
+
+    def test_vote_requires_authentication(self):
+        response = self.client.post(self.url, {"value": 1})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_value_rejected(self):
+        self.client.force_authenticate(user=self.voter)
+        response = self.client.post(self.url, {"value": 5})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_vote_is_buffered_until_flush(self):
+        self.client.force_authenticate(user=self.voter)
+        response = self.vote(1)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["vote_count"], 1)
+        self.assertTrue(Vote.objects.filter(post=self.post, user=self.voter).exists())
+
+        # The row is untouched, but reads already include the buffered vote.
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.vote_count, 0)
+        detail = self.client.get(reverse("post-detail", kwargs={"pk": self.post.pk}))
+        self.assertEqual(detail.data["vote_count"], 1)
+
+        self.flush()
+        self.assertEqual(self.post.vote_count, 1)
+        self.assertEqual(votes.current_count(self.post), 1)
+        self.assertEqual(self.post.hot_score, hot_score(1, self.post.created_at))
+
+    def test_changing_and_retracting_vote(self):
+        self.client.force_authenticate(user=self.voter)
+        self.vote(1)
+        response = self.vote(-1)
+        self.assertEqual(response.data["vote_count"], -1)
+
+        response = self.vote(0)
+        self.assertEqual(response.data["vote_count"], 0)
+        self.assertFalse(Vote.objects.filter(post=self.post).exists())
+
+        self.flush()
+        self.assertEqual(self.post.vote_count, 0)
+
+    def test_repeated_vote_counts_once(self):
+        self.client.force_authenticate(user=self.voter)
+        self.vote(1)
+        response = self.vote(1)
+        self.assertEqual(response.data["vote_count"], 1)
+
+    def test_replayed_epoch_is_not_applied_twice(self):
+        votes.cast_vote(self.post, self.voter, 1)
+        epoch = votes.current_epoch()
+
+        self.assertEqual(votes.apply_deltas({self.post.pk: 1}, epoch), [self.post.pk])
+        self.assertEqual(votes.apply_deltas({self.post.pk: 1}, epoch), [])
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.vote_count, 1)
+        # The applied epoch is no longer added on top of the stored count.
+        self.assertEqual(votes.current_count(self.post), 1)
+
+    def test_buffer_needs_a_shared_cache_that_keeps_its_entries(self):
+        votes.check_buffer_cache()
+        with override_settings(SINGLE_PROCESS=False):
+            with self.assertRaises(ImproperlyConfigured):
+                votes.check_buffer_cache()
+        evicting = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        }
+        with override_settings(CACHES=evicting):
+            with self.assertRaises(ImproperlyConfigured):
+                votes.check_buffer_cache()
+
+    def test_rebuild_recomputes_from_votes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            votes.cast_vote(self.post, self.voter, 1)
+            votes.cast_vote(self.post, self.author, 1)
+        cache.clear()
+
+        votes.rebuild_vote_counts()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.vote_count, 2)
+        self.assertEqual(votes.current_count(self.post), 2)
+
+    def test_votes_after_a_rebuild_are_kept(self):
+        voters = [
+            User.objects.create_user(
+                username=f"voter{i}",
+                password="password123",
+                email=f"voter{i}@example.com",
+            )
+            for i in range(3)
+        ]
+
+        def vote_at(epoch, user):
+            with mock.patch.object(votes, "current_epoch", return_value=epoch):
+                with self.captureOnCommitCallbacks(execute=True):
+                    votes.cast_vote(self.post, user, 1)
+
+        vote_at(100, voters[0])
+        cache.clear()
+        with mock.patch.object(votes, "current_epoch", return_value=100):
+            votes.rebuild_vote_counts()
+        # In the rebuild's epoch, and in the next one.
+        vote_at(100, voters[1])
+        vote_at(101, voters[2])
+
+        with mock.patch.object(votes, "current_epoch", return_value=101):
+            self.post.refresh_from_db()
+            self.assertEqual(votes.current_count(self.post), 3)
+        with mock.patch.object(votes, "current_epoch", return_value=104):
+            votes.flush()
+            self.post.refresh_from_db()
+            self.assertEqual(self.post.vote_count, 3)
+            self.assertEqual(votes.current_count(self.post), 3)
+
+    def test_flushed_keys_outlive_stale_reads(self):
+        with mock.patch.object(votes, "current_epoch", return_value=100):
+            with self.captureOnCommitCallbacks(execute=True):
+                votes.cast_vote(self.post, self.voter, 1)
+        stale = Post.objects.get(pk=self.post.pk)
+        key = votes._delta_key(votes.shard_for(self.post.pk), 100, self.post.pk)
+
+        with mock.patch.object(votes, "current_epoch", return_value=103):
+            votes.flush()
+            # Loaded before the flush, read after it.
+            self.assertEqual(votes.current_count(stale), 1)
+        with mock.patch.object(votes, "current_epoch", return_value=104):
+            votes.flush()
+            self.assertEqual(cache.get(key), 1)
+        with mock.patch.object(votes, "current_epoch", return_value=105):
+            votes.flush()
+            self.assertIsNone(cache.get(key))
+            self.post.refresh_from_db()
+            self.assertEqual(votes.current_count(self.post), 1)
+
+
+class HotRankingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="ranker", password="password123", email="ranker@example.com"
+        )
+        self.subreddit = Subreddit.objects.create(name="hot", owner=self.user)
+        self.old = self.create_post("old", vote_count=100, age=timedelta(days=1))
+        self.new = self.create_post("new", vote_count=10, age=timedelta(0))
+        self.buried = self.create_post("buried", vote_count=-50, age=timedelta(0))
+
+    def create_post(self, title, vote_count, age):
+        post = Post.objects.create(
+            subreddit=self.subreddit, owner=self.user, title=title, body="..."
+        )
+        Post.objects.filter(pk=post.pk).update(
+            vote_count=vote_count, created_at=timezone.now() - age
+        )
+        refresh_hot_scores([post.pk])
+        return post
+
+    def test_score_grows_with_votes_and_recency(self):
+        now = timezone.now()
+        self.assertGreater(hot_score(10, now), hot_score(1, now))
+        self.assertGreater(hot_score(2, now), hot_score(-2, now))
+        self.assertGreater(hot_score(1, now), hot_score(1, now - timedelta(days=1)))
+
+    def test_new_post_gets_a_score(self):
+        post = Post.objects.get(pk=self.new.pk)
+        self.assertEqual(post.hot_score, hot_score(10, post.created_at))
+
+    def test_hot_action_orders_by_score(self):
+        response = self.client.get(reverse("post-hot"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [post["title"] for post in response.data["results"]]
+        self.assertEqual(titles, ["new", "old", "buried"])
+
+    def test_ordering_hot_alias(self):
+        response = self.client.get(reverse("post-list"), {"ordering": "hot"})
+        titles = [post["title"] for post in response.data["results"]]
+        self.assertEqual(titles, ["new", "old", "buried"])
+
+        response = self.client.get(reverse("post-list"), {"ordering": "-hot"})
+        titles = [post["title"] for post in response.data["results"]]
+        self.assertEqual(titles, ["buried", "old", "new"])
+
+
+class TrendingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="trender", password="password123", email="trender@example.com"
+        )
+        self.django = Subreddit.objects.create(name="django", owner=self.user)
+        self.python = Subreddit.objects.create(name="python", owner=self.user)
+        self.recent = self.create_post(self.django, "recent", 5, timedelta(days=1))
+        self.other = self.create_post(self.python, "other", 3, timedelta(days=1))
+        self.stale = self.create_post(self.django, "stale", 50, timedelta(days=5))
+        self.url = reverse("post-trending")
+
+    def create_post(self, subreddit, title, vote_count, age):
+        post = Post.objects.create(
+            subreddit=subreddit, owner=self.user, title=title, body="..."
+        )
+        Post.objects.filter(pk=post.pk).update(
+            vote_count=vote_count, created_at=timezone.now() - age
+        )
+        return post
+
+    def test_only_posts_from_last_three_days(self):
+        response = self.client.get(self.url)
+        titles = [post["title"] for post in response.data]
+        self.assertEqual(titles, ["recent", "other"])
+
+    def test_trending_is_scoped_per_subreddit(self):
+        response = self.client.get(self.url, {"subreddit__name": "python"})
+        self.assertEqual([post["title"] for post in response.data], ["other"])
+
+        response = self.client.get(self.url, {"subreddit__name": "django"})
+        self.assertEqual([post["title"] for post in response.data], ["recent"])
+
+    def test_subreddit_named_all_has_its_own_entry(self):
+        everything = Subreddit.objects.create(name="all", owner=self.user)
+        self.create_post(everything, "local", 1, timedelta(days=1))
+
+        response = self.client.get(self.url, {"subreddit__name": "all"})
+        self.assertEqual([post["title"] for post in response.data], ["local"])
+
+        response = self.client.get(self.url)
+        titles = [post["title"] for post in response.data]
+        self.assertEqual(titles, ["recent", "other", "local"])
+
+    def test_cache_hit_skips_the_database(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 2)
+
+    def test_stale_entry_served_while_another_worker_rebuilds(self):
+        key = "soft-ttl-test"
+        get_or_rebuild(key, lambda: "old", soft_ttl=-1, hard_ttl=60)
+
+        # Another worker holds the rebuild lock, so we get the stale value.
+        cache.add(f"{key}:rebuild", 1)
+        self.assertEqual(
+            get_or_rebuild(key, lambda: "new", soft_ttl=60, hard_ttl=60), "old"
+        )
+
+        cache.delete(f"{key}:rebuild")
+        self.assertEqual(
+            get_or_rebuild(key, lambda: "new", soft_ttl=60, hard_ttl=60), "new"
+        )
+
+
+def tampered_cursor(ordering, position):
+    payload = json.dumps({"o": ordering, "p": position})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="pager", password="password123", email="pager@example.com"
+        )
+        self.django = Subreddit.objects.create(name="django", owner=self.user)
+        self.python = Subreddit.objects.create(name="python", owner=self.user)
+        created_at = timezone.now()
+        for i in range(7):
+            subreddit = self.django if i % 2 else self.python
+            post = Post.objects.create(
+                subreddit=subreddit, owner=self.user, title=f"post {i}", body="..."
+            )
+            # Every other pair of posts shares a timestamp and a vote count,
+            # so pages must break ties on the id.
+            Post.objects.filter(pk=post.pk).update(
+                created_at=created_at - timedelta(minutes=i // 2), vote_count=i // 2
+            )
+        self.url = reverse("post-list")
+
+    def collect(self, params):
+        titles, url, pages = [], self.url, 0
+        while url:
+            response = self.client.get(url, params if pages == 0 else None)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            titles.extend(post["title"] for post in response.data["results"])
+            url = response.data["next"]
+            pages += 1
+        return titles, pages
+
+    def test_walks_every_post_once_in_order(self):
+        titles, pages = self.collect({"page_size": 3})
+        expected = list(
+            Post.objects.order_by("-created_at", "-id").values_list("title", flat=True)
+        )
+        self.assertEqual(titles, expected)
+        self.assertEqual(pages, 3)
+
+    def test_vote_count_ordering(self):
+        titles, _ = self.collect({"page_size": 2, "ordering": "vote_count"})
+        expected = list(
+            Post.objects.order_by("vote_count", "id").values_list("title", flat=True)
+        )
+        self.assertEqual(titles, expected)
+
+    def test_filter_by_subreddit(self):
+        titles, _ = self.collect({"page_size": 2, "subreddit__name": "django"})
+        self.assertEqual(titles, ["post 1", "post 3", "post 5"])
+
+    def test_previous_link_returns_to_earlier_page(self):
+        first = self.client.get(self.url, {"page_size": 3})
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+
+        self.assertEqual(back.data["results"], first.data["results"])
+        self.assertIsNone(back.data["previous"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_is_bound_to_its_ordering(self):
+        first = self.client.get(self.url, {"page_size": 3})
+        response = self.client.get(first.data["next"] + "&ordering=vote_count")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor_values(self):
+        for position in (["notadate", 1], [{}, 1], ["x", "y"], [None, 1]):
+            with self.subTest(position=position):
+                cursor = tampered_cursor(["-created_at", "-id"], position)
+                response = self.client.get(self.url, {"cursor": cursor})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="searcher", password="password123", email="searcher@example.com"
+        )
+        self.subreddit = Subreddit.objects.create(name="search", owner=self.user)
+        self.subreddit.members.add(self.user)
+        self.in_title = self.create_post("Django tips", "Some helpful notes.")
+        self.in_body = self.create_post("Weekly thread", "Ask about django here.")
+        self.unrelated = self.create_post("Flask", "Nothing to see.")
+        self.url = reverse("post-list")
+
+    def create_post(self, title, body):
+        return Post.objects.create(
+            subreddit=self.subreddit, owner=self.user, title=title, body=body
+        )
+
+    def search(self, query, **params):
+        response = self.client.get(self.url, {"search": query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post["title"] for post in response.data["results"]]
+
+    def test_results_ranked_by_relevance(self):
+        self.assertEqual(self.search("django"), ["Django tips", "Weekly thread"])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search("django helpful"), ["Django tips"])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('django OR "flask'), [])
+        self.assertEqual(self.search("*"), [])
+
+    def test_edits_are_reindexed(self):
+        self.unrelated.body = "Now it mentions Django too."
+        self.unrelated.save()
+        self.assertIn("Flask", self.search("django"))
+
+    def test_removed_posts_leave_the_index(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.delete(reverse("post-detail", kwargs={"pk": self.in_title.pk}))
+        self.assertEqual(self.search("django"), ["Weekly thread"])
+
+    def test_search_results_paginate(self):
+        first = self.client.get(self.url, {"search": "django", "page_size": 1})
+        second = self.client.get(first.data["next"])
+        self.assertEqual(first.data["results"][0]["title"], "Django tips")
+        self.assertEqual(second.data["results"][0]["title"], "Weekly thread")
+        self.assertIsNone(second.data["next"])
+
+
+class FeedTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(
+            username="reader", password="password123", email="reader@example.com"
+        )
+        self.other = User.objects.create_user(
+            username="other", password="password123", email="other@example.com"
+        )
+        self.small = Subreddit.objects.create(name="small", owner=self.other)
+        self.large = Subreddit.objects.create(name="large", owner=self.other)
+        self.unjoined = Subreddit.objects.create(name="unjoined", owner=self.other)
+        self.small.members.add(self.reader)
+        self.large.members.add(self.reader, self.other)
+        self.unjoined.members.add(self.other)
+        self.url = reverse("post-feed")
+
+    def create_post(self, subreddit, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(
+                subreddit=subreddit, owner=self.other, title=title, body="..."
+            )
+
+    def feed_titles(self, **params):
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post["title"] for post in response.data["results"]], response
+
+    def test_feed_requires_authentication(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_small_subreddits_are_pushed(self):
+        post = self.create_post(self.small, "pushed")
+        self.create_post(self.unjoined, "not joined")
+
+        self.assertTrue(FeedEntry.objects.filter(user=self.reader, post=post).exists())
+        titles, _ = self.feed_titles()
+        self.assertEqual(titles, ["pushed"])
+
+    @override_settings(FEED_FANOUT_THRESHOLD=1)
+    def test_large_subreddits_are_merged_at_read_time(self):
+        first = self.create_post(self.small, "small 1")
+        pulled = self.create_post(self.large, "large 1")
+        self.create_post(self.small, "small 2")
+
+        self.assertFalse(FeedEntry.objects.filter(post=pulled).exists())
+        self.assertTrue(FeedEntry.objects.filter(post=first).exists())
+        titles, _ = self.feed_titles()
+        self.assertEqual(titles, ["small 2", "large 1", "small 1"])
+
+    @override_settings(FEED_FANOUT_THRESHOLD=1)
+    def test_feed_pages_across_sources(self):
+        for i in range(3):
+            self.create_post(self.small, f"small {i}")
+            self.create_post(self.large, f"large {i}")
+
+        titles, response = self.feed_titles(page_size=4)
+        self.assertEqual(titles, ["large 2", "small 2", "large 1", "small 1"])
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual(
+            [post["title"] for post in response.data["results"]],
+            ["large 0", "small 0"],
+        )
+        self.assertIsNone(response.data["next"])
+
+    def test_tampered_cursor(self):
+        self.client.force_authenticate(user=self.reader)
+        cursor = tampered_cursor(["-created_at", "-id"], ["notadate", "x"])
+        response = self.client.get(self.url, {"cursor": cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_removed_posts_are_hidden(self):
+        post = self.create_post(self.small, "removed")
+        post.is_removed = True
+        post.save()
+        titles, _ = self.feed_titles()
+        self.assertEqual(titles, [])
+
+    def test_trim_keeps_newest_entries(self):
+        for i in range(5):
+            self.create_post(self.small, f"post {i}")
+
+        self.assertEqual(trim_feeds(max_length=2), 3)
+        titles, _ = self.feed_titles()
+        self.assertEqual(titles, ["post 4", "post 3"])
+
+
+class PostValuesSerializerTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="fast",
+            password="password123",
+            email="fast@example.com",
+            profile_picture="profile_pics/fast.png",
+        )
+        self.subreddit = Subreddit.objects.create(
+            name="fastpath", owner=self.user, icon="subreddit_icons/fast.png"
+        )
+        self.subreddit.members.add(self.user)
+        Post.objects.create(
+            subreddit=self.subreddit,
+            owner=self.user,
+            title="Media",
+            media="post_media/cat.gif",
+            is_nsfw=True,
+        )
+        sha256 = "ab" * 32
+        Post.objects.create(
+            subreddit=self.subreddit,
+            owner=self.user,
+            title="Upload",
+            blob=Blob.objects.create(
+                sha256=sha256,
+                file=f"blobs/ab/ab/{sha256}",
+                size=3,
+                content_type="image/gif",
+            ),
+        )
+        Post.objects.create(
+            subreddit=self.subreddit,
+            owner=self.user,
+            title="Link",
+            url="https://example.com/",
+        )
+        self.post = Post.objects.create(
+            subreddit=self.subreddit, owner=self.user, title="Text", body="..."
+        )
+        self.request = Request(APIRequestFactory().get("/api/posts/"))
+
+    def test_output_is_identical_to_post_serializer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            votes.cast_vote(self.post, self.user, 1)
+
+        queryset = Post.objects.select_related("owner", "subreddit")
+        expected = PostSerializer(
+            queryset, many=True, context={"request": self.request}
+        ).data
+        actual = post_values.render(post_values.values(queryset), self.request)
+
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(actual), renderer.render(expected))
+        self.assertEqual(actual[0]["vote_count"], 1)
+
+    def test_null_relations_on_dotted_sources_match_post_serializer(self):
+        # Subreddit.owner is SET_NULL: the nested owner is left out.
+        Subreddit.objects.filter(pk=self.subreddit.pk).update(owner=None)
+
+        queryset = Post.objects.select_related("owner", "subreddit")
+        expected = PostSerializer(
+            queryset, many=True, context={"request": self.request}
+        ).data
+        actual = post_values.render(post_values.values(queryset), self.request)
+
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(actual), renderer.render(expected))
+        self.assertNotIn("owner", actual[0]["subreddit"])
+
+    def test_list_is_a_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("post-list"))
+        self.assertEqual(len(response.data["results"]), 4)
+
+    def test_unsupported_fields_are_rejected(self):
+        class Serializer(PostSerializer):
+            extra = serializers.SerializerMethodField()
+
+            class Meta(PostSerializer.Meta):
+                fields = PostSerializer.Meta.fields + ["extra"]
+
+        with self.assertRaises(ImproperlyConfigured):
+            ValuesSerializer(Serializer).plan
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="etag", password="password123", email="etag@example.com"
+        )
+        self.subreddit = Subreddit.objects.create(name="etags", owner=self.user)
+        self.post = Post.objects.create(
+            subreddit=self.subreddit, owner=self.user, title="Cached", body="..."
+        )
+        self.list_url = reverse("post-list")
+        self.detail_url = reverse("post-detail", kwargs={"pk": self.post.pk})
+
+    def test_list_answers_304_from_the_cache_alone(self):
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.list_url, HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_304_skips_the_serializer(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        with mock.patch.object(PostSerializer, "to_representation") as serialize:
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        serialize.assert_not_called()
+
+    def test_votes_and_edits_change_the_etag(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        self.client.force_authenticate(user=self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("post-vote", kwargs={"pk": self.post.pk}), {"value": 1}
+            )
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["vote_count"], 1)
+        etag = response["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.detail_url, {"title": "Edited", "body": "..."})
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["title"], "Edited")
+
+    def test_etag_depends_on_the_query(self):
+        etag = self.client.get(self.list_url)["ETag"]
+        response = self.client.get(
+            self.list_url, {"ordering": "hot"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class AsyncReadPathTests(APITestCase):
+    # self.async_client goes through ASGIRequest, so ASGI_URLCONF.
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="async", password="password123", email="async@example.com"
+        )
+        self.subreddit = Subreddit.objects.create(name="asyncsub", owner=self.user)
+        self.posts = [
+            Post.objects.create(
+                subreddit=self.subreddit, owner=self.user, title=f"Post {i}", body="."
+            )
+            for i in range(3)
+        ]
+        self.list_url = reverse("post-list")
+        self.detail_url = reverse("post-detail", kwargs={"pk": self.posts[0].pk})
+
+    async def test_matches_the_sync_views(self):
+        urls = [
+            self.list_url,
+            f"{self.list_url}?page_size=2",
+            f"{self.list_url}?subreddit__name=asyncsub&ordering=hot",
+            self.detail_url,
+            reverse("post-trending"),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                expected = await sync_to_async(self.client.get)(url)
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(
+                    response.resolver_match.func.__module__, async_views.__name__
+                )
+                self.assertEqual(response.json(), expected.json())
+                self.assertEqual(response.get("ETag"), expected.get("ETag"))
+
+    async def test_answers_304(self):
+        etag = (await self.async_client.get(self.detail_url))["ETag"]
+        response = await self.async_client.get(
+            self.detail_url, headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_is_rate_limited_like_the_sync_views(self):
+        rates = {"anon": "1/minute"}
+        with override_settings(
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}
+        ):
+            await sync_to_async(self.client.get)(self.detail_url)
+            response = await self.async_client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+
+    async def test_requests_passed_to_the_sync_views_are_counted_once(self):
+        rates = {"anon": "3/minute"}
+        with override_settings(
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}
+        ):
+            for _ in range(3):
+                response = await self.async_client.get(
+                    self.list_url, {"search": "Post"}
+                )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = await self.async_client.get(self.list_url, {"search": "Post"})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    async def test_other_requests_go_to_the_sync_views(self):
+        response = await self.async_client.get(self.list_url, {"search": "Post"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["results"]), 3)
+
+        response = await self.async_client.get(reverse("post-detail", kwargs={"pk": 0}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = await self.async_client.post(
+            self.list_url, {"title": "New"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class IngestTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.moderator = User.objects.create_user(
+            username="importer", password="password123", email="importer@example.com"
+        )
+        self.member = User.objects.create_user(
+            username="author", password="password123", email="author@example.com"
+        )
+        self.outsider = User.objects.create_user(
+            username="outsider", password="password123", email="outsider@example.com"
+        )
+        self.subreddit = Subreddit.objects.create(name="imports", owner=self.moderator)
+        self.subreddit.moderators.add(self.moderator)
+        self.subreddit.members.add(self.moderator, self.member)
+        self.other = Subreddit.objects.create(name="elsewhere", owner=self.outsider)
+        self.other.members.add(self.moderator, self.outsider)
+        self.url = reverse("post-ingest")
+
+    def ingest(self, *lines, user=None):
+        self.client.force_authenticate(user=user or self.moderator)
+        body = "\n".join(
+            line if isinstance(line, str) else json.dumps(line) for line in lines
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, body, content_type="application/x-ndjson")
+
+    def row(self, title, subreddit=None, **fields):
+        subreddit = subreddit or self.subreddit
+        return {"subreddit_id": subreddit.pk, "title": title, "body": "...", **fields}
+
+    def test_valid_rows_are_created_and_others_reported(self):
+        response = self.ingest(
+            self.row("Imported django post"),
+            self.row("By a member", owner="author"),
+            "{not json",
+            "",
+            {"subreddit_id": self.subreddit.pk, "title": "No body"},
+            self.row("Not a member", owner="outsider"),
+            self.row("Not moderated", subreddit=self.other),
+            self.row("Unknown owner", owner="nobody"),
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["failed"], 5)
+        self.assertEqual(
+            [error["line"] for error in response.data["errors"]], [3, 5, 6, 7, 8]
+        )
+        self.assertFalse(response.data["errors_truncated"])
+
+        post = Post.objects.get(title="By a member")
+        self.assertEqual(post.owner, self.member)
+        self.assertEqual(
+            Post.objects.get(title="Imported django post").owner, self.moderator
+        )
+        self.assertGreater(post.hot_score, 0)
+        # Indexed for search and pushed to the members' feeds.
+        search = self.client.get(reverse("post-list"), {"search": "django"})
+        self.assertEqual(
+            [item["title"] for item in search.data["results"]], ["Imported django post"]
+        )
+        self.assertEqual(FeedEntry.objects.filter(post=post).count(), 2)
+
+    @override_settings(INGEST_BATCH_SIZE=2, INGEST_MAX_ERRORS=1)
+    def test_batches_and_error_cap(self):
+        rows = [self.row(f"Post {i}") for i in range(5)]
+        response = self.ingest(*rows, "[]", "[]")
+
+        self.assertEqual(response.data["created"], 5)
+        self.assertEqual(response.data["failed"], 2)
+        self.assertEqual(len(response.data["errors"]), 1)
+        self.assertTrue(response.data["errors_truncated"])
+        self.assertEqual(Post.objects.filter(subreddit=self.subreddit).count(), 5)
+
+    @override_settings(INGEST_MAX_LINE_LENGTH=100)
+    def test_long_lines_are_skipped(self):
+        response = self.ingest(self.row("x" * 200), self.row("Short"))
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(
+            response.data["errors"], [{"line": 1, "errors": ["Line is too long."]}]
+        )
+
+    def test_staff_may_ingest_anywhere(self):
+        staff = User.objects.create_user(
+            username="staff",
+            password="password123",
+            email="staff@example.com",
+            is_staff=True,
+        )
+        self.other.members.add(staff)
+        response = self.ingest(self.row("Staff post", subreddit=self.other), user=staff)
+        self.assertEqual(response.data["created"], 1)
+
+    def test_requires_staff_or_moderator(self):
+        response = self.ingest(self.row("Nope"), user=self.member)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Post.objects.exists())
+
+    def test_requires_ndjson(self):
+        self.client.force_authenticate(user=self.moderator)
+        response = self.client.post(self.url, [self.row("Nope")], format="json")
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_media_type_parameters_are_accepted(self):
+        self.client.force_authenticate(user=self.moderator)
+        response = self.client.post(
+            self.url,
+            json.dumps(self.row("Charset")),
+            content_type="application/x-ndjson; charset=utf-8",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 1)
+
+
+@override_settings(POST_ARCHIVE_AFTER_DAYS=30)
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username="author", password="password123", email="author@example.com"
+        )
+        self.voter = User.objects.create_user(
+            username="voter", password="password123", email="voter@example.com"
+        )
+        self.subreddit = Subreddit.objects.create(name="archive", owner=self.author)
+        self.subreddit.members.add(self.author, self.voter)
+
+        self.live = self.create_post("Live django post")
+        self.old = self.create_post("Old django post")
+        Post.objects.filter(pk=self.old.pk).update(
+            created_at=timezone.now() - timedelta(days=60)
+        )
+        self.removed = self.create_post("Removed post")
+        self.client.force_authenticate(user=self.author)
+        self.client.delete(reverse("post-detail", kwargs={"pk": self.removed.pk}))
+
+        self.client.force_authenticate(user=self.voter)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("post-vote", kwargs={"pk": self.old.pk}), {"value": 1}
+            )
+        self.comments_url = reverse(
+            "post-comments-list", kwargs={"post_pk": self.old.pk}
+        )
+        self.comment = self.client.post(self.comments_url, {"body": "Still here"}).data
+
+    def create_post(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(
+                subreddit=self.subreddit, owner=self.author, title=title, body="..."
+            )
+
+    def test_removed_and_old_posts_are_moved(self):
+        call_command("archive_posts", batch_size=1, stdout=StringIO())
+
+        self.assertEqual(list(Post.objects.all()), [self.live])
+        archived = ArchivedPost.objects.get(pk=self.old.pk)
+        # The buffered vote is part of the archived count and of karma.
+        self.assertEqual(archived.vote_count, 1)
+        self.assertEqual(KarmaEvent.objects.get(user=self.author).delta, 1)
+        self.assertTrue(ArchivedPost.objects.get(pk=self.removed.pk).is_removed)
+        self.assertFalse(Vote.objects.exists())
+        self.assertFalse(FeedEntry.objects.exclude(post=self.live).exists())
+        self.assertTrue(Comment.objects.filter(post_id=self.old.pk).exists())
+
+        response = self.client.get(reverse("post-list"), {"search": "django"})
+        self.assertEqual(
+            [post["title"] for post in response.data["results"]], ["Live django post"]
+        )
+
+    def test_detail_falls_back_to_the_archive(self):
+        archive_posts()
+
+        response = self.client.get(reverse("post-detail", kwargs={"pk": self.old.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["title"], "Old django post")
+        self.assertEqual(response.data["vote_count"], 1)
+        self.assertEqual(response.data["subreddit"]["name"], "archive")
+
+        response = self.client.get(
+            reverse("post-detail", kwargs={"pk": self.removed.pk})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn("ArchivedPost", response.data["detail"])
+
+    def test_non_numeric_ids_are_not_found(self):
+        archive_posts()
+        response = self.client.get(reverse("post-detail", kwargs={"pk": "abc"}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_archived_comments_are_read_only(self):
+        archive_posts()
+
+        response = self.client.get(self.comments_url)
+        self.assertEqual([c["body"] for c in response.data["results"]], ["Still here"])
+        detail = reverse(
+            "post-comments-detail",
+            kwargs={"post_pk": self.old.pk, "pk": self.comment["id"]},
+        )
+        response = self.client.delete(detail)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(self.comments_url, {"body": "Too late"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deleting_archived_posts_deletes_their_comments(self):
+        archive_posts()
+        self.subreddit.delete()
+        self.assertFalse(Comment.objects.exists())
@@ -1,16 +1,64 @@
-from django.core.cache import cache
+import io
+from datetime import timedelta
+
+from api.cache import get_or_rebuild
+from api.conditional import conditional
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.utils import timezone
+from django.utils.http import parse_header_parameters
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, UnsupportedMediaType
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-
-from .models import Post
+from subreddits.authz import get_authz
+from subreddits.models import validate_subreddit_name
+
+from . import votes
+from .feed import read_feed
+from .filters import PostOrderingFilter, PostSearchFilter
+from .ingest import ingest_posts
+from .models import ArchivedPost, Post
+from .pagination import FeedPagination, KeysetPagination
 from .permissions import IsOwnerOrReadOnly
-from .serializers import PostSerializer
+from .serializers import PostSerializer, VoteSerializer, post_values
+
+
+def post_list_scopes(request, *args, **kwargs):
+    # Listings nest the subreddit and the owner of every post.
+    return ["posts", "users"]
+
+
+def post_detail_scopes(request, *args, pk=None, **kwargs):
+    try:
+        subreddit_id = (
+            Post.objects.filter(pk=pk, is_removed=False)
+            .values_list("subreddit_id", flat=True)
+            .first()
+        )
+    except (TypeError, ValueError):
+        return None
+    if subreddit_id is None:
+        return None
+    return [f"posts:{subreddit_id}", "users"]
+
+
+def trending_cache_key(subreddit_name=None):
+    # Kept apart from subreddit names, so a subreddit called "all" or
+    # "global" never shares the site-wide entry.
+    if subreddit_name:
+        return f"trending:sub:{subreddit_name}"
+    return "trending:global"
 
 
 class PostViewSet(viewsets.ModelViewSet):
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    filter_backends = [DjangoFilterBackend, PostSearchFilter, PostOrderingFilter]
+    pagination_class = KeysetPagination
 
     # Enables filtering like: /api/posts/?subreddit__name=django
     filterset_fields = {
@@ -25,31 +73,69 @@ class PostViewSet(viewsets.ModelViewSet):
         ],
     }
 
-    # Enables search like: /api/posts/?search=API
+    # Enables search like: /api/posts/?search=API (see posts/search.py)
     search_fields = ["title", "body"]
 
-    # Enables ordering like: /api/posts/?ordering=-vote_count
-    ordering_fields = ["created_at", "vote_count", "comment_count"]
+    # Enables ordering like: /api/posts/?ordering=-vote_count or ?ordering=hot
+    ordering_fields = ["created_at", "vote_count", "comment_count", "hot_score"]
 
     def get_queryset(self):
+        # The nested subreddit renders its owner's username.
         return Post.objects.filter(is_removed=False).select_related(
-            "owner", "subreddit"
+            "owner", "subreddit__owner", "blob"
         )
 
+    @conditional(post_list_scopes)
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.list_values(queryset)
+
+    def list_values(self, queryset):
+        # Listings are rendered from values() rows instead of PostSerializer
+        # instances; the output is the same (see api/rows.py).
+        rows = post_values.values(queryset)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(post_values.render(page, self.request))
+
+        return Response(post_values.render(rows, self.request))
+
+    @conditional(post_detail_scopes)
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404 as missing:
+            not_found = missing
+
+        # Old posts are only in the archive (see posts/archive.py).
+        try:
+            archived = get_object_or_404(
+                ArchivedPost.objects.select_related(
+                    "owner", "subreddit__owner", "blob"
+                ),
+                pk=kwargs["pk"],
+                is_removed=False,
+            )
+        except Http404:
+            # Answer like a post that never existed.
+            raise not_found from None
+        # Its buffered votes were folded into vote_count.
+        archived._pending_votes = 0
+        return Response(self.get_serializer(archived).data)
+
     def perform_create(self, serializer):
         subreddit = serializer.validated_data.get("subreddit")
 
-        if not subreddit.members.filter(id=self.request.user.id).exists():
-            raise permissions.PermissionDenied(
-                "You must be a member of this subreddit to post."
-            )
+        if not get_authz(self.request).is_member(subreddit):
+            raise PermissionDenied("You must be a member of this subreddit to post.")
 
         serializer.save(owner=self.request.user)
 
     def perform_destroy(self, instance):
         if not (
-            instance.owner == self.request.user
-            or self.request.user.is_moderator_of(instance.subreddit)
+            instance.owner_id == self.request.user.pk
+            or get_authz(self.request).is_moderator(instance.subreddit_id)
         ):
             self.permission_denied(self.request)
 
@@ -57,27 +143,85 @@ class PostViewSet(viewsets.ModelViewSet):
         instance.body = "[deleted]"
         instance.save()
 
-    @action(detail=False, methods=["get"])
-    def trending(self, request):
-        trending_posts_cache_key = "trending_posts"
-        cached_posts = cache.get(trending_posts_cache_key)
+    @action(
+        detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated]
+    )
+    def vote(self, request, pk=None):
+        post = self.get_object()
+        serializer = VoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        value = serializer.validated_data["value"]
+        vote_count = votes.current_count(post)
+        vote_count += votes.cast_vote(post, request.user, value)
+
+        return Response({"vote": value, "vote_count": vote_count})
+
+    @action(
+        detail=False, methods=["post"], permission_classes=[permissions.IsAuthenticated]
+    )
+    def ingest(self, request):
+        # Bulk upload for staff and moderators, one JSON post per line (see
+        # posts/ingest.py). The body is streamed, never parsed as a whole.
+        if not (request.user.is_staff or get_authz(request).moderated_ids):
+            raise PermissionDenied("Only staff and moderators can ingest posts.")
+        media_type, _ = parse_header_parameters(request.content_type)
+        if media_type != "application/x-ndjson":
+            raise UnsupportedMediaType(request.content_type)
+
+        stream = request.stream or io.BytesIO()
+        return Response(ingest_posts(request, stream).as_dict())
+
+    @action(
+        detail=False, methods=["get"], permission_classes=[permissions.IsAuthenticated]
+    )
+    def feed(self, request):
+        paginator = FeedPagination()
+        post_ids = paginator.paginate_feed(
+            lambda limit, before: read_feed(request.user, limit, before), request
+        )
 
-        if cached_posts:
-            serializer = self.get_serializer(cached_posts, many=True)
-            return Response(serializer.data)
+        rows = post_values.values(self.get_queryset().filter(pk__in=post_ids))
+        rows = {row["id"]: row for row in rows}
+        page = [rows[pk] for pk in post_ids if pk in rows]
 
-        # Get top 10 posts from the last 3 days, ordered by votes.
-        from django.utils import timezone
+        return paginator.get_paginated_response(post_values.render(page, request))
 
-        three_days_ago = timezone.now() - timezone.timedelta(days=10)
+    @action(detail=False, methods=["get"])
+    @conditional(post_list_scopes)
+    def hot(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).order_by(
+            "-hot_score", "-id"
+        )
+        return self.list_values(queryset)
 
-        trending_posts = (
-            self.get_queryset()
-            .filter(created_at__gte=three_days_ago)
-            .order_by("-vote_count")[:20]
+    @action(detail=False, methods=["get"])
+    def trending(self, request):
+        # Enables per-subreddit trending like: ?subreddit__name=django
+        subreddit_name = request.query_params.get("subreddit__name")
+        if subreddit_name:
+            try:
+                validate_subreddit_name(subreddit_name)
+            except ValidationError:
+                return Response([])
+
+        data = get_or_rebuild(
+            trending_cache_key(subreddit_name),
+            lambda: self.build_trending(subreddit_name),
+            soft_ttl=settings.TRENDING_SOFT_TTL,
+            hard_ttl=settings.TRENDING_HARD_TTL,
         )
+        return Response(data)
+
+    def build_trending(self, subreddit_name=None):
+        # Top posts from the last 3 days, ordered by votes.
+        since = timezone.now() - timedelta(days=3)
 
-        cache.set(trending_posts_cache_key, trending_posts, timeout=82800)  # One day
+        queryset = self.get_queryset().filter(created_at__gte=since)
+        if subreddit_name:
+            queryset = queryset.filter(subreddit__name=subreddit_name)
+        trending_posts = post_values.values(queryset.order_by("-vote_count", "-id"))
 
-        serializer = self.get_serializer(trending_posts, many=True)
-        return Response(serializer.data)
+        # Cache the rendered payload rather than a queryset, so hits skip
+        # both the database and the serializer.
+        return post_values.render(trending_posts[:20], self.request)
@@ -0,0 +1,349 @@
+"""
+Write-behind buffering for post votes.
+
+A vote is stored durably as a ``Vote`` row, but its effect on
+``Post.vote_count`` is only recorded as a delta in the cache. A periodic
+flusher (``manage.py flush_votes``) merges the buffered deltas into
+``posts_post`` with one batched UPDATE per chunk of posts, so a popular post
+is written once per flush instead of once per vote.
+
+Buffered deltas are grouped by shard (``post_id % VOTE_BUFFER_SHARDS``) and
+by epoch (wall clock divided by ``VOTE_FLUSH_INTERVAL``). Each post records
+the last epoch merged into it in ``Post.vote_epoch``. The UPDATE that applies
+epoch ``e`` only touches rows with ``vote_epoch < e`` and sets
+``vote_epoch = e`` in the same statement, so:
+
+* replaying a flush that crashed half way never applies a delta twice, and
+* readers add the buffered deltas of the epochs newer than ``vote_epoch``,
+  which keeps ``vote_count + pending`` constant while a flush runs. The
+  keys of a flushed epoch are only deleted ``RETIRE_EPOCHS`` later, so a
+  reader that loaded ``vote_epoch`` just before the UPDATE still finds
+  them.
+
+The buffer is the only copy of each delta until it is flushed, so it lives
+in the default cache, which must be shared by every worker and by
+``flush_votes``, and must never evict: Redis with
+``maxmemory-policy noeviction``. ``check_buffer_cache`` refuses to start on
+anything else, unless ``SINGLE_PROCESS`` is set. ``Vote`` remains the source
+of truth: ``flush_votes --rebuild`` recomputes every count from it if the
+cache is ever lost.
+"""
+
+import time
+from collections import defaultdict
+
+from api.cache import aget_many, evicts, is_shared
+from api.conditional import bump, bump_on_commit
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import (Case, F, IntegerField, OuterRef, Subquery, Sum,
+                              Value, When)
+from django.db.models.functions import Coalesce
+from subreddits.models import Subreddit
+from users import karma
+
+from .models import Post, Vote
+from .ranking import refresh_all_hot_scores, refresh_hot_scores
+
+KEY_PREFIX = "votes"
+
+# Epochs younger than this are still being written to by workers whose
+# clocks are slightly behind, so the flusher leaves them alone.
+GRACE_EPOCHS = 2
+
+# A flushed epoch's keys are kept for this many more epochs, for the
+# readers that loaded a post's vote_epoch before the flush.
+RETIRE_EPOCHS = 1
+
+# Buffered keys expire on their own if nothing ever flushes them.
+BUFFER_TIMEOUT = 60 * 60 * 24
+
+
+def check_buffer_cache():
+    """Refuse to run with a cache that hides or drops buffered votes."""
+    if not is_shared() or evicts():
+        raise ImproperlyConfigured(
+            "The vote buffer needs a default cache shared by every process "
+            "that never evicts entries, such as Redis with maxmemory-policy "
+            "noeviction, or SINGLE_PROCESS."
+        )
+
+
+def shard_for(post_id):
+    return post_id % settings.VOTE_BUFFER_SHARDS
+
+
+def current_epoch(now=None):
+    return int((now or time.time()) // settings.VOTE_FLUSH_INTERVAL)
+
+
+def _delta_key(shard, epoch, post_id):
+    return f"{KEY_PREFIX}:{shard}:{epoch}:delta:{post_id}"
+
+
+def _log_length_key(shard, epoch):
+    return f"{KEY_PREFIX}:{shard}:{epoch}:length"
+
+
+def _log_key(shard, epoch, index):
+    return f"{KEY_PREFIX}:{shard}:{epoch}:log:{index}"
+
+
+def _flushed_key(shard):
+    return f"{KEY_PREFIX}:{shard}:flushed"
+
+
+def _flushed_at_key(shard, epoch):
+    return f"{KEY_PREFIX}:{shard}:{epoch}:flushed_at"
+
+
+def _retired_key(shard):
+    return f"{KEY_PREFIX}:{shard}:retired"
+
+
+def _incr(key, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, timeout=BUFFER_TIMEOUT)
+        return cache.incr(key, delta)
+
+
+def record_delta(post_id, delta):
+    """Buffer a change of ``delta`` to the vote count of ``post_id``."""
+    shard = shard_for(post_id)
+    epoch = current_epoch()
+    key = _delta_key(shard, epoch, post_id)
+
+    # The first delta for a post in an epoch appends the post to that
+    # epoch's dirty log, which is what the flusher walks.
+    if cache.add(key, 0, timeout=BUFFER_TIMEOUT):
+        index = _incr(_log_length_key(shard, epoch))
+        cache.set(_log_key(shard, epoch, index), post_id, timeout=BUFFER_TIMEOUT)
+
+    cache.incr(key, delta)
+
+
+def pending_deltas(posts):
+    """
+    Return ``{post_id: delta}`` for the buffered votes not yet merged into
+    the given posts' ``vote_count``. Uses a single cache round-trip.
+    """
+    return pending_deltas_by_id({post.pk: post.vote_epoch for post in posts})
+
+
+def pending_deltas_by_id(vote_epochs):
+    """Like ``pending_deltas``, from a ``{post_id: vote_epoch}`` mapping."""
+    keys = _pending_keys(vote_epochs)
+    return _sum_pending(vote_epochs, keys, cache.get_many(list(keys)))
+
+
+async def apending_deltas_by_id(vote_epochs):
+    """``pending_deltas_by_id`` for async views."""
+    keys = _pending_keys(vote_epochs)
+    return _sum_pending(vote_epochs, keys, await aget_many(list(keys)))
+
+
+def _pending_keys(vote_epochs):
+    now = current_epoch()
+    oldest = now - settings.VOTE_BUFFER_READ_WINDOW
+
+    keys = {}
+    for post_id, vote_epoch in vote_epochs.items():
+        shard = shard_for(post_id)
+        for epoch in range(max(vote_epoch, oldest) + 1, now + 2):
+            keys[_delta_key(shard, epoch, post_id)] = post_id
+    return keys
+
+
+def _sum_pending(vote_epochs, keys, found):
+    pending = dict.fromkeys(vote_epochs, 0)
+    for key, delta in found.items():
+        pending[keys[key]] += delta
+    return pending
+
+
+def annotate_pending(posts):
+    """Store the buffered delta on each post as ``_pending_votes``."""
+    pending = pending_deltas(posts)
+    for post in posts:
+        post._pending_votes = pending[post.pk]
+    return posts
+
+
+def current_count(post):
+    """The vote count of ``post`` including votes still in the buffer."""
+    pending = getattr(post, "_pending_votes", None)
+    if pending is None:
+        pending = pending_deltas([post])[post.pk]
+    return post.vote_count + pending
+
+
+def cast_vote(post, user, value):
+    """
+    Record ``user``'s vote on ``post``. ``value`` is 1, -1, or 0 to retract
+    a previous vote. Returns the change to the post's vote count.
+    """
+    with transaction.atomic():
+        vote = Vote.objects.select_for_update().filter(post=post, user=user).first()
+        previous = vote.value if vote else 0
+
+        if value == previous:
+            return 0
+
+        if value == 0:
+            vote.delete()
+        elif vote:
+            vote.value = value
+            vote.save(update_fields=["value", "updated_at"])
+        else:
+            Vote.objects.create(post=post, user=user, value=value)
+
+        delta = value - previous
+        transaction.on_commit(lambda: record_delta(post.pk, delta))
+        bump_on_commit("posts", f"posts:{post.subreddit_id}")
+
+    return delta
+
+
+def apply_deltas(deltas, epoch):
+    """
+    Merge ``{post_id: delta}`` for ``epoch`` into ``Post.vote_count`` with a
+    single UPDATE. Posts that already contain this epoch are skipped.
+    Returns the ids of the posts that were updated.
+
+    The post owners' karma events are queued in the same transaction, so a
+    replayed epoch never counts towards karma twice either.
+    """
+    with transaction.atomic():
+        owners = dict(
+            Post.objects.select_for_update()
+            .filter(pk__in=deltas, vote_epoch__lt=epoch)
+            .values_list("pk", "owner_id")
+        )
+        updated = list(owners)
+        if updated:
+            Post.objects.filter(pk__in=updated, vote_epoch__lt=epoch).update(
+                vote_count=F("vote_count")
+                + Case(
+                    *[When(pk=pk, then=Value(deltas[pk])) for pk in updated],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                ),
+                vote_epoch=epoch,
+            )
+            karma_deltas = defaultdict(int)
+            for pk, owner_id in owners.items():
+                karma_deltas[owner_id] += deltas[pk]
+            karma.record(karma_deltas)
+    return updated
+
+
+def _flush_epoch(shard, epoch, batch_size):
+    length = cache.get(_log_length_key(shard, epoch), 0)
+
+    for start in range(1, length + 1, batch_size):
+        log_keys = [
+            _log_key(shard, epoch, index)
+            for index in range(start, min(start + batch_size, length + 1))
+        ]
+        post_ids = cache.get_many(log_keys).values()
+        delta_keys = {_delta_key(shard, epoch, pk): pk for pk in post_ids}
+        deltas = {
+            delta_keys[key]: delta
+            for key, delta in cache.get_many(list(delta_keys)).items()
+            if delta
+        }
+        if deltas:
+            refresh_hot_scores(apply_deltas(deltas, epoch))
+            # Counts plus pending votes are unchanged, only the orderings
+            # by vote_count and hot_score move.
+            bump("posts")
+
+
+def _epoch_keys(shard, epoch, batch_size):
+    length = cache.get(_log_length_key(shard, epoch), 0)
+    keys = [_log_length_key(shard, epoch), _flushed_at_key(shard, epoch)]
+
+    for start in range(1, length + 1, batch_size):
+        log_keys = [
+            _log_key(shard, epoch, index)
+            for index in range(start, min(start + batch_size, length + 1))
+        ]
+        post_ids = cache.get_many(log_keys).values()
+        keys.extend(log_keys)
+        keys.extend(_delta_key(shard, epoch, pk) for pk in post_ids)
+    return keys
+
+
+def _delete_retired(shard, flushed, now, batch_size):
+    """Delete the keys of the epochs flushed more than RETIRE_EPOCHS ago."""
+    retired = cache.get(_retired_key(shard))
+    if retired is None:
+        # Anything older expires on its own.
+        retired = flushed
+        cache.set(_retired_key(shard), retired, timeout=None)
+
+    for epoch in range(retired + 1, flushed + 1):
+        flushed_at = cache.get(_flushed_at_key(shard, epoch))
+        if flushed_at is not None and now - flushed_at <= RETIRE_EPOCHS:
+            break
+        cache.delete_many(_epoch_keys(shard, epoch, batch_size))
+        cache.set(_retired_key(shard), epoch, timeout=None)
+
+
+def flush_shard(shard, batch_size=500):
+    """
+    Merge every closed epoch of ``shard`` into the database, and delete the
+    buffered keys of the epochs merged more than ``RETIRE_EPOCHS`` ago.
+    """
+    now = current_epoch()
+    last = now - GRACE_EPOCHS
+    flushed = cache.get(_flushed_key(shard))
+    if flushed is None:
+        flushed = now - settings.VOTE_BUFFER_READ_WINDOW
+
+    _delete_retired(shard, flushed, now, batch_size)
+    for epoch in range(flushed + 1, last + 1):
+        _flush_epoch(shard, epoch, batch_size)
+        # The database now holds this epoch; replays are filtered by
+        # vote_epoch if we crash before recording it.
+        cache.set(_flushed_at_key(shard, epoch), now, timeout=BUFFER_TIMEOUT)
+        cache.set(_flushed_key(shard), epoch, timeout=None)
+
+    return max(flushed, last)
+
+
+def flush(batch_size=500):
+    for shard in range(settings.VOTE_BUFFER_SHARDS):
+        flush_shard(shard, batch_size=batch_size)
+
+
+def rebuild_vote_counts():
+    """
+    Recompute every ``vote_count`` from the ``Vote`` table and mark the
+    closed epochs as merged. Meant for recovery after the cache was lost.
+
+    Epochs still open are left to the readers and the flusher, so no vote
+    cast during or after the rebuild is lost. Votes buffered in them before
+    the rebuild are in the table too, and are counted twice until the next
+    rebuild.
+    """
+    totals = (
+        Vote.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(total=Sum("value"))
+        .values("total")
+    )
+    last = current_epoch() - GRACE_EPOCHS
+    Post.objects.update(
+        vote_count=Coalesce(Subquery(totals), Value(0)), vote_epoch=last
+    )
+    for shard in range(settings.VOTE_BUFFER_SHARDS):
+        cache.set(_flushed_key(shard), last, timeout=None)
+    refresh_all_hot_scores()
+    subreddit_ids = Subreddit.objects.values_list("pk", flat=True)
+    bump("posts", *(f"posts:{pk}" for pk in subreddit_ids))
@@ -0,0 +1,40 @@
+"""
+Async version of the subreddit detail, mounted under ASGI (see
+api/asgi.py). Answers like ``SubredditViewSet.retrieve``.
+"""
+
+from api.asgi import async_reads, json_response, sync_view
+from api.conditional import aconditional_response, request_stamps
+from rest_framework.request import Request
+
+from .models import Subreddit
+from .serializers import SubredditDetailSerializer
+from .views import detail_cache, detail_cache_key, subreddit_detail_scopes
+
+
+@async_reads
+async def subreddit_detail(request, pk):
+    scopes = subreddit_detail_scopes(request, pk=pk)
+
+    async def get_response():
+        # The stamps were read by aconditional_response.
+        key = detail_cache_key(request, pk, request_stamps(request, scopes))
+        data = await detail_cache.aget(key)
+        if data is None:
+            subreddit = (
+                await Subreddit.objects.select_related("owner")
+                .prefetch_related("moderators", "rules")
+                .filter(pk=pk)
+                .afirst()
+            )
+            if subreddit is None:
+                return await sync_view(request)
+            # Everything it renders was prefetched.
+            serializer = SubredditDetailSerializer(
+                subreddit, context={"request": Request(request)}
+            )
+            data = dict(serializer.data)
+            await detail_cache.aset(key, data)
+        return json_response(data)
+
+    return await aconditional_response(request, scopes, get_response)
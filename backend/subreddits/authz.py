@@ -0,0 +1,129 @@
+"""
+Per-request authorization context.
+
+Permission classes and views ask the same questions several times per
+request ("is this user a member / moderator / owner of that subreddit?").
+``get_authz(request)`` answers them from the sets of subreddit ids the user
+joined, moderates and owns. Each set is loaded with one query the first
+time it is needed and then reused for the rest of the request.
+
+With ``AUTHZ_CACHE_TTL`` set, the sets are also kept in the cache for that
+many seconds under a per-user version number. The signal handlers in
+``subreddits/signals.py`` bump the version whenever a membership, moderator
+role or ownership changes, so a cached set is never served after it went
+stale. That takes a cache shared by every worker (see ``CACHES`` in
+settings): a per-process one only forgets the sets in the process where the
+change was made.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Membership, Subreddit
+
+VERSION_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(user_id):
+    return f"authz:{user_id}:version"
+
+
+def invalidate(user_ids):
+    """Forget the cached sets of the given users."""
+    for user_id in user_ids:
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:
+            cache.set(_version_key(user_id), 1, timeout=VERSION_TIMEOUT)
+
+
+def invalidate_on_commit(user_ids):
+    user_ids = list(user_ids)
+    invalidate(user_ids)
+    # Bump again once committed, in case another request cached the
+    # pre-change rows under the new version in the meantime.
+    transaction.on_commit(lambda: invalidate(user_ids))
+
+
+class AuthorizationContext:
+    def __init__(self, user):
+        self.user_id = user.pk if user and user.is_authenticated else None
+        self._sets = {}
+        self._version = None
+
+    @property
+    def joined_ids(self):
+        return self._load(
+            "joined",
+            lambda: Membership.objects.filter(user_id=self.user_id).values_list(
+                "subreddit_id", flat=True
+            ),
+        )
+
+    @property
+    def moderated_ids(self):
+        return self._load(
+            "moderated",
+            lambda: Subreddit.moderators.through.objects.filter(
+                customuser_id=self.user_id
+            ).values_list("subreddit_id", flat=True),
+        )
+
+    @property
+    def owned_ids(self):
+        return self._load(
+            "owned",
+            lambda: Subreddit.objects.filter(owner_id=self.user_id).values_list(
+                "pk", flat=True
+            ),
+        )
+
+    def is_member(self, subreddit):
+        return _pk(subreddit) in self.joined_ids
+
+    def is_moderator(self, subreddit):
+        return _pk(subreddit) in self.moderated_ids
+
+    def is_owner(self, subreddit):
+        return _pk(subreddit) in self.owned_ids
+
+    def _load(self, name, query):
+        if name in self._sets:
+            return self._sets[name]
+        if self.user_id is None:
+            self._sets[name] = frozenset()
+            return self._sets[name]
+
+        ttl = settings.AUTHZ_CACHE_TTL
+        if ttl:
+            if self._version is None:
+                self._version = cache.get(_version_key(self.user_id), 0)
+            key = f"authz:{self.user_id}:{self._version}:{name}"
+            ids = cache.get(key)
+            if ids is None:
+                ids = frozenset(query())
+                cache.set(key, ids, timeout=ttl)
+        else:
+            ids = frozenset(query())
+
+        self._sets[name] = ids
+        return ids
+
+
+def get_authz(request):
+    """The authorization context of ``request.user``, created on first use."""
+    authz = getattr(request, "_authz", None)
+    user = request.user
+    if authz is None or authz.user_id != (user.pk if user.is_authenticated else None):
+        authz = AuthorizationContext(user)
+        request._authz = authz
+    return authz
+
+
+def _pk(subreddit):
+    pk = getattr(subreddit, "pk", subreddit)
+    try:
+        return int(pk)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,75 @@
+"""
+Joining and leaving subreddits.
+
+``Subreddit.member_count`` is kept next to the ``Membership`` rows, so that
+showing it never counts them. ``join`` and ``leave`` change both in one
+transaction. Of two concurrent joins, the unique constraint on
+``(subreddit, user)`` lets only one insert its row, and only a request that
+inserted or deleted a row moves the count, with an
+``UPDATE ... SET member_count = member_count + 1`` that never writes back a
+value read earlier.
+
+Memberships changed through the ``members`` relation instead
+(``subreddit.members.add()``, the admin) are recounted by
+subreddits/signals.py.
+"""
+
+from api.conditional import bump_on_commit
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from posts import feed
+
+from . import authz
+from .models import Membership, Subreddit
+
+
+def join(subreddit, user):
+    """Make ``user`` a member of ``subreddit``; ``False`` if they already were."""
+    try:
+        with transaction.atomic():
+            Membership.objects.create(subreddit_id=subreddit.pk, user_id=user.pk)
+            Subreddit.objects.filter(pk=subreddit.pk).update(
+                member_count=F("member_count") + 1
+            )
+    except IntegrityError:
+        return False
+
+    feed.backfill(user.pk, subreddit.pk)
+    _membership_changed(subreddit, user)
+    return True
+
+
+def leave(subreddit, user):
+    """End ``user``'s membership of ``subreddit``; ``False`` if there was none."""
+    with transaction.atomic():
+        deleted, _ = Membership.objects.filter(
+            subreddit_id=subreddit.pk, user_id=user.pk
+        ).delete()
+        if not deleted:
+            return False
+        Subreddit.objects.filter(pk=subreddit.pk).update(
+            member_count=F("member_count") - 1
+        )
+        feed.unsubscribe(user.pk, subreddit.pk)
+
+    _membership_changed(subreddit, user)
+    return True
+
+
+def recount(subreddit_ids):
+    """Set the ``member_count`` of the given subreddits from their memberships."""
+    counts = (
+        Membership.objects.filter(subreddit=OuterRef("pk"))
+        .values("subreddit")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    Subreddit.objects.filter(pk__in=subreddit_ids).update(
+        member_count=Coalesce(Subquery(counts), 0)
+    )
+
+
+def _membership_changed(subreddit, user):
+    authz.invalidate_on_commit([user.pk])
+    bump_on_commit(f"subreddit:{subreddit.pk}")
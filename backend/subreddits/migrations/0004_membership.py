@@ -0,0 +1,72 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_members(apps, schema_editor):
+    Subreddit = apps.get_model('subreddits', 'Subreddit')
+    Membership = apps.get_model('subreddits', 'Membership')
+    counts = (
+        Membership.objects.filter(subreddit=OuterRef('pk'))
+        .values('subreddit')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    Subreddit.objects.update(member_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subreddits', '0003_subreddit_members'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # The auto-created table becomes the through model as it is.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Membership',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('subreddit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='subreddits.subreddit')),
+                        ('user', models.ForeignKey(db_column='customuser_id', on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'subreddits_subreddit_members',
+                        'unique_together': {('subreddit', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='subreddit',
+                    name='members',
+                    field=models.ManyToManyField(blank=True, related_name='joined_subreddits', through='subreddits.Membership', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='membership',
+            name='joined_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['subreddit', 'joined_at', 'id'], name='subreddits__subredd_b4540e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['user', 'subreddit'], name='subreddits__customu_0a4730_idx'),
+        ),
+        migrations.AddField(
+            model_name='subreddit',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_members, migrations.RunPython.noop),
+    ]
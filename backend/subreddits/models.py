@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.core.validators import RegexValidator
 from django.db import models
+from django.utils import timezone
 
 # Validator for subreddit names (alphanumeric + underscores only)
 validate_subreddit_name = RegexValidator(
@@ -29,14 +30,47 @@ class Subreddit(models.Model):
 
     members = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
+        through="Membership",
         related_name="joined_subreddits",
         blank=True,  # Allows subreddits with no members
     )
+    # Denormalized, so that showing it never counts the memberships (see
+    # subreddits/membership.py).
+    member_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.name
 
 
+class Membership(models.Model):
+    subreddit = models.ForeignKey(
+        Subreddit, on_delete=models.CASCADE, related_name="memberships"
+    )
+    # The column of the auto-created table this model took over.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="memberships",
+        db_column="customuser_id",
+    )
+    joined_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "subreddits_subreddit_members"
+        # As on the auto-created table. Also the index that fan-out reads a
+        # subreddit's members from.
+        unique_together = [("subreddit", "user")]
+        indexes = [
+            # The members list, newest first.
+            models.Index(fields=["subreddit", "joined_at", "id"]),
+            # A user's subreddits, without reading the table.
+            models.Index(fields=["user", "subreddit"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user} in {self.subreddit}"
+
+
 class Rule(models.Model):
     subreddit = models.ForeignKey(
         Subreddit, on_delete=models.CASCADE, related_name="rules"
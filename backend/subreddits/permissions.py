@@ -1,6 +1,7 @@
 from django.shortcuts import get_object_or_404
 from rest_framework import permissions
 
+from .authz import get_authz
 from .models import Subreddit
 
 
@@ -13,12 +14,7 @@ class IsSubredditOwner(permissions.BasePermission):
         if not subreddit_pk:
             return False
 
-        try:
-            subreddit = Subreddit.objects.get(pk=subreddit_pk)
-        except Subreddit.DoesNotExist:
-            return False
-
-        return subreddit.owner == request.user
+        return get_authz(request).is_owner(subreddit_pk)
 
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
@@ -26,7 +22,12 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
 
-        return obj.owner == request.user
+        return obj.owner_id == request.user.pk
+
+
+class IsModeratorOrStaff(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
+        return request.user.is_staff or get_authz(request).is_moderator(obj)
 
 
 class IsModeratorOrReadOnly(permissions.BasePermission):
@@ -42,6 +43,9 @@ class IsModeratorOrReadOnly(permissions.BasePermission):
         if not subreddit_pk:
             return False
 
-        subreddit = get_object_or_404(Subreddit, pk=subreddit_pk)
+        if get_authz(request).is_moderator(subreddit_pk):
+            return True
 
-        return subreddit.moderators.filter(pk=request.user.pk).exists()
+        # Still answer 404 rather than 403 for subreddits that don't exist.
+        get_object_or_404(Subreddit, pk=subreddit_pk)
+        return False
@@ -1,31 +1,53 @@
+from api.metrics import TimedSerializerMixin
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from uploads.serializers import RenditionsField
 
-from .models import Rule, Subreddit
+from .models import Membership, Rule, Subreddit
 
 User = get_user_model()
 
 
-class RuleSerializer(serializers.ModelSerializer):
+class RuleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Rule
         fields = ["id", "title", "description", "created_at"]
 
 
-class SubredditSerializer(serializers.ModelSerializer):
+class MemberSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source="user_id")
+    username = serializers.ReadOnlyField(source="user.username")
+
+    class Meta:
+        model = Membership
+        fields = ["id", "username", "joined_at"]
+
+
+class SubredditSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source="owner.username")
+    icon_renditions = RenditionsField(source="icon")
 
     class Meta:
         model = Subreddit
-        fields = ["id", "name", "description", "owner", "created_at", "icon"]
+        fields = [
+            "id",
+            "name",
+            "description",
+            "owner",
+            "created_at",
+            "icon",
+            "icon_renditions",
+        ]
 
 
-class SubredditDetailSerializer(serializers.ModelSerializer):
+class SubredditDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source="owner.username")
     moderators = serializers.SlugRelatedField(
         many=True, slug_field="username", queryset=User.objects.all()
     )
     rules = RuleSerializer(many=True, read_only=True)
+    icon_renditions = RenditionsField(source="icon")
+    banner_renditions = RenditionsField(source="banner")
 
     class Meta:
         model = Subreddit
@@ -36,7 +58,11 @@ class SubredditDetailSerializer(serializers.ModelSerializer):
             "owner",
             "moderators",
             "rules",
+            "member_count",
             "created_at",
             "icon",
+            "icon_renditions",
             "banner",
+            "banner_renditions",
         ]
+        read_only_fields = ["member_count"]
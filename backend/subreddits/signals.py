@@ -0,0 +1,99 @@
+from api.conditional import bump_on_commit
+from django.conf import settings
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from . import authz, membership
+from .models import Rule, Subreddit
+
+
+@receiver(m2m_changed, sender=Subreddit.members.through)
+@receiver(m2m_changed, sender=Subreddit.moderators.through)
+def invalidate_role_changes(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("post_add", "post_remove"):
+        # subreddit.members.add(users) vs. user.joined_subreddits.add(subreddits)
+        authz.invalidate_on_commit([instance.pk] if reverse else pk_set)
+    elif action == "pre_clear":
+        if reverse:
+            authz.invalidate_on_commit([instance.pk])
+        else:
+            field = "members" if sender is Subreddit.members.through else "moderators"
+            user_ids = getattr(instance, field).values_list("pk", flat=True)
+            authz.invalidate_on_commit(user_ids)
+
+
+@receiver(post_save, sender=Subreddit)
+@receiver(post_delete, sender=Subreddit)
+def invalidate_ownership(sender, instance, **kwargs):
+    if instance.owner_id:
+        authz.invalidate_on_commit([instance.owner_id])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_new_user(sender, instance, created, **kwargs):
+    # Never let a new account inherit sets cached under a reused id.
+    if created:
+        authz.invalidate([instance.pk])
+
+
+@receiver(post_save, sender=Subreddit)
+@receiver(post_delete, sender=Subreddit)
+def bump_subreddit_stamps(sender, instance, **kwargs):
+    # Posts nest their subreddit, so its posts change with it.
+    bump_on_commit(
+        "subreddits", f"subreddit:{instance.pk}", "posts", f"posts:{instance.pk}"
+    )
+
+
+@receiver(m2m_changed, sender=Subreddit.moderators.through)
+def bump_moderator_stamps(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        subreddit_ids = [instance.pk]
+    elif action == "pre_clear":
+        subreddit_ids = instance.moderated_subreddits.values_list("pk", flat=True)
+    else:
+        subreddit_ids = pk_set
+    bump_on_commit(*(f"subreddit:{pk}" for pk in subreddit_ids))
+
+
+@receiver(m2m_changed, sender=Subreddit.members.through)
+def recount_members(sender, instance, action, reverse, pk_set, **kwargs):
+    # membership.join() and leave() keep the counts themselves.
+    if action in ("post_add", "post_remove"):
+        subreddit_ids = pk_set if reverse else [instance.pk]
+    elif action == "pre_clear" and reverse:
+        instance._cleared_subreddit_ids = list(
+            instance.joined_subreddits.values_list("pk", flat=True)
+        )
+        return
+    elif action == "post_clear":
+        subreddit_ids = instance._cleared_subreddit_ids if reverse else [instance.pk]
+    else:
+        return
+    membership.recount(subreddit_ids)
+    bump_on_commit(*(f"subreddit:{pk}" for pk in subreddit_ids))
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def remember_joined_subreddits(sender, instance, **kwargs):
+    # Their memberships are deleted along with them.
+    instance._joined_subreddit_ids = list(
+        instance.joined_subreddits.values_list("pk", flat=True)
+    )
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def recount_joined_subreddits(sender, instance, **kwargs):
+    subreddit_ids = getattr(instance, "_joined_subreddit_ids", [])
+    if subreddit_ids:
+        membership.recount(subreddit_ids)
+        bump_on_commit(*(f"subreddit:{pk}" for pk in subreddit_ids))
+
+
+@receiver(post_save, sender=Rule)
+@receiver(post_delete, sender=Rule)
+def bump_rule_stamps(sender, instance, **kwargs):
+    bump_on_commit(f"subreddit:{instance.subreddit_id}")
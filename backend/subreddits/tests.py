@@ -1,9 +1,23 @@
+import csv
+import json
+from datetime import timedelta
+from io import StringIO
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from posts.archive import archive_posts
+from posts.models import FeedEntry, Post
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from .models import Rule, Subreddit
+from .authz import get_authz
+from .models import Membership, Rule, Subreddit
 
 User = get_user_model()
 
@@ -211,3 +225,345 @@ class RuleViewSetTests(APITestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(self.subreddit.rules.count(), 0)
+
+
+class AuthorizationContextTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            username="authzowner",
+            password="password123",
+            email="authzowner@example.com",
+        )
+        self.user = User.objects.create_user(
+            username="authzuser", password="password123", email="authzuser@example.com"
+        )
+        self.subreddit = Subreddit.objects.create(name="authz", owner=self.owner)
+        self.subreddit.moderators.add(self.owner)
+        self.request = RequestFactory().get("/")
+
+    def test_each_role_is_loaded_once_per_request(self):
+        self.request.user = self.owner
+        with self.assertNumQueries(3):
+            for _ in range(3):
+                authz = get_authz(self.request)
+                self.assertTrue(authz.is_owner(self.subreddit))
+                self.assertTrue(authz.is_moderator(self.subreddit.pk))
+                self.assertFalse(authz.is_member(str(self.subreddit.pk)))
+
+    def test_cached_roles_are_reused_across_requests(self):
+        self.request.user = self.owner
+        get_authz(self.request).is_moderator(self.subreddit)
+
+        request = RequestFactory().get("/")
+        request.user = self.owner
+        with self.assertNumQueries(0):
+            self.assertTrue(get_authz(request).is_moderator(self.subreddit))
+
+    def test_role_changes_invalidate_the_cache(self):
+        self.request.user = self.user
+        self.assertFalse(get_authz(self.request).is_moderator(self.subreddit))
+
+        self.subreddit.moderators.add(self.user)
+        request = RequestFactory().get("/")
+        request.user = self.user
+        self.assertTrue(get_authz(request).is_moderator(self.subreddit))
+
+        self.subreddit.moderators.remove(self.user)
+        request = RequestFactory().get("/")
+        request.user = self.user
+        self.assertFalse(get_authz(request).is_moderator(self.subreddit))
+
+    def test_anonymous_user_has_no_roles(self):
+        self.request.user = AnonymousUser()
+        with self.assertNumQueries(0):
+            self.assertFalse(get_authz(self.request).is_member(self.subreddit))
+
+    def test_only_members_can_post(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse("post-list")
+        data = {"subreddit_id": self.subreddit.pk, "title": "Hi", "body": "..."}
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.subreddit.members.add(self.user)
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class MembershipTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            username="joinowner", password="password123", email="joinowner@example.com"
+        )
+        self.user = User.objects.create_user(
+            username="joinuser", password="password123", email="joinuser@example.com"
+        )
+        self.subreddit = Subreddit.objects.create(name="join", owner=self.owner)
+        self.join_url = reverse("subreddit-join", kwargs={"pk": self.subreddit.pk})
+        self.leave_url = reverse("subreddit-leave", kwargs={"pk": self.subreddit.pk})
+
+    def member_count(self):
+        self.subreddit.refresh_from_db()
+        return self.subreddit.member_count
+
+    def test_join_and_leave(self):
+        self.client.force_authenticate(user=self.user)
+        detail_url = reverse("subreddit-detail", kwargs={"pk": self.subreddit.pk})
+        self.assertEqual(self.client.get(detail_url).data["member_count"], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.join_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"joined": True, "member_count": 1})
+        self.assertEqual(self.client.get(detail_url).data["member_count"], 1)
+        response = self.client.post(
+            reverse("post-list"),
+            {"subreddit_id": self.subreddit.pk, "title": "Hi", "body": "..."},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post(self.join_url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.member_count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.leave_url)
+        self.assertEqual(response.data, {"joined": False, "member_count": 0})
+        self.assertEqual(self.client.get(detail_url).data["member_count"], 0)
+        self.assertFalse(get_authz(response.wsgi_request).is_member(self.subreddit))
+
+        response = self.client.post(self.leave_url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.member_count(), 0)
+
+    def test_join_requires_authentication(self):
+        response = self.client.post(self.join_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_lost_join_race_leaves_the_count_alone(self):
+        # As if a concurrent request had inserted the row first.
+        Membership.objects.create(subreddit=self.subreddit, user=self.user)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(self.join_url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.member_count(), 0)
+
+    def test_relation_changes_are_recounted(self):
+        self.subreddit.members.add(self.owner, self.user)
+        self.assertEqual(self.member_count(), 2)
+        self.user.joined_subreddits.remove(self.subreddit)
+        self.assertEqual(self.member_count(), 1)
+        self.owner.joined_subreddits.clear()
+        self.assertEqual(self.member_count(), 0)
+
+        self.subreddit.members.add(self.user)
+        self.user.delete()
+        self.assertEqual(self.member_count(), 0)
+
+    def test_join_and_leave_update_the_feed(self):
+        post = Post.objects.create(
+            subreddit=self.subreddit, owner=self.owner, title="Old", body="."
+        )
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.join_url)
+        self.assertTrue(FeedEntry.objects.filter(user=self.user, post=post).exists())
+        self.client.post(self.leave_url)
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    def test_members_are_listed_newest_first(self):
+        now = timezone.now()
+        users = [self.owner, self.user]
+        for i in range(3):
+            users.append(
+                User.objects.create_user(
+                    username=f"joiner{i}",
+                    password="password123",
+                    email=f"joiner{i}@example.com",
+                )
+            )
+        Membership.objects.bulk_create(
+            Membership(subreddit=self.subreddit, user=user, joined_at=now)
+            for user in users
+        )
+        self.client.force_authenticate(user=self.user)
+        url = reverse(
+            "subreddit-members-list", kwargs={"subreddit_pk": self.subreddit.pk}
+        )
+
+        response = self.client.get(url, {"page_size": 3})
+        self.assertEqual(
+            [member["username"] for member in response.data["results"]],
+            ["joiner2", "joiner1", "joiner0"],
+        )
+        response = self.client.get(response.data["next"])
+        self.assertEqual(
+            [member["id"] for member in response.data["results"]],
+            [self.user.pk, self.owner.pk],
+        )
+        self.assertIsNone(response.data["next"])
+
+
+class SubredditConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            username="etagowner", password="password123", email="etagowner@example.com"
+        )
+        self.subreddit = Subreddit.objects.create(name="etag", owner=self.owner)
+        self.subreddit.moderators.add(self.owner)
+        self.url = reverse("subreddit-detail", kwargs={"pk": self.subreddit.pk})
+
+    def test_detail_is_revalidated_until_a_rule_changes(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Rule.objects.create(subreddit=self.subreddit, title="Be nice")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["rules"]), 1)
+
+    def test_detail_is_served_from_memory(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["moderators"], ["etagowner"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subreddit.moderators.add(
+                User.objects.create_user(
+                    username="newmod", password="password123", email="new@example.com"
+                )
+            )
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["moderators"], ["etagowner", "newmod"])
+
+    def test_detail_queries_are_prefetched(self):
+        Rule.objects.create(subreddit=self.subreddit, title="One")
+        Rule.objects.create(subreddit=self.subreddit, title="Two")
+        # Subreddit with its owner, moderators, rules.
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+
+    async def test_async_detail_matches_the_sync_view(self):
+        # self.async_client goes through ASGIRequest, so ASGI_URLCONF.
+        expected = await sync_to_async(self.client.get)(self.url)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response["ETag"], expected["ETag"])
+
+        response = await self.async_client.get(
+            self.url, headers={"If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class SubredditExportTests(APITestCase):
+    def setUp(self):
+        self.moderator = User.objects.create_user(
+            username="exporter", password="password123", email="exporter@example.com"
+        )
+        self.member = User.objects.create_user(
+            username="reader", password="password123", email="reader@example.com"
+        )
+        self.subreddit = Subreddit.objects.create(name="archive", owner=self.moderator)
+        self.subreddit.moderators.add(self.moderator)
+        other = Subreddit.objects.create(name="other", owner=self.member)
+
+        self.start = timezone.now() - timedelta(days=10)
+        for day in range(5):
+            self.create_post(self.subreddit, f"Day {day}", day)
+        self.create_post(self.subreddit, "Removed", 2, is_removed=True)
+        self.create_post(other, "Elsewhere", 1)
+        self.url = reverse("subreddit-export", kwargs={"pk": self.subreddit.pk})
+
+    def create_post(self, subreddit, title, day, **fields):
+        post = Post.objects.create(
+            subreddit=subreddit, owner=self.member, title=title, body="...", **fields
+        )
+        # created_at is auto_now_add.
+        Post.objects.filter(pk=post.pk).update(
+            created_at=self.start + timedelta(days=day)
+        )
+
+    def export(self, user=None, **params):
+        self.client.force_authenticate(user=user or self.moderator)
+        response = self.client.get(self.url, params)
+        if response.status_code != status.HTTP_200_OK:
+            return response, None
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_ndjson_streams_live_posts_oldest_first(self):
+        response, content = self.export()
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertIn('filename="archive.ndjson"', response["Content-Disposition"])
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row["title"] for row in rows], [f"Day {i}" for i in range(5)])
+        self.assertEqual(rows[0]["owner"], "reader")
+        self.assertEqual(rows[0]["created_at"], self.start.isoformat())
+
+    def test_csv(self):
+        response, content = self.export(output="csv")
+
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(content.splitlines()))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[4]["title"], "Day 4")
+        self.assertEqual(rows[4]["is_nsfw"], "False")
+
+    def test_created_at_range(self):
+        _, content = self.export(
+            created_after=(self.start + timedelta(days=1)).isoformat(),
+            created_before=(self.start + timedelta(days=3)).isoformat(),
+        )
+        titles = [json.loads(line)["title"] for line in content.splitlines()]
+        self.assertEqual(titles, ["Day 1", "Day 2"])
+
+    def test_archived_posts_are_merged_in(self):
+        archive_posts(after_days=8)
+        self.assertEqual(self.subreddit.posts.count(), 2)
+        _, content = self.export()
+        titles = [json.loads(line)["title"] for line in content.splitlines()]
+        self.assertEqual(titles, [f"Day {i}" for i in range(5)])
+
+    def test_invalid_parameters(self):
+        response, _ = self.export(output="xml")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_moderator_or_staff(self):
+        response, _ = self.export(user=self.member)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.member.is_staff = True
+        self.member.save()
+        response, _ = self.export(user=self.member)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command(
+            "export_posts",
+            "archive",
+            "--created-after",
+            (self.start + timedelta(days=3)).isoformat(),
+            stdout=stdout,
+        )
+        titles = [json.loads(line)["title"] for line in stdout.getvalue().splitlines()]
+        self.assertEqual(titles, ["Day 3", "Day 4"])
+
+    def test_command_rejects_bounds_it_cannot_parse(self):
+        for value in ("yesterday", "2024-13-45T00:00:00"):
+            with self.subTest(value=value):
+                with self.assertRaises(CommandError):
+                    call_command(
+                        "export_posts",
+                        "archive",
+                        "--created-after",
+                        value,
+                        stdout=StringIO(),
+                    )
@@ -1,12 +1,13 @@
 from rest_framework_nested import routers
 
-from .views import ModeratorViewSet, RuleViewSet, SubredditViewSet
+from .views import (MemberViewSet, ModeratorViewSet, RuleViewSet,
+                    SubredditViewSet)
 
 # Main router for /subreddits/
 router = routers.DefaultRouter()
 router.register(r"subreddits", SubredditViewSet, basename="subreddit")
 
-# Nested router for /subreddits/{subreddit_pk}/rule|moderators
+# Nested router for /subreddits/{subreddit_pk}/rule|moderators|members
 subreddits_router = routers.NestedDefaultRouter(
     router, r"subreddits", lookup="subreddit"
 )
@@ -14,5 +15,6 @@ subreddits_router.register(r"rules", RuleViewSet, basename="subreddit-rules")
 subreddits_router.register(
     r"moderators", ModeratorViewSet, basename="subreddit-moderators"
 )
+subreddits_router.register(r"members", MemberViewSet, basename="subreddit-members")
 
 urlpatterns = router.urls + subreddits_router.urls
@@ -1,18 +1,32 @@
+from api.cache import TwoTierCache
+from api.conditional import conditional, request_stamps
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from posts.export import FORMATS, export_lines
+from posts.pagination import KeysetPagination
+from posts.serializers import ExportParamsSerializer
 from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from users.serializers import UserSerializer
 
-from .models import Rule, Subreddit
-from .permissions import (IsModeratorOrReadOnly, IsOwnerOrReadOnly,
-                          IsSubredditOwner)
-from .serializers import (RuleSerializer, SubredditDetailSerializer,
-                          SubredditSerializer)
+from . import membership
+from .models import Membership, Rule, Subreddit
+from .permissions import (IsModeratorOrReadOnly, IsModeratorOrStaff,
+                          IsOwnerOrReadOnly, IsSubredditOwner)
+from .serializers import (MemberSerializer, RuleSerializer,
+                          SubredditDetailSerializer, SubredditSerializer)
 
 User = get_user_model()
 
+# Rendered subreddit detail payloads, keyed by the subreddit's version stamps.
+detail_cache = TwoTierCache(
+    maxsize=settings.SUBREDDIT_CACHE_SIZE, timeout=settings.SUBREDDIT_CACHE_TIMEOUT
+)
+
 
 class ModeratorViewSet(
     mixins.ListModelMixin,
@@ -25,15 +39,13 @@ class ModeratorViewSet(
     lookup_field = "pk"
 
     def get_subreddit(self):
-        subreddit_pk = self.kwargs["subreddit_pk"]
-        return get_object_or_404(Subreddit, pk=subreddit_pk)
+        if not hasattr(self, "_subreddit"):
+            subreddit_pk = self.kwargs["subreddit_pk"]
+            self._subreddit = get_object_or_404(Subreddit, pk=subreddit_pk)
+        return self._subreddit
 
     def get_queryset(self):
-        try:
-            subreddit = Subreddit.objects.get(pk=self.kwargs["subreddit_pk"])
-            return subreddit.moderators.all()
-        except Subreddit.DoesNotExist:
-            return User.objects.none()
+        return User.objects.filter(moderated_subreddits=self.kwargs["subreddit_pk"])
 
     def create(self, request, *args, **kwargs):
         subreddit = self.get_subreddit()
@@ -68,7 +80,7 @@ class ModeratorViewSet(
     def perform_destroy(self, instance):
         subreddit = self.get_subreddit()
 
-        if instance == subreddit.owner:
+        if instance.pk == subreddit.owner_id:
             raise ValidationError(
                 "The subreddit owner cannot be removed as a moderator."
             )
@@ -76,9 +88,115 @@ class ModeratorViewSet(
         subreddit.moderators.remove(instance)
 
 
+class MemberViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    # Newest members first. A page is one range scan of the
+    # (subreddit, joined_at, id) index, however many members there are.
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = MemberSerializer
+    pagination_class = KeysetPagination
+    filter_backends = []
+
+    def get_queryset(self):
+        return (
+            Membership.objects.filter(subreddit_id=self.kwargs["subreddit_pk"])
+            .select_related("user")
+            .only("joined_at", "user__username")
+            .order_by("-joined_at", "-id")
+        )
+
+
+def subreddit_list_scopes(request, *args, **kwargs):
+    return ["subreddits", "users"]
+
+
+def subreddit_detail_scopes(request, *args, pk=None, **kwargs):
+    return [f"subreddit:{pk}", "users"]
+
+
+def detail_cache_key(request, pk, stamps):
+    return ":".join(
+        [
+            "subreddit_detail",
+            str(pk),
+            # Icon and banner URLs are absolute.
+            request.build_absolute_uri("/"),
+            *(str(stamps[scope]) for scope in sorted(stamps)),
+        ]
+    )
+
+
 class SubredditViewSet(viewsets.ModelViewSet):
     queryset = Subreddit.objects.all()
 
+    @conditional(subreddit_list_scopes)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional(subreddit_detail_scopes)
+    def retrieve(self, request, *args, **kwargs):
+        # Any change to the subreddit, its rules, moderators or their users
+        # bumps one of the stamps, so the key moves on and old entries are
+        # never read again.
+        stamps = request_stamps(request, subreddit_detail_scopes(request, **kwargs))
+        key = detail_cache_key(request, kwargs["pk"], stamps)
+
+        data = detail_cache.get(key)
+        if data is None:
+            # A plain dict, without the serializer a ReturnDict refers to.
+            data = dict(self.get_serializer(self.get_object()).data)
+            detail_cache.set(key, data)
+        return Response(data)
+
+    @action(detail=True, methods=["get"])
+    def export(self, request, pk=None):
+        # Every live post, oldest first, streamed (see posts/export.py):
+        # ?output=ndjson|csv&created_after=...&created_before=...
+        subreddit = self.get_object()
+        params = ExportParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        output = params.validated_data.pop("output")
+
+        response = StreamingHttpResponse(
+            export_lines(subreddit.pk, output, **params.validated_data),
+            content_type=FORMATS[output],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{subreddit.name}.{output}"'
+        )
+        return response
+
+    @action(detail=True, methods=["post"])
+    def join(self, request, pk=None):
+        subreddit = self.get_object()
+        if not membership.join(subreddit, request.user):
+            return Response(
+                {"error": "You are already a member of this subreddit."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(self.membership_data(subreddit, joined=True))
+
+    @action(detail=True, methods=["post"])
+    def leave(self, request, pk=None):
+        subreddit = self.get_object()
+        if not membership.leave(subreddit, request.user):
+            return Response(
+                {"error": "You are not a member of this subreddit."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(self.membership_data(subreddit, joined=False))
+
+    def membership_data(self, subreddit, joined):
+        member_count = Subreddit.objects.values_list("member_count", flat=True).get(
+            pk=subreddit.pk
+        )
+        return {"joined": joined, "member_count": member_count}
+
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related("owner")
+        if self.action == "retrieve":
+            queryset = queryset.prefetch_related("moderators", "rules")
+        return queryset
+
     def get_serializer_class(self):
         if self.action in ["retrieve", "update", "partial_update"]:
             return SubredditDetailSerializer
@@ -87,8 +205,10 @@ class SubredditViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action in ["update", "partial_update", "destroy"]:
             self.permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
-        elif self.action == "create":
+        elif self.action in ["create", "join", "leave"]:
             self.permission_classes = [permissions.IsAuthenticated]
+        elif self.action == "export":
+            self.permission_classes = [permissions.IsAuthenticated, IsModeratorOrStaff]
         else:
             self.permission_classes = [permissions.AllowAny]
         return super().get_permissions()
@@ -106,5 +226,5 @@ class RuleViewSet(viewsets.ModelViewSet):
         return Rule.objects.filter(subreddit_id=self.kwargs["subreddit_pk"])
 
     def perform_create(self, serializer):
-        subreddit = Subreddit.objects.get(pk=self.kwargs["subreddit_pk"])
-        serializer.save(subreddit=subreddit)
+        # IsModeratorOrReadOnly already established that the subreddit exists.
+        serializer.save(subreddit_id=self.kwargs["subreddit_pk"])
@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from .models import Blob, UploadSession
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "content_type", "size", "created_at")
+    search_fields = ("sha256",)
+    readonly_fields = ("sha256", "file", "size", "content_type", "created_at")
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ("filename", "owner", "offset", "size", "blob", "updated_at")
+    search_fields = ("filename", "owner__username")
+    readonly_fields = ("owner", "offset", "blob", "created_at", "updated_at")
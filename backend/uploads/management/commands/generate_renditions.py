@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from uploads.renditions import all_sources, render_all
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the missing renditions of every subreddit icon and banner "
+        "and every profile picture."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, help="Defaults to RENDITION_WORKERS."
+        )
+
+    def handle(self, *args, **options):
+        sources = list(all_sources())
+        rendered = render_all(sources, workers=options["workers"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rendered {rendered} renditions of {len(sources)} images."
+            )
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from uploads.storage import purge
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete upload sessions untouched for UPLOAD_SESSION_TTL seconds, "
+        "their staging files, and the blobs nothing refers to."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ttl", type=int, help="Seconds; overrides the setting.")
+
+    def handle(self, *args, **options):
+        sessions, blobs = purge(ttl=options["ttl"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Purged {sessions} sessions and {blobs} blobs.")
+        )
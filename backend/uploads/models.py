@@ -0,0 +1,61 @@
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+
+def blob_path(instance, filename):
+    # Content-addressed: the name depends on the bytes only, never on the
+    # uploaded file name.
+    sha256 = instance.sha256
+    return f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+class Blob(models.Model):
+    """
+    A finalized upload, stored once per distinct content under its SHA-256
+    (see uploads/storage.py). Posts refer to blobs; uploading the same file
+    again reuses the existing one.
+    """
+
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    file = models.FileField(upload_to=blob_path)
+    size = models.BigIntegerField()
+    content_type = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
+class UploadSession(models.Model):
+    """
+    A chunked upload in progress. Chunks are appended to a staging file at
+    ``offset``; once ``size`` bytes are in, completing the session hashes
+    the file and links it to its ``Blob``.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="upload_sessions",
+        on_delete=models.CASCADE,
+    )
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.BigIntegerField()
+    # Bytes received so far; the next chunk must start here.
+    offset = models.BigIntegerField(default=0)
+    blob = models.ForeignKey(
+        Blob,
+        related_name="sessions",
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.filename
@@ -0,0 +1,198 @@
+"""
+Fixed-size renditions of subreddit icons and banners and profile pictures.
+
+List responses nest icons and avatars; serving them at their uploaded size
+sends megabytes for a 32px image. Every size of ``IMAGE_RENDITIONS`` is
+rendered in WebP and in a fallback format (PNG for sources that may be
+transparent, JPEG otherwise), scaled down to fit a square of that many
+pixels.
+
+Rendition names are derived from the source name alone,
+``renditions/<source>/<size>.<ext>``, so serializers build their URLs
+(``RenditionsField``) without a query or a storage lookup. They are
+rendered:
+
+* in a pool of ``RENDITION_WORKERS`` processes after an image is saved
+  (inline when ``RENDITIONS_INLINE`` is set, as in tests),
+* on demand by ``uploads.views.rendition`` when one is requested but
+  missing: the web server falls back to that view for missing files under
+  ``MEDIA_URL/renditions/``, so a wiped storage or a new size heals itself,
+* for every existing image by ``manage.py generate_renditions``.
+"""
+
+import atexit
+import logging
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Image fields that get renditions, by model.
+SOURCES = {
+    "subreddits.Subreddit": ["icon", "banner"],
+    "users.CustomUser": ["profile_picture"],
+}
+
+PREFIX = "renditions/"
+CONTENT_TYPES = {"webp": "image/webp", "png": "image/png", "jpg": "image/jpeg"}
+
+_executor = None
+
+
+def fallback_format(source):
+    extension = posixpath.splitext(source)[1].lower()
+    return "png" if extension in (".png", ".gif", ".webp") else "jpg"
+
+
+def rendition_name(source, size, fmt):
+    return f"{PREFIX}{source}/{size}.{fmt}"
+
+
+def rendition_names(source):
+    """``{size: {"webp": name, "fallback": name}}`` for the image ``source``."""
+    fallback = fallback_format(source)
+    return {
+        size: {
+            "webp": rendition_name(source, size, "webp"),
+            "fallback": rendition_name(source, size, fallback),
+        }
+        for size in settings.IMAGE_RENDITIONS
+    }
+
+
+def parse(name):
+    """
+    The ``(source, size, format)`` of the rendition ``name``, or ``None`` if
+    it is not the name of a rendition of an image that can have one.
+    """
+    if not name.startswith(PREFIX):
+        return None
+    source, _, filename = name[len(PREFIX) :].rpartition("/")
+    size, _, fmt = filename.partition(".")
+    if (
+        size not in settings.IMAGE_RENDITIONS
+        or fmt not in ("webp", fallback_format(source))
+        or posixpath.normpath(source) != source
+        or not source.startswith(source_dirs())
+    ):
+        return None
+    return source, size, fmt
+
+
+def source_dirs():
+    return tuple(
+        apps.get_model(label)._meta.get_field(field).upload_to
+        for label, fields in SOURCES.items()
+        for field in fields
+    )
+
+
+def render(source, sizes=None):
+    """
+    Write the missing renditions of ``source`` (every size by default) to
+    the default storage. Returns how many were written.
+    """
+    sizes = sizes or list(settings.IMAGE_RENDITIONS)
+    fallback = fallback_format(source)
+    missing = [
+        (size, fmt, name)
+        for size, names in rendition_names(source).items()
+        if size in sizes
+        for fmt, name in [("webp", names["webp"]), (fallback, names["fallback"])]
+        if not default_storage.exists(name)
+    ]
+    if not missing:
+        return 0
+
+    try:
+        with default_storage.open(source, "rb") as file:
+            image = ImageOps.exif_transpose(Image.open(file))
+            image.load()
+        if image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+    except (FileNotFoundError, OSError) as exc:
+        logger.warning("Cannot render %s: %s", source, exc)
+        return 0
+
+    for size, fmt, name in missing:
+        box = settings.IMAGE_RENDITIONS[size]
+        rendition = image.copy()
+        rendition.thumbnail((box, box), Image.LANCZOS)
+        default_storage.save(name, ContentFile(encode(rendition, fmt)))
+    return len(missing)
+
+
+def encode(image, fmt):
+    buffer = BytesIO()
+    if fmt == "webp":
+        image.save(buffer, "WEBP", quality=80, method=4)
+    elif fmt == "png":
+        image.save(buffer, "PNG", optimize=True)
+    else:
+        if image.mode in ("RGBA", "LA"):
+            # JPEG has no alpha channel; flatten onto white.
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        image.save(buffer, "JPEG", quality=85, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def all_sources():
+    """Yield the name of every image that gets renditions."""
+    for label, fields in SOURCES.items():
+        model = apps.get_model(label)
+        for field in fields:
+            yield from (
+                model.objects.exclude(**{f"{field}__isnull": True})
+                .exclude(**{field: ""})
+                .values_list(field, flat=True)
+                .iterator()
+            )
+
+
+def render_all(sources, workers=None):
+    """Render ``sources`` across ``workers`` processes; return the count."""
+    if settings.RENDITIONS_INLINE:
+        return sum(map(render, sources))
+    with ProcessPoolExecutor(
+        max_workers=workers or settings.RENDITION_WORKERS, initializer=_init_worker
+    ) as pool:
+        return sum(pool.map(render, sources, chunksize=16))
+
+
+def schedule(source):
+    """Render ``source`` in the process pool, or right away if inline."""
+    if settings.RENDITIONS_INLINE:
+        render(source)
+        return
+    get_executor().submit(render, source).add_done_callback(_log_failure)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.RENDITION_WORKERS, initializer=_init_worker
+        )
+        atexit.register(_executor.shutdown, wait=False)
+    return _executor
+
+
+def _init_worker():
+    # Workers started with "spawn" begin with an unconfigured Django.
+    import django
+
+    django.setup()
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.error("Rendition failed", exc_info=future.exception())
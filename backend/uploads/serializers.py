@@ -0,0 +1,73 @@
+from api.metrics import TimedSerializerMixin
+from django.conf import settings
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+from . import renditions
+from .models import Blob, UploadSession
+
+
+class BlobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Blob
+        fields = ["sha256", "size", "content_type", "file"]
+
+
+class UploadSessionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    blob = BlobSerializer(read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            "id",
+            "filename",
+            "content_type",
+            "size",
+            "offset",
+            "blob",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = ["offset"]
+
+    def validate_size(self, value):
+        if value < 1:
+            raise serializers.ValidationError("An upload cannot be empty.")
+        if value > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Uploads are limited to {settings.UPLOAD_MAX_SIZE} bytes."
+            )
+        return value
+
+
+class RenditionsField(serializers.Field):
+    """
+    The URLs of the renditions of an image field (see uploads/renditions.py),
+    as ``{size: {"webp": url, "fallback": url}}``, or ``None`` without an
+    image. Declared with the image field as ``source``.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get("request")
+        return self.values_converter(request)(value.name if value else None)
+
+    def values_converter(self, request):
+        # Also used by api/rows.py on values() rows, where the value is the
+        # file name.
+        def convert(name):
+            if not name:
+                return None
+            return {
+                size: {key: url(rendition) for key, rendition in names.items()}
+                for size, names in renditions.rendition_names(name).items()
+            }
+
+        def url(name):
+            url = default_storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        return convert
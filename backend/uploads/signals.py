@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from . import renditions
+
+
+def render_saved_images(sender, instance, update_fields=None, **kwargs):
+    # Renditions that exist already are skipped, so saving a subreddit or a
+    # user without a new image costs a few storage lookups in the pool.
+    sources = [
+        getattr(instance, field).name
+        for field in renditions.SOURCES[sender._meta.label]
+        if (update_fields is None or field in update_fields)
+        and getattr(instance, field)
+    ]
+    if not sources:
+        return
+
+    def schedule():
+        for source in sources:
+            renditions.schedule(source)
+
+    transaction.on_commit(schedule)
+
+
+for label in renditions.SOURCES:
+    post_save.connect(render_saved_images, sender=label)
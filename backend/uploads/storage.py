@@ -0,0 +1,138 @@
+"""
+Chunked, resumable uploads into content-addressed storage.
+
+A client opens an ``UploadSession`` with the file's name, type and size,
+then sends the bytes in chunks of at most ``UPLOAD_MAX_CHUNK_SIZE``, each
+one a short request that starts at the session's ``offset``. Chunks are
+appended to a staging file under ``UPLOAD_STAGING_ROOT``, so an upload
+interrupted at any point resumes from the last chunk received instead of
+starting over, and no worker is held for the whole transfer.
+
+Completing the session hashes the staged file and stores it in the default
+storage as ``blobs/<sha256>``, unless a ``Blob`` with that hash exists
+already, in which case the staged copy is simply dropped: identical files
+are stored once however many times they are uploaded. Posts refer to the
+blob by its hash (``blob_id``).
+
+Sessions untouched for ``UPLOAD_SESSION_TTL`` seconds, their staging files
+and the blobs nothing refers to any more are removed by ``manage.py
+purge_uploads``.
+"""
+
+import hashlib
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.deletion import ProtectedError
+from django.utils import timezone
+from posts.models import ArchivedPost, Post
+
+from .models import Blob, UploadSession
+
+# Bytes read or written at a time when copying and hashing.
+COPY_BUFFER = 64 * 1024
+
+
+def staging_path(session):
+    return Path(settings.UPLOAD_STAGING_ROOT) / f"{session.pk}.part"
+
+
+def staged_size(session):
+    try:
+        return staging_path(session).stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def write_chunk(session, stream, length):
+    """
+    Write up to ``length`` bytes of ``stream`` at ``session.offset`` and
+    return how many were written. Anything staged past the offset, left by
+    a chunk that was never acknowledged, is overwritten.
+    """
+    path = staging_path(session)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    written = 0
+    with open(path, "r+b" if path.exists() else "wb") as file:
+        file.seek(session.offset)
+        file.truncate()
+        while written < length:
+            data = stream.read(min(COPY_BUFFER, length - written))
+            if not data:
+                # The client went away; what arrived is kept.
+                break
+            file.write(data)
+            written += len(data)
+    return written
+
+
+def finalize(session):
+    """Link a fully staged ``session`` to its blob, storing it if it is new."""
+    path = staging_path(session)
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while data := file.read(COPY_BUFFER):
+            digest.update(data)
+    sha256 = digest.hexdigest()
+
+    blob = Blob.objects.filter(pk=sha256).first()
+    if blob is None:
+        blob = Blob(sha256=sha256, size=session.size, content_type=session.content_type)
+        name = blob.file.field.generate_filename(blob, session.filename)
+        if blob.file.storage.exists(name):
+            # Stored by a finalize whose transaction did not commit.
+            blob.file.name = name
+        else:
+            with open(path, "rb") as file:
+                blob.file.save(session.filename, File(file), save=False)
+        # Another session may have finalized the same content meanwhile;
+        # either row will do.
+        Blob.objects.bulk_create([blob], ignore_conflicts=True)
+
+    session.blob = blob
+    session.save(update_fields=["blob", "updated_at"])
+    transaction.on_commit(lambda: path.unlink(missing_ok=True))
+    return blob
+
+
+def discard(session):
+    """Delete ``session`` and its staging file."""
+    path = staging_path(session)
+    session.delete()
+    transaction.on_commit(lambda: path.unlink(missing_ok=True))
+
+
+def purge(ttl=None):
+    """
+    Delete the sessions untouched for ``ttl`` seconds (``UPLOAD_SESSION_TTL``
+    by default) and the blobs no post or session refers to. Returns the
+    number of sessions and blobs deleted.
+    """
+    if ttl is None:
+        ttl = settings.UPLOAD_SESSION_TTL
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+
+    sessions = 0
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+        discard(session)
+        sessions += 1
+
+    unused = Blob.objects.filter(created_at__lt=cutoff).exclude(
+        Exists(UploadSession.objects.filter(blob=OuterRef("pk")))
+        | Exists(Post.objects.filter(blob=OuterRef("pk")))
+        | Exists(ArchivedPost.objects.filter(blob=OuterRef("pk")))
+    )
+    blobs = 0
+    for blob in unused.iterator():
+        try:
+            blob.delete()
+        except ProtectedError:
+            # Attached to a post since the query ran.
+            continue
+        transaction.on_commit(lambda file=blob.file: file.storage.delete(file.name))
+        blobs += 1
+    return sessions, blobs
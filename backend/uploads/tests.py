@@ -0,0 +1,334 @@
+import hashlib
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from posts.models import Post
+from rest_framework import status
+from rest_framework.test import APITestCase
+from subreddits.models import Subreddit
+
+from . import renditions, storage
+from .models import Blob, UploadSession
+from .views import CHUNK_CONTENT_TYPE
+
+User = get_user_model()
+
+
+class UploadTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        root = Path(cls.enterClassContext(tempfile.TemporaryDirectory()))
+        cls.enterClassContext(
+            override_settings(
+                MEDIA_ROOT=root / "media",
+                UPLOAD_STAGING_ROOT=root / "staging",
+                UPLOAD_MAX_CHUNK_SIZE=8,
+            )
+        )
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="uploader", password="password123", email="up@example.com"
+        )
+        self.other = User.objects.create_user(
+            username="other", password="password123", email="other@example.com"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def start(self, data, filename="cat.gif"):
+        response = self.client.post(
+            reverse("upload-list"),
+            {"filename": filename, "content_type": "image/gif", "size": len(data)},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["id"]
+
+    def send(self, upload_id, offset, chunk):
+        return self.client.patch(
+            reverse("upload-detail", kwargs={"pk": upload_id}),
+            chunk,
+            content_type=CHUNK_CONTENT_TYPE,
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def complete(self, upload_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse("upload-complete", kwargs={"pk": upload_id})
+            )
+
+    def upload(self, data):
+        upload_id = self.start(data)
+        for offset in range(0, len(data), 8):
+            response = self.send(upload_id, offset, data[offset : offset + 8])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_chunks_are_finalized_into_a_blob(self):
+        data = b"GIF89a, in three chunks"
+        session = self.upload(data)
+
+        self.assertEqual(session["offset"], len(data))
+        sha256 = hashlib.sha256(data).hexdigest()
+        self.assertEqual(session["blob"]["sha256"], sha256)
+        blob = Blob.objects.get()
+        self.assertEqual(blob.file.name, f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}")
+        with blob.file.open("rb") as file:
+            self.assertEqual(file.read(), data)
+        # The staged copy is gone.
+        self.assertFalse(storage.staging_path(blob.sessions.get()).exists())
+
+    def test_interrupted_upload_resumes_at_the_offset(self):
+        data = b"0123456789abcdef"
+        upload_id = self.start(data)
+        self.send(upload_id, 0, data[:8])
+
+        # A retried chunk is refused; the client is told where to resume.
+        response = self.send(upload_id, 0, data[:8])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response["Upload-Offset"], "8")
+        response = self.client.get(reverse("upload-detail", kwargs={"pk": upload_id}))
+        self.assertEqual(response.data["offset"], 8)
+
+        # Bytes staged past the offset by an unacknowledged chunk are replaced.
+        with open(storage.staging_path(UploadSession(pk=upload_id)), "ab") as file:
+            file.write(b"garbage")
+        self.send(upload_id, 8, data[8:])
+        self.assertEqual(self.complete(upload_id).data["blob"]["size"], len(data))
+        with Blob.objects.get().file.open("rb") as file:
+            self.assertEqual(file.read(), data)
+
+    def test_identical_files_are_stored_once(self):
+        first = self.upload(b"same bytes")
+        self.client.force_authenticate(user=self.other)
+        second = self.upload(b"same bytes")
+
+        self.assertEqual(first["blob"], second["blob"])
+        self.assertEqual(Blob.objects.count(), 1)
+        self.assertEqual(UploadSession.objects.filter(blob__isnull=False).count(), 2)
+
+    def test_chunks_are_checked(self):
+        upload_id = self.start(b"0123456789")
+
+        response = self.send(upload_id, 0, b"012345678")
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        response = self.client.patch(
+            reverse("upload-detail", kwargs={"pk": upload_id}),
+            {"offset": 0},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        self.send(upload_id, 0, b"01234567")
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Blob.objects.exists())
+
+    def test_lost_staging_file_is_resumed_on_complete(self):
+        data = b"0123456789abcdef"
+        upload_id = self.start(data)
+        self.send(upload_id, 0, data[:8])
+        self.send(upload_id, 8, data[8:])
+        path = storage.staging_path(UploadSession(pk=upload_id))
+
+        with open(path, "r+b") as file:
+            file.truncate(5)
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response["Upload-Offset"], "5")
+
+        path.unlink()
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response["Upload-Offset"], "0")
+        self.assertFalse(Blob.objects.exists())
+
+        self.send(upload_id, 0, data[:8])
+        self.send(upload_id, 8, data[8:])
+        self.assertEqual(self.complete(upload_id).data["blob"]["size"], len(data))
+
+    def test_chunk_media_type_parameters_are_accepted(self):
+        upload_id = self.start(b"0123")
+        response = self.client.patch(
+            reverse("upload-detail", kwargs={"pk": upload_id}),
+            b"0123",
+            content_type=f"{CHUNK_CONTENT_TYPE}; charset=binary",
+            HTTP_UPLOAD_OFFSET="0",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Upload-Offset"], "4")
+
+    def test_sessions_are_private(self):
+        upload_id = self.start(b"mine")
+        self.client.force_authenticate(user=self.other)
+
+        url = reverse("upload-detail", kwargs={"pk": upload_id})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.send(upload_id, 0, b"mine").status_code, status.HTTP_404_NOT_FOUND
+        )
+
+    def test_oversized_uploads_are_refused(self):
+        with override_settings(UPLOAD_MAX_SIZE=4):
+            response = self.client.post(
+                reverse("upload-list"),
+                {"filename": "big.bin", "content_type": "image/gif", "size": 5},
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_posts_use_blobs_their_author_uploaded(self):
+        subreddit = Subreddit.objects.create(name="uploads", owner=self.user)
+        subreddit.members.add(self.user, self.other)
+        sha256 = self.upload(b"a picture")["blob"]["sha256"]
+
+        response = self.client.post(
+            reverse("post-list"),
+            {"subreddit_id": subreddit.pk, "title": "Pic", "blob_id": sha256},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["blob"]["sha256"], sha256)
+        self.assertTrue(response.data["blob"]["file"].endswith(f"/{sha256}"))
+        response = self.client.get(reverse("post-list"))
+        self.assertEqual(response.data["results"][0]["blob"]["sha256"], sha256)
+
+        # Knowing the hash is not enough.
+        self.client.force_authenticate(user=self.other)
+        response = self.client.post(
+            reverse("post-list"),
+            {"subreddit_id": subreddit.pk, "title": "Pic", "blob_id": sha256},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("blob_id", response.data)
+
+    def test_purge_removes_stale_sessions_and_unused_blobs(self):
+        subreddit = Subreddit.objects.create(name="purge", owner=self.user)
+        used = Blob.objects.get(pk=self.upload(b"used")["blob"]["sha256"])
+        Post.objects.create(
+            subreddit=subreddit, owner=self.user, title="Used", blob=used
+        )
+        unused = Blob.objects.get(pk=self.upload(b"unused")["blob"]["sha256"])
+        pending = self.start(b"pending")
+        self.send(pending, 0, b"pend")
+        UploadSession.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        Blob.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("purge_uploads", stdout=out)
+
+        self.assertIn("Purged 3 sessions and 1 blobs.", out.getvalue())
+        self.assertEqual(list(Blob.objects.all()), [used])
+        self.assertFalse(unused.file.storage.exists(unused.file.name))
+        self.assertFalse(storage.staging_path(UploadSession(pk=pending)).exists())
+
+
+def image_file(name, size, mode="RGBA"):
+    buffer = BytesIO()
+    Image.new(mode, size, "red").save(
+        buffer, "PNG" if name.endswith(".png") else "JPEG"
+    )
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(RENDITIONS_INLINE=True)
+class RenditionTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        root = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(MEDIA_ROOT=root))
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="artist", password="password123", email="artist@example.com"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subreddit = Subreddit.objects.create(
+                name="pictures",
+                owner=self.user,
+                icon=image_file("icon.png", (600, 300)),
+            )
+        self.source = self.subreddit.icon.name
+
+    def open(self, size, fmt):
+        return Image.open(
+            default_storage.open(renditions.rendition_name(self.source, size, fmt))
+        )
+
+    def test_renditions_are_rendered_after_upload(self):
+        with self.open("thumbnail", "webp") as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (64, 32)))
+        with self.open("large", "png") as image:
+            # Never scaled up.
+            self.assertEqual((image.format, image.size), ("PNG", (600, 300)))
+            self.assertEqual(image.mode, "RGBA")
+
+    def test_serializers_expose_rendition_urls(self):
+        response = self.client.get(reverse("subreddit-list"))
+        data = response.data["results"][0]
+        self.assertEqual(set(data["icon_renditions"]), {"thumbnail", "small", "large"})
+        self.assertTrue(
+            data["icon_renditions"]["small"]["webp"].endswith(
+                f"/media/renditions/{self.source}/small.webp"
+            )
+        )
+        self.assertTrue(
+            data["icon_renditions"]["small"]["fallback"].endswith("/small.png")
+        )
+
+        response = self.client.get(
+            reverse("subreddit-detail", kwargs={"pk": self.subreddit.pk})
+        )
+        self.assertIsNone(response.data["banner_renditions"])
+
+    def test_missing_renditions_are_rendered_on_request(self):
+        name = renditions.rendition_name(self.source, "small", "webp")
+        default_storage.delete(name)
+
+        response = self.client.get(
+            reverse("rendition", kwargs={"name": f"{self.source}/small.webp"})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        response.close()
+        self.assertTrue(default_storage.exists(name))
+
+    def test_only_renditions_of_known_images_are_rendered(self):
+        for name in [
+            f"{self.source}/huge.webp",
+            f"{self.source}/small.gif",
+            "post_media/cat.png/small.webp",
+            f"subreddit_icons/../{self.source}/small.webp",
+            "subreddit_icons/missing.png/small.webp",
+        ]:
+            with self.subTest(name=name):
+                response = self.client.get(reverse("rendition", kwargs={"name": name}))
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(RENDITIONS_INLINE=False)
+    def test_generate_renditions_fills_the_gaps_in_a_process_pool(self):
+        self.user.profile_picture = image_file("me.jpg", (300, 400), mode="RGB")
+        self.user.save(update_fields=["profile_picture"])
+        default_storage.delete(renditions.rendition_name(self.source, "large", "webp"))
+
+        out = StringIO()
+        call_command("generate_renditions", workers=2, stdout=out)
+
+        # Three sizes in two formats for the picture, one for the icon.
+        self.assertIn("Rendered 7 renditions of 2 images.", out.getvalue())
+        name = renditions.rendition_name(self.user.profile_picture.name, "small", "jpg")
+        with Image.open(default_storage.open(name)) as image:
+            self.assertEqual((image.format, image.size), ("JPEG", (192, 256)))
@@ -0,0 +1,11 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from .views import UploadViewSet
+
+router = DefaultRouter()
+router.register(r"", UploadViewSet, basename="upload")
+
+urlpatterns = [
+    path("", include(router.urls)),
+]
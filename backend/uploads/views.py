@@ -0,0 +1,142 @@
+import io
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.utils.http import parse_header_parameters
+from django.views.decorators.http import require_safe
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import UnsupportedMediaType
+from rest_framework.response import Response
+
+from . import renditions, storage
+from .models import UploadSession
+from .serializers import UploadSessionSerializer
+
+CHUNK_CONTENT_TYPE = "application/offset+octet-stream"
+
+
+class UploadViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Chunked, resumable uploads (see uploads/storage.py):
+
+    * ``POST /api/uploads/`` opens a session,
+    * ``PATCH /api/uploads/<id>/`` sends a chunk, with its position in the
+      ``Upload-Offset`` header,
+    * ``GET /api/uploads/<id>/`` tells where to resume,
+    * ``POST /api/uploads/<id>/complete/`` finalizes the blob,
+    * ``DELETE /api/uploads/<id>/`` abandons the upload.
+    """
+
+    serializer_class = UploadSessionSerializer
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(owner=self.request.user).select_related(
+            "blob"
+        )
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+    def partial_update(self, request, *args, **kwargs):
+        media_type, _ = parse_header_parameters(request.content_type)
+        if media_type != CHUNK_CONTENT_TYPE:
+            raise UnsupportedMediaType(request.content_type)
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            length = int(request.headers.get("Content-Length") or 0)
+        except (KeyError, ValueError):
+            return Response(
+                {"error": "An integer 'Upload-Offset' header must be provided."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with transaction.atomic():
+            # Locked, so two chunks for the same session are written in turn.
+            session = get_object_or_404(
+                UploadSession.objects.select_for_update(),
+                pk=kwargs["pk"],
+                owner=request.user,
+            )
+            # The staging file is the source of truth if it fell behind.
+            session.offset = min(session.offset, storage.staged_size(session))
+
+            if session.blob_id is not None:
+                return Response(
+                    {"error": "This upload is complete."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            if offset != session.offset:
+                return Response(
+                    {"error": "Chunks must start at the current offset."},
+                    status=status.HTTP_409_CONFLICT,
+                    headers={"Upload-Offset": str(session.offset)},
+                )
+            if length > min(
+                settings.UPLOAD_MAX_CHUNK_SIZE, session.size - session.offset
+            ):
+                return Response(
+                    {"error": "The chunk is larger than allowed."},
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )
+
+            stream = request.stream or io.BytesIO()
+            session.offset += storage.write_chunk(session, stream, length)
+            session.save(update_fields=["offset", "updated_at"])
+
+        return Response(
+            self.get_serializer(session).data,
+            headers={"Upload-Offset": str(session.offset)},
+        )
+
+    @action(detail=True, methods=["post"])
+    def complete(self, request, pk=None):
+        with transaction.atomic():
+            # Locked like a chunk, so none is written while this hashes.
+            session = get_object_or_404(
+                self.get_queryset().select_for_update(of=("self",)), pk=pk
+            )
+            if session.blob_id is None:
+                # A staging file lost or cut short since the chunks were
+                # acknowledged is resumed from what is still there.
+                staged = storage.staged_size(session)
+                if staged < session.offset:
+                    session.offset = staged
+                    session.save(update_fields=["offset", "updated_at"])
+                if session.offset < session.size:
+                    return Response(
+                        {"error": f"Only {session.offset} of {session.size} bytes."},
+                        status=status.HTTP_409_CONFLICT,
+                        headers={"Upload-Offset": str(session.offset)},
+                    )
+                storage.finalize(session)
+        return Response(self.get_serializer(session).data)
+
+    def perform_destroy(self, instance):
+        storage.discard(instance)
+
+
+@require_safe
+def rendition(request, name):
+    # Reached for renditions missing from the storage: the web server falls
+    # back here, and this renders them (see uploads/renditions.py).
+    parsed = renditions.parse(renditions.PREFIX + name)
+    if parsed is None:
+        raise Http404
+    source, size, fmt = parsed
+    name = renditions.rendition_name(source, size, fmt)
+    if not default_storage.exists(name):
+        renditions.render(source, [size])
+        if not default_storage.exists(name):
+            raise Http404
+    return FileResponse(
+        default_storage.open(name, "rb"), content_type=renditions.CONTENT_TYPES[fmt]
+    )
@@ -0,0 +1,111 @@
+"""
+JWT authentication without a user query.
+
+simplejwt's ``JWTAuthentication`` loads the user's row on every request to
+build ``request.user``. ``CachedJWTAuthentication`` takes the user id from
+the token and the row from the cache, where it is kept for
+``USER_CACHE_TTL`` seconds under a per-user version number, like the
+authorization sets of subreddits/authz.py. users/signals.py bumps the
+version whenever a user is saved or deleted, including role and
+``is_active`` changes, and users/karma.py when it applies karma, so a
+changed row is never served from the cache. Bulk updates that skip both
+(``manage.py recompute_karma``) show within the TTL.
+
+The versions, like the rows, must live in a cache shared by every worker.
+With a per-process cache, a user deactivated in one worker would stay
+authenticated on the others for up to ``USER_CACHE_TTL``.
+
+The password hash is left out of the cache: ``request.user`` loads it on
+first access, unless ``CHECK_REVOKE_TOKEN`` needs it on every request.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+VERSION_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(user_id):
+    return f"user:{user_id}:version"
+
+
+def invalidate(user_ids):
+    """Forget the cached rows of the given users."""
+    for user_id in user_ids:
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:
+            cache.set(_version_key(user_id), 1, timeout=VERSION_TIMEOUT)
+
+
+def invalidate_on_commit(user_ids):
+    user_ids = list(user_ids)
+    invalidate(user_ids)
+    # Bump again once committed, in case another request cached the
+    # pre-change row under the new version in the meantime.
+    transaction.on_commit(lambda: invalidate(user_ids))
+
+
+def get_user(user_id):
+    """The user with ``user_id``, from the cache if possible, or ``None``."""
+    User = get_user_model()
+    version = cache.get(_version_key(user_id), 0)
+    key = f"user:{user_id}:{version}"
+    row = cache.get(key)
+    if row is None:
+        row = (
+            User.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+            .values(*cached_fields(User))
+            .first()
+        )
+        if row is None:
+            return None
+        cache.set(key, row, timeout=settings.USER_CACHE_TTL)
+    return User.from_db(router.db_for_read(User), list(row), list(row.values()))
+
+
+def cached_fields(User):
+    return [
+        field.attname
+        for field in User._meta.concrete_fields
+        if field.attname != "password" or api_settings.CHECK_REVOKE_TOKEN
+    ]
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        # JWTAuthentication.get_user, with the row read through the cache.
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+        if not settings.USER_CACHE_TTL:
+            return super().get_user(validated_token)
+
+        user = get_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
@@ -0,0 +1,212 @@
+"""
+Refresh token blacklist checks in memory.
+
+simplejwt looks every refresh token up in its blacklist table, and with
+``ROTATE_REFRESH_TOKENS`` and ``BLACKLIST_AFTER_ROTATION`` that table gains
+a row per refresh. ``RefreshToken`` checks a Bloom filter of the
+blacklisted token ids first: a token the filter has never seen is not
+blacklisted, so only the filter's rare false positives still reach the
+table.
+
+Each process builds its filter from the table on first use. Blacklisting a
+token (``users/signals.py``) adds it to the filter of the process right
+away and, once committed, publishes it to the others: it increments a
+generation counter in the cache and stores the token id under the new
+generation. Before each check a process reads the counter and adds the ids
+of the generations it missed. When some are gone from the cache, or it
+fell too far behind, it rebuilds its filter from the table instead, which
+holds every token published so far.
+
+The filter is only as complete as the cache is shared. It is skipped, and
+every token looked up in the table, unless the default cache is shared by
+every worker (``api.cache.is_shared``), or while the cache cannot be read.
+A publish that cannot be confirmed resets the generation counter, which
+makes every process rebuild from the table.
+
+Expired tokens fail verification anyway: they are left out of rebuilt
+filters, and ``manage.py purge_tokens`` deletes their rows.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from contextlib import suppress
+
+from api.cache import is_shared
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import (BlacklistedToken,
+                                                             OutstandingToken)
+
+GENERATION_KEY = "token_blacklist:generation"
+# Generations a process catches up on before rebuilding instead.
+MAX_LAG = 1000
+ENTRY_TIMEOUT = 60 * 60
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit hashes.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+
+class BlacklistFilter:
+    def __init__(self):
+        self.bloom = None
+        self.generation = None
+        self.lock = threading.Lock()
+
+    def might_contain(self, jti):
+        generation = get_generation()
+        if generation is None:
+            # The cache is unavailable: the table decides.
+            return True
+        with self.lock:
+            self.sync(generation)
+            return jti in self.bloom
+
+    def add(self, jti):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def sync(self, generation):
+        if (
+            self.bloom is None
+            or not self.generation <= generation <= self.generation + MAX_LAG
+            or self.bloom.count > self.bloom.capacity
+        ):
+            self.rebuild(generation)
+            return
+        if generation == self.generation:
+            return
+
+        keys = [_entry_key(g) for g in range(self.generation + 1, generation + 1)]
+        found = cache.get_many(keys)
+        if len(found) < len(keys):
+            # Evicted, or published by a process that has not stored it yet.
+            self.rebuild(generation)
+            return
+        for jti in found.values():
+            self.bloom.add(jti)
+        self.generation = generation
+
+    def rebuild(self, generation):
+        # ``generation`` was read before the table: anything blacklisted
+        # since is either in this query or published after it.
+        jtis = BlacklistedToken.objects.filter(
+            token__expires_at__gt=timezone.now()
+        ).values_list("token__jti", flat=True)
+        capacity = settings.TOKEN_BLACKLIST_FILTER_CAPACITY
+        while True:
+            bloom = BloomFilter(capacity, settings.TOKEN_BLACKLIST_FILTER_ERROR_RATE)
+            for jti in jtis.iterator(chunk_size=10_000):
+                bloom.add(jti)
+            if bloom.count <= capacity:
+                break
+            # Too full for its error rate; start over with room to grow.
+            capacity = 2 * bloom.count
+        self.bloom = bloom
+        self.generation = generation
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def _entry_key(generation):
+    return f"token_blacklist:{generation}"
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # After a cache reset, start past every generation handed out
+        # before it (one per microsecond at most), so that every process
+        # sees it is behind by more than MAX_LAG and rebuilds.
+        cache.add(GENERATION_KEY, time.time_ns() // 1000, timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def publish(jti):
+    """Tell the other processes ``jti`` was blacklisted; call once committed."""
+    try:
+        try:
+            generation = cache.incr(GENERATION_KEY)
+        except ValueError:
+            get_generation()
+            generation = cache.incr(GENERATION_KEY)
+        confirmed = cache.add(_entry_key(generation), jti, timeout=ENTRY_TIMEOUT)
+    except Exception:
+        confirmed = False
+    if not confirmed:
+        # Send every process back to the table, which holds ``jti``. Should
+        # this fail too, the cache is down and the checks fail closed.
+        with suppress(Exception):
+            cache.delete(GENERATION_KEY)
+
+
+class RefreshToken(tokens.RefreshToken):
+    def check_blacklist(self):
+        if not is_shared():
+            # Tokens blacklisted by other processes never reach the filter.
+            return super().check_blacklist()
+        try:
+            listed = blacklist_filter.might_contain(
+                self.payload[api_settings.JTI_CLAIM]
+            )
+        except Exception:
+            # Fail closed whenever the cache cannot be read.
+            listed = True
+        if listed:
+            super().check_blacklist()
+
+
+def purge_expired(batch_size=1000):
+    """
+    Delete expired outstanding tokens and their blacklist entries, a batch
+    per transaction. Returns how many outstanding tokens were deleted.
+    """
+    deleted = 0
+    now = timezone.now()
+    while True:
+        # Tokens expire roughly in id order, so the expired ones come first.
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=now)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            # Cascades to their blacklist entries.
+            OutstandingToken.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            return deleted
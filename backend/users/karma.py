@@ -0,0 +1,128 @@
+"""
+Karma: the votes on a user's posts plus one point per live comment.
+
+Nothing updates ``CustomUser.karma_points`` per vote. Writers append
+``KarmaEvent`` deltas in the same transaction as the change they account
+for:
+
+* the vote flusher (posts/votes.py), per post owner, for the votes it
+  merges into ``Post.vote_count``,
+* the comment views, +1 when a comment is written and -1 when it is
+  deleted,
+* the archiver (posts/archive.py), for the buffered votes it folds into
+  archived posts.
+
+``apply_events`` (``manage.py apply_karma``) sums a batch of events per
+user, adds the totals with one UPDATE and deletes the batch, so a busy user
+is written once per batch instead of once per vote.
+
+``recompute`` (``manage.py recompute_karma``) rebuilds karma from the
+vote counts of live and archived posts and from the comments instead, one
+range of user ids per short transaction, so only that range's rows are
+locked. Votes still in the buffer are left to the flusher's events. Events
+emitted while a range is being recomputed may be counted twice.
+"""
+
+from api.conditional import bump
+from comments.models import Comment
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import (Case, Count, F, IntegerField, OuterRef, Subquery,
+                              Sum, Value, When)
+from django.db.models.functions import Coalesce
+from posts.models import ArchivedPost, Post
+
+from . import authentication
+from .models import KarmaEvent
+
+User = get_user_model()
+
+
+def record(deltas):
+    """Queue ``{user_id: delta}``; call inside the writer's transaction."""
+    KarmaEvent.objects.bulk_create(
+        KarmaEvent(user_id=user_id, delta=delta)
+        for user_id, delta in deltas.items()
+        if delta
+    )
+
+
+def apply_events(batch_size=1000):
+    """Apply every queued event, a batch at a time. Returns how many."""
+    applied = 0
+    while True:
+        with transaction.atomic():
+            # Concurrent appliers skip each other's batches.
+            ids = list(
+                KarmaEvent.objects.select_for_update(skip_locked=True)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            totals = dict(
+                KarmaEvent.objects.filter(pk__in=ids)
+                .order_by()
+                .values("user_id")
+                .annotate(total=Sum("delta"))
+                .values_list("user_id", "total")
+            )
+            User.objects.filter(pk__in=totals).update(
+                karma_points=F("karma_points")
+                + Case(
+                    *[
+                        When(pk=user_id, then=Value(total))
+                        for user_id, total in totals.items()
+                    ],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+            KarmaEvent.objects.filter(pk__in=ids).delete()
+            authentication.invalidate_on_commit(totals)
+        applied += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    if applied:
+        bump("users")
+    return applied
+
+
+def user_id_ranges(chunk_size):
+    """``(start, end)`` ranges of user ids covering every user."""
+    last = User.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+    return [(start, start + chunk_size) for start in range(1, last + 1, chunk_size)]
+
+
+def recompute(start, end):
+    """Rebuild the karma of the users with ``start <= pk < end``."""
+    post_karma = (
+        Post.objects.filter(owner=OuterRef("pk"))
+        .order_by()
+        .values("owner")
+        .annotate(total=Sum("vote_count"))
+        .values("total")
+    )
+    archived_karma = (
+        ArchivedPost.objects.filter(owner=OuterRef("pk"))
+        .order_by()
+        .values("owner")
+        .annotate(total=Sum("vote_count"))
+        .values("total")
+    )
+    comment_karma = (
+        Comment.objects.filter(owner=OuterRef("pk"), is_removed=False)
+        .order_by()
+        .values("owner")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    with transaction.atomic():
+        # The recomputed value already contains everything queued.
+        KarmaEvent.objects.filter(user_id__gte=start, user_id__lt=end).delete()
+        return User.objects.filter(pk__gte=start, pk__lt=end).update(
+            karma_points=Coalesce(Subquery(post_karma), Value(0))
+            + Coalesce(Subquery(archived_karma), Value(0))
+            + Coalesce(Subquery(comment_karma), Value(0))
+        )
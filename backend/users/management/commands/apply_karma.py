@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users import karma
+
+
+class Command(BaseCommand):
+    help = "Apply the queued karma events to CustomUser.karma_points."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep applying once every KARMA_APPLY_INTERVAL seconds.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            applied = karma.apply_events(batch_size=options["batch_size"])
+            self.stdout.write(f"Applied {applied} karma events.")
+            if not options["loop"]:
+                break
+            time.sleep(settings.KARMA_APPLY_INTERVAL)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users import blacklist
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding refresh tokens and their blacklist entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = blacklist.purge_expired(batch_size=options["batch_size"])
+        self.stdout.write(f"Deleted {deleted} expired tokens.")
@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from users import karma
+
+# Worker threads used on databases that take concurrent writers.
+DEFAULT_WORKERS = 4
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild every user's karma from post vote counts and comments, one "
+        "range of user ids per transaction, in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help=(
+                f"Defaults to {DEFAULT_WORKERS}, or to 1 on SQLite, where "
+                "parallel writers fail with 'database is locked'."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        workers = options["workers"] or (
+            1 if connection.vendor == "sqlite" else DEFAULT_WORKERS
+        )
+        ranges = karma.user_id_ranges(options["chunk_size"])
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                updated = sum(pool.map(self.recompute, ranges))
+        else:
+            updated = sum(karma.recompute(*bounds) for bounds in ranges)
+        karma.bump("users")
+        self.stdout.write(self.style.SUCCESS(f"Recomputed karma of {updated} users."))
+
+    def recompute(self, bounds):
+        # Every worker thread has its own database connection.
+        try:
+            return karma.recompute(*bounds)
+        finally:
+            connection.close()
@@ -22,3 +22,19 @@ class CustomUser(AbstractUser):
 
     def __str__(self):
         return self.username
+
+
+class KarmaEvent(models.Model):
+    """
+    A pending change to a user's ``karma_points``, applied in batches by
+    ``manage.py apply_karma`` (see users/karma.py).
+    """
+
+    user = models.ForeignKey(
+        CustomUser, related_name="karma_events", on_delete=models.CASCADE
+    )
+    delta = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user_id} {self.delta:+d}"
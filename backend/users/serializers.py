@@ -1,13 +1,20 @@
+from api.metrics import TimedSerializerMixin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from uploads.serializers import RenditionsField
+
+from .blacklist import RefreshToken
 
 CustomUser = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for retrieving and updating user details."""
 
+    profile_picture_renditions = RenditionsField(source="profile_picture")
+
     class Meta:
         model = CustomUser
         fields = [
@@ -15,14 +22,23 @@ class UserSerializer(serializers.ModelSerializer):
             "username",
             "email",
             "profile_picture",
+            "profile_picture_renditions",
             "bio",
             "karma_points",
             "role",
         ]
         read_only_fields = ["role", "karma_points"]
 
+    def update(self, instance, validated_data):
+        # Only write the edited fields: karma_points is updated concurrently
+        # by users/karma.py and must not be overwritten with a stale copy.
+        for name, value in validated_data.items():
+            setattr(instance, name, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
 
-class RegisterSerializer(serializers.ModelSerializer):
+class RegisterSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for user registration."""
 
     password = serializers.CharField(
@@ -48,3 +64,8 @@ class RegisterSerializer(serializers.ModelSerializer):
         user.set_password(validated_data["password"])
         user.save()
         return user
+
+
+class LoginRefreshSerializer(TokenRefreshSerializer):
+    # Checks the blacklist through the in-memory filter.
+    token_class = RefreshToken
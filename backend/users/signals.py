@@ -0,0 +1,35 @@
+from api.conditional import bump_on_commit
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from . import authentication, blacklist
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def bump_user_stamp(sender, instance, update_fields=None, **kwargs):
+    # Users are nested in posts and subreddits. Logging in only touches
+    # last_login, which is never rendered.
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    bump_on_commit("users")
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, update_fields=None, **kwargs):
+    # A stale last_login is harmless; logins would evict the row each time.
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    authentication.invalidate_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def publish_blacklisted_token(sender, instance, created, **kwargs):
+    if created:
+        jti = instance.token.jti
+        blacklist.blacklist_filter.add(jti)
+        transaction.on_commit(lambda: blacklist.publish(jti))
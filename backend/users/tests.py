@@ -1,7 +1,26 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
+from posts import votes
+from posts.models import Post
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import (BlacklistedToken,
+                                                             OutstandingToken)
+from rest_framework_simplejwt.tokens import RefreshToken
+from subreddits.models import Subreddit
+
+from . import authentication, blacklist, karma
+from .models import KarmaEvent
 
 CustomUser = get_user_model()
 
@@ -190,3 +209,224 @@ class UserAuthTests(APITestCase):
         self.assertEqual(
             refresh_attempt_response.status_code, status.HTTP_401_UNAUTHORIZED
         )
+
+
+class CachedAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username="cached", password="password123", email="cached@example.com"
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.me_url = reverse("auth_me")
+
+    def test_authenticated_reads_skip_the_user_query(self):
+        self.client.get(self.me_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.me_url)
+        self.assertEqual(response.data["username"], "cached")
+
+    def test_user_changes_are_seen_right_away(self):
+        self.client.get(self.me_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.role = "moderator"
+            self.user.save()
+        self.assertEqual(self.client.get(self.me_url).data["role"], "moderator")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            KarmaEvent.objects.create(user=self.user, delta=5)
+            karma.apply_events()
+        self.assertEqual(self.client.get(self.me_url).data["karma_points"], 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        response = self.client.get(self.me_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_is_not_cached(self):
+        user = authentication.get_user(self.user.pk)
+        self.assertEqual(user.get_deferred_fields(), {"password"})
+        self.assertTrue(user.check_password("password123"))
+
+
+class TokenBlacklistTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username="tokens", password="password123", email="tokens@example.com"
+        )
+
+    def test_bloom_filter(self):
+        bloom = blacklist.BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"in-{i}")
+        self.assertTrue(all(f"in-{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"out-{i}" in bloom for i in range(10_000))
+        self.assertLess(false_positives, 300)
+
+    def test_tokens_never_blacklisted_skip_the_table(self):
+        blacklist.RefreshToken(str(blacklist.RefreshToken.for_user(self.user)))
+        token = str(blacklist.RefreshToken.for_user(self.user))
+        with self.assertNumQueries(0):
+            blacklist.RefreshToken(token)
+
+    def test_blacklisted_tokens_reach_other_processes(self):
+        other = blacklist.BlacklistFilter()
+        self.assertFalse(other.might_contain("unknown"))
+
+        token = blacklist.RefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+        jti = token[api_settings.JTI_CLAIM]
+        with self.assertNumQueries(0):
+            self.assertTrue(other.might_contain(jti))
+        with self.assertRaises(TokenError):
+            blacklist.RefreshToken(str(token))
+
+        # Without the published entries, the filter is rebuilt.
+        token = blacklist.RefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+        cache.delete(blacklist._entry_key(blacklist.get_generation()))
+        self.assertTrue(other.might_contain(token[api_settings.JTI_CLAIM]))
+
+    def test_unshared_cache_checks_the_table(self):
+        token = blacklist.RefreshToken.for_user(self.user)
+        blacklist.RefreshToken(str(token))
+        # Blacklisted by another process, which this filter never hears of.
+        with mock.patch.object(blacklist, "blacklist_filter"):
+            token.blacklist()
+        blacklist.RefreshToken(str(token))
+
+        with override_settings(SINGLE_PROCESS=False):
+            with self.assertRaises(TokenError):
+                blacklist.RefreshToken(str(token))
+
+    def test_unconfirmed_publish_rebuilds_every_filter(self):
+        other = blacklist.BlacklistFilter()
+        self.assertFalse(other.might_contain("unknown"))
+
+        token = blacklist.RefreshToken.for_user(self.user)
+        with mock.patch.object(blacklist.cache, "add", return_value=False):
+            with self.captureOnCommitCallbacks(execute=True):
+                token.blacklist()
+        self.assertTrue(other.might_contain(token[api_settings.JTI_CLAIM]))
+
+    def test_purge_deletes_expired_tokens_in_batches(self):
+        tokens = [blacklist.RefreshToken.for_user(self.user) for _ in range(5)]
+        for token in tokens[:2]:
+            token.blacklist()
+        OutstandingToken.objects.filter(
+            jti__in=[token[api_settings.JTI_CLAIM] for token in tokens[1:4]]
+        ).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        out = StringIO()
+        call_command("purge_tokens", batch_size=2, stdout=out)
+        self.assertIn("Deleted 3 expired tokens", out.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 2)
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+
+class KarmaTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        # The vote buffer's clock only moves when a test flushes.
+        self.clock = self.enterContext(
+            mock.patch.object(votes, "current_epoch", return_value=100)
+        )
+        self.author = CustomUser.objects.create_user(
+            username="author", password="password123", email="author@example.com"
+        )
+        self.voters = [
+            CustomUser.objects.create_user(
+                username=f"voter{i}", password="password123", email=f"v{i}@example.com"
+            )
+            for i in range(3)
+        ]
+        self.subreddit = Subreddit.objects.create(name="karma", owner=self.author)
+        self.post = Post.objects.create(
+            subreddit=self.subreddit, owner=self.author, title="Karma", body="..."
+        )
+
+    def vote(self, user, value):
+        self.client.force_authenticate(user=user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("post-vote", kwargs={"pk": self.post.pk}), {"value": value}
+            )
+
+    def comment(self, user):
+        self.client.force_authenticate(user=user)
+        return self.client.post(
+            reverse("post-comments-list", kwargs={"post_pk": self.post.pk}),
+            {"body": "Nice"},
+        )
+
+    def flush_votes(self):
+        # Close the current epoch and wait out the flusher's grace period.
+        self.clock.return_value += votes.GRACE_EPOCHS
+        votes.flush()
+
+    def karma(self, user):
+        user.refresh_from_db()
+        return user.karma_points
+
+    def test_votes_and_comments_are_applied_in_batches(self):
+        self.vote(self.voters[0], 1)
+        self.vote(self.voters[1], 1)
+        self.vote(self.voters[2], -1)
+        response = self.comment(self.voters[0])
+
+        # Nothing is written to the users until events are applied.
+        self.assertEqual(self.karma(self.author), 0)
+        self.flush_votes()
+        self.assertEqual(KarmaEvent.objects.filter(user=self.author).get().delta, 1)
+
+        # One UPDATE for the whole batch.
+        with self.assertNumQueries(6):
+            self.assertEqual(karma.apply_events(batch_size=10), 2)
+        self.assertEqual(self.karma(self.author), 1)
+        self.assertEqual(self.karma(self.voters[0]), 1)
+        self.assertFalse(KarmaEvent.objects.exists())
+
+        self.client.delete(
+            reverse(
+                "post-comments-detail",
+                kwargs={"post_pk": self.post.pk, "pk": response.data["id"]},
+            )
+        )
+        call_command("apply_karma", stdout=StringIO())
+        self.assertEqual(self.karma(self.voters[0]), 0)
+
+    def test_replayed_flush_is_not_counted_twice(self):
+        self.vote(self.voters[0], 1)
+        epoch = votes.current_epoch()
+        self.clock.return_value += votes.GRACE_EPOCHS
+        votes.apply_deltas({self.post.pk: 1}, epoch)
+        votes.apply_deltas({self.post.pk: 1}, epoch)
+
+        karma.apply_events()
+        self.assertEqual(self.karma(self.author), 1)
+
+    def test_recompute(self):
+        self.vote(self.voters[0], 1)
+        self.flush_votes()
+        self.comment(self.author)
+        CustomUser.objects.update(karma_points=42)
+
+        # One worker by default on SQLite.
+        call_command("recompute_karma", chunk_size=2, stdout=StringIO())
+
+        self.assertEqual(self.karma(self.author), 2)
+        self.assertEqual(self.karma(self.voters[0]), 0)
+        # Queued events are part of the recomputed value.
+        self.assertFalse(KarmaEvent.objects.exists())
+
+    def test_profile_updates_keep_concurrent_karma(self):
+        self.client.force_authenticate(user=self.author)
+        CustomUser.objects.filter(pk=self.author.pk).update(karma_points=7)
+        self.client.patch(reverse("auth_me"), {"bio": "Hello"})
+        self.assertEqual(self.karma(self.author), 7)
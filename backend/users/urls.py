@@ -1,13 +1,12 @@
 from django.urls import path
-from rest_framework_simplejwt.views import (TokenObtainPairView,
-                                            TokenRefreshView)
 
-from .views import LogoutView, MeView, RegisterView
+from .views import (LoginRefreshView, LoginView, LogoutView, MeView,
+                    RegisterView)
 
 urlpatterns = [
     path("register/", RegisterView.as_view(), name="auth_register"),
-    path("login/", TokenObtainPairView.as_view(), name="auth_login"),
-    path("login/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("login/", LoginView.as_view(), name="auth_login"),
+    path("login/refresh/", LoginRefreshView.as_view(), name="token_refresh"),
     path("logout/", LogoutView.as_view(), name="auth_logout"),
     path("me/", MeView.as_view(), name="auth_me"),
 ]
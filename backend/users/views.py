@@ -3,9 +3,12 @@ from rest_framework import generics, status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import (TokenObtainPairView,
+                                            TokenRefreshView)
 
-from .serializers import RegisterSerializer, UserSerializer
+from .blacklist import RefreshToken
+from .serializers import (LoginRefreshSerializer, RegisterSerializer,
+                          UserSerializer)
 
 CustomUser = get_user_model()
 
@@ -14,6 +17,16 @@ class RegisterView(generics.CreateAPIView):
     queryset = CustomUser.objects.all()
     permission_classes = (AllowAny,)
     serializer_class = RegisterSerializer
+    throttle_scope = "auth"
+
+
+class LoginView(TokenObtainPairView):
+    throttle_scope = "auth"
+
+
+class LoginRefreshView(TokenRefreshView):
+    serializer_class = LoginRefreshSerializer
+    throttle_scope = "auth"
 
 
 class LogoutView(APIView):